@@ -26,6 +26,7 @@ from .state_plugins import SimStatePlugin
 from .project import *
 from .errors import *
 from .misc.tracer import make_tracer_project
+from .misc.profiling import ExecutionProfiler
 #from . import surveyors
 #from .surveyor import *
 #from .service import *
@@ -40,6 +41,7 @@ from .exploration_techniques import ExplorationTechnique
 from . import type_backend
 from . import sim_type as types
 from .state_hierarchy import StateHierarchy
+from .state_serializer import StateSerializer
 
 from .sim_state import SimState
 from .engines import SimEngineVEX, SimEngine
@@ -1,11 +1,14 @@
 import sys
 import contextlib
+import multiprocessing
+import cPickle as pickle
+from cStringIO import StringIO
 from collections import defaultdict
 import progressbar
 import logging
 
 from ..errors import AngrAnalysisError
-from . import registered_analyses
+from . import registered_analyses, register_analysis
 
 l = logging.getLogger("angr.analysis")
 
@@ -212,3 +215,192 @@ class Analysis(object):
 
     def __repr__(self):
         return '<%s Analysis Result at %#x>' % (self._name, id(self))
+
+
+# the state shared with the worker processes of FunctionAnalysisRunner. workers inherit it when they are forked.
+_runner_state = None
+
+
+class FunctionAnalysisRunner(Analysis):
+    """
+    Run a per-function analysis on many functions, in a pool of worker processes.
+
+    Each worker runs the analysis on one function at a time, against its own forked copy of the project and the
+    knowledge base. The analysis results are pickled back to this process, where references to the project, the
+    knowledge base, its plugins and its functions are resolved to the ones of this process. The per-function data of the
+    requested knowledge base plugins is then merged into the knowledge base.
+
+    Changes that the analysis makes to anything else in the worker, like Function objects, hooks of the project or
+    global variables, are not merged.
+
+    :ivar dict results:         A dict of function addresses to analysis results. A result is None if the analysis
+                                failed or its result could not be pickled.
+    :ivar dict named_errors:    Errors of each function, keyed by function address. This includes the errors the
+                                analysis caught with resilience.
+    """
+
+    def __init__(self, analysis, functions=None, workers=None, make_args=None, plugins=None, keep_results=True,
+                 **kwargs):
+        """
+        :param str analysis:        Name of a registered analysis, like 'VariableRecoveryFast'.
+        :param functions:           An iterable of Functions or function addresses. Defaults to all functions in the
+                                    knowledge base.
+        :param int workers:         The number of worker processes. Defaults to the number of CPUs. The analysis is run
+                                    in this process if it is 1.
+        :param make_args:           A function taking a Function and returning an (args, kwargs) tuple to run the
+                                    analysis with. By default, the Function is passed as the only positional argument.
+                                    For example, LoopFinder takes `lambda f: ((), {'functions': [ f ]})`.
+        :param plugins:             Names of knowledge base plugins whose per-function data is merged back. Defaults to
+                                    ('variables', ).
+        :param bool keep_results:   Whether to keep the analysis results or not. Results that cannot be pickled should
+                                    not be kept.
+        :param kwargs:              Extra keyword arguments passed to the analysis.
+        """
+        global _runner_state  # pylint:disable=global-statement
+
+        if analysis not in registered_analyses:
+            raise AngrAnalysisError('Analysis %s is not registered.' % analysis)
+
+        if functions is None:
+            functions = self.kb.functions.keys()
+        func_addrs = [ f.addr if isinstance(f, Function) else f for f in functions ]
+
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers > 1 and sys.platform.startswith('win'):
+            # workers cannot inherit the project without fork()
+            l.warning("Running analyses in parallel is not supported on Windows.")
+            workers = 1
+
+        self.results = { }
+        self.named_errors = { }
+
+        self._analysis = analysis
+        self._make_args = make_args if make_args is not None else lambda f: ((f, ), { })
+        self._plugins = tuple(plugins) if plugins is not None else ('variables', )
+        self._keep_results = keep_results
+        self._kwargs = kwargs
+
+        if not func_addrs:
+            self._finish_progress()
+            return
+
+        if workers <= 1:
+            for i, func_addr in enumerate(func_addrs):
+                self._merge(self._run(self.project, self.kb, func_addr))
+                self._update_progress(100.0 * (i + 1) / len(func_addrs))
+
+        else:
+            _runner_state = self
+            pool = multiprocessing.Pool(workers)
+            try:
+                for i, blob in enumerate(pool.imap_unordered(_run_function_analysis, func_addrs)):
+                    self._merge(self._loads(blob))
+                    self._update_progress(100.0 * (i + 1) / len(func_addrs))
+            finally:
+                pool.terminate()
+                pool.join()
+                _runner_state = None
+
+        self._finish_progress()
+
+    def _run(self, project, kb, func_addr):
+        """
+        Run the analysis on a function.
+
+        :return:    A tuple of (function address, analysis result, errors, per-function plugin data).
+        """
+        result = None
+        errors = [ ]
+
+        func = kb.functions.function(addr=func_addr)
+        if func is None:
+            errors.append(AnalysisLogEntry("function %#x is not found" % func_addr))
+        else:
+            args, kwargs = self._make_args(func)
+            kwargs = dict(self._kwargs, **kwargs)
+            try:
+                result = getattr(project.analyses, self._analysis)(*args, kb=kb, fail_fast=self._fail_fast, **kwargs)
+            except Exception:  # pylint:disable=broad-except
+                if self._fail_fast:
+                    raise
+                errors.append(AnalysisLogEntry("exception occurred", exc_info=True))
+            else:
+                errors.extend(result.errors)
+                for entries in result.named_errors.itervalues():
+                    errors.extend(entries)
+
+        plugin_data = { }
+        for name in self._plugins:
+            if kb.has_plugin(name):
+                data = kb.get_plugin(name).function_data(func_addr)
+                if data is not None:
+                    plugin_data[name] = data
+
+        return func_addr, result if self._keep_results else None, errors, plugin_data
+
+    def _merge(self, r):
+        func_addr, result, errors, plugin_data = r
+        self.results[func_addr] = result
+        if errors:
+            self.named_errors[func_addr] = errors
+            l.error("%d errors occurred when running %s on function %#x.", len(errors), self._analysis, func_addr)
+        for name, data in plugin_data.iteritems():
+            self.kb.get_plugin(name).merge_function_data(func_addr, data)
+
+    #
+    # Pickling results between processes
+    #
+
+    def _dumps(self, r):
+        project, kb = self.project, self.kb
+
+        def persistent_id(o):
+            if o is project:
+                return 'p'
+            if o is kb:
+                return 'k'
+            if isinstance(o, KnowledgeBasePlugin):
+                for name, plugin in kb._plugins.iteritems():
+                    if o is plugin:
+                        return 'P' + name
+            if isinstance(o, Function) and kb.functions.function(addr=o.addr) is o:
+                return 'f%x' % o.addr
+            return None
+
+        f = StringIO()
+        p = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        p.persistent_id = persistent_id
+        p.dump(r)
+        return f.getvalue()
+
+    def _loads(self, blob):
+        def persistent_load(pid):
+            if pid == 'p':
+                return self.project
+            if pid == 'k':
+                return self.kb
+            if pid[0] == 'P':
+                return self.kb.get_plugin(pid[1:])
+            if pid[0] == 'f':
+                return self.kb.functions.function(addr=int(pid[1:], 16))
+            raise pickle.UnpicklingError("Unknown persistent id %r" % pid)
+
+        p = pickle.Unpickler(StringIO(blob))
+        p.persistent_load = persistent_load
+        return p.load()
+
+
+def _run_function_analysis(func_addr):
+    runner = _runner_state
+    r = runner._run(runner.project, runner.kb, func_addr)
+    try:
+        return runner._dumps(r)
+    except (pickle.PicklingError, TypeError):
+        func_addr, _, errors, plugin_data = r
+        errors.append(AnalysisLogEntry("the result could not be pickled", exc_info=True))
+        return runner._dumps((func_addr, None, errors, plugin_data))
+
+register_analysis(FunctionAnalysisRunner, 'FunctionAnalysisRunner')
+
+from ..knowledge_plugins import Function, KnowledgeBasePlugin
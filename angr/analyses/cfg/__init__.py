@@ -8,3 +8,5 @@ from .cfg import CFG
 from .cfg_arch_options import CFGArchOptions
 from .cfg_utils import CFGUtils
 from .cfg_node import CFGNode
+from .cfg_snapshot import CFGSnapshot
+from .compact_graph import CompactDiGraph
@@ -1739,7 +1739,8 @@ class CFGAccurate(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
             # remove all existing jobs that has the same block ID
             if next((en for en in self.jobs if en.block_id == pw.block_id), None):
                 # TODO: this is very hackish. Reimplement this logic later
-                self._job_info_queue = [entry for entry in self._job_info_queue if entry.job.block_id != pw.block_id]
+                for entry in [ en for en in self._job_info_queue if en.job.block_id == pw.block_id ]:
+                    self._job_info_queue.remove(entry)
 
         # register the job
         self._register_analysis_job(pw.func_addr, pw)
@@ -2714,6 +2715,7 @@ class CFGAccurate(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
                 new_state.se._solver.constraints = [c for c in new_state.se.constraints if
                                                     c.op != 'I' or c.args[0] is not False]
                 new_state.se._solver._result = None
+                new_state.se._constraint_index = None
                 # Swap them
                 saved_state, job.state = job.state, new_state
                 sim_successors, exception_info, _ = self._get_simsuccessors(addr, job)
@@ -1,4 +1,5 @@
 
+import bisect
 import logging
 import struct
 from collections import defaultdict
@@ -18,6 +19,7 @@ from ...codenode import HookNode, BlockNode
 from ...knowledge_plugins import FunctionManager, Function
 from .. import Analysis
 from .cfg_node import CFGNode
+from .compact_graph import CompactDiGraph
 
 l = logging.getLogger("angr.analyses.cfg.cfg_base")
 
@@ -52,7 +54,8 @@ class CFGBase(Analysis):
     """
     The base class for control flow graphs.
     """
-    def __init__(self, sort, context_sensitivity_level, normalize=False, binary=None, force_segment=False, iropt_level=None, base_state=None):
+    def __init__(self, sort, context_sensitivity_level, normalize=False, binary=None, force_segment=False, iropt_level=None, base_state=None,
+                 compact_graph=False):
         self.sort = sort
         self._context_sensitivity_level=context_sensitivity_level
 
@@ -67,6 +70,8 @@ class CFGBase(Analysis):
 
         # Initialization
         self._graph = None
+        # Store the graph in a CompactDiGraph instead of a networkx.DiGraph
+        self._compact_graph = compact_graph
         self._edge_map = None
         self._loop_back_edges = None
         self._overlapped_loop_headers = None
@@ -144,7 +149,7 @@ class CFGBase(Analysis):
         """
         Re-create the DiGraph
         """
-        self._graph = networkx.DiGraph()
+        self._graph = CompactDiGraph() if self._compact_graph else networkx.DiGraph()
 
         self.kb.functions = FunctionManager(self.kb)
 
@@ -297,6 +302,29 @@ class CFGBase(Analysis):
             return self._nodes[block_id]
         return None
 
+    def nodes_in_ranges(self, ranges):
+        """
+        Get all nodes that overlap with any of some address ranges.
+
+        :param list ranges: A list of (start, end) tuples. End addresses are exclusive.
+        :return:            A set of CFGNodes.
+        :rtype:             set
+        """
+        ranges = sorted(ranges)
+        starts = [ start for start, _ in ranges ]
+
+        nodes = set()
+        for n in self.graph.nodes():
+            node_start = n.addr & ~1 if n.thumb else n.addr
+            node_end = node_start + max(n.size, 1) if n.size is not None else node_start + 1
+            # only ranges starting before the end of the node can overlap with it
+            i = bisect.bisect_left(starts, node_end)
+            for start, end in ranges[:i]:
+                if start < node_end and node_start < end:
+                    nodes.add(n)
+                    break
+        return nodes
+
     def get_any_node(self, addr, is_syscall=None, anyaddr=False):
         """
         Get an arbitrary CFGNode (without considering their contexts) from our graph.
@@ -1041,13 +1069,15 @@ class CFGBase(Analysis):
 
         return changes
 
-    def normalize(self):
+    def normalize(self, nodes=None):
         """
         Normalize the CFG, making sure that there are no overlapping basic blocks.
 
         Note that this method will not alter transition graphs of each function in self.kb.functions. You may call
         normalize() on each Function object to normalize their transition graphs.
 
+        :param iterable nodes:  Only normalize these nodes. They must include every node that overlaps with any of them.
+                                By default, all nodes in the graph are normalized.
         :return: None
         """
 
@@ -1056,7 +1086,7 @@ class CFGBase(Analysis):
         smallest_nodes = { }  # indexed by end address of the node
         end_addresses_to_nodes = defaultdict(set)
 
-        for n in graph.nodes():
+        for n in (graph.nodes() if nodes is None else nodes):
             if n.is_simprocedure:
                 continue
             end_addr = n.addr + n.size
@@ -1292,15 +1322,19 @@ class CFGBase(Analysis):
     # Function identification and such
     #
 
-    def remove_function_alignments(self):
+    def remove_function_alignments(self, function_addrs=None):
         """
         Remove all function alignments.
 
+        :param iterable function_addrs: Only check the functions at these addresses. By default, all functions are
+                                        checked.
         :return: None
         """
 
-        for func_addr in self.kb.functions.keys():
-            function = self.kb.functions[func_addr]
+        for func_addr in (self.kb.functions.keys() if function_addrs is None else function_addrs):
+            function = self.kb.functions.function(addr=func_addr)
+            if function is None:
+                continue
             if function.is_simprocedure or function.is_syscall:
                 continue
             if len(function.block_addrs_set) == 1:
@@ -1441,6 +1475,119 @@ class CFGBase(Analysis):
         for function in self.kb.functions.values():
             function.mark_nonreturning_calls_endpoints()
 
+    def _remake_functions(self, function_addrs):
+        """
+        Rebuild some functions from the control flow graph, the same way make_functions() rebuilds all of them. Blocks
+        that belong to any other function are left to that function, and the traversal stops at them.
+
+        :param set function_addrs:  Addresses of the functions to rebuild.
+        :return:                    None
+        """
+
+        tmp_functions = FunctionManager(self.kb)
+        callgraph = self.kb.functions.callgraph
+
+        nodes = set()
+        for func_addr in function_addrs:
+            function = self.kb.functions.function(addr=func_addr)
+            if function is None:
+                continue
+            function.mark_nonreturning_calls_endpoints()
+            tmp_functions[func_addr] = function
+            for block_addr in function.block_addrs_set:
+                nodes.update(self._nodes_by_addr.get(block_addr, [ ]))
+
+            # calls are added back when the function is traversed
+            if func_addr in callgraph:
+                callgraph.remove_edges_from(list(callgraph.out_edges(func_addr, keys=True)))
+            del self.kb.functions[func_addr]
+
+        # blocks of other functions that the rebuilt functions flow into
+        blockaddr_to_function = { }
+        traversed_cfg_nodes = set()
+        for n in nodes:
+            for _, dst, data in self.graph.out_edges(n, data=True):
+                jumpkind = data.get('jumpkind', "")
+                if jumpkind == 'Ijk_Call' or jumpkind.startswith('Ijk_Sys'):
+                    continue
+                if dst.function_address is None or dst.function_address in function_addrs:
+                    continue
+                function = self.kb.functions.function(addr=dst.function_address)
+                if function is not None:
+                    blockaddr_to_function[dst.addr] = function
+                    traversed_cfg_nodes.add(dst)
+        boundary = set(traversed_cfg_nodes)
+
+        function_nodes = [ self.get_any_node(func_addr) for func_addr in sorted(tmp_functions) ]
+        for fn in function_nodes:
+            if fn is None:
+                continue
+            self._graph_bfs_custom(self.graph, [ fn ], self._graph_traversal_handler, blockaddr_to_function,
+                                   tmp_functions, traversed_cfg_nodes
+                                   )
+
+        to_remove = set()
+        for func_addr in tmp_functions:
+            function = self.kb.functions.function(addr=func_addr)
+            if function is None:
+                continue
+            if function.startpoint is None:
+                to_remove.add(func_addr)
+            elif self.project.arch.name not in {'ARMEL', 'ARMHF'}:
+                # Remove stubs after PLT entries
+                addr = func_addr - (func_addr % 16)
+                if addr != func_addr and addr in self.kb.functions and self.kb.functions[addr].is_plt:
+                    to_remove.add(func_addr)
+
+        for addr in to_remove:
+            del self.kb.functions[addr]
+
+        # Update CFGNode.function_address
+        for node in traversed_cfg_nodes - boundary:
+            if node.addr in blockaddr_to_function:
+                node.function_address = blockaddr_to_function[node.addr].addr
+
+        # mark endpoints
+        for func_addr in tmp_functions:
+            function = self.kb.functions.function(addr=func_addr)
+            if function is not None:
+                function.mark_nonreturning_calls_endpoints()
+
+        # other functions calling the rebuilt ones still refer to the old Function objects
+        callers = set()
+        for func_addr in tmp_functions:
+            if func_addr in callgraph:
+                callers.update(callgraph.predecessors(func_addr))
+        callers.difference_update(tmp_functions)
+        self._replace_function_nodes(callers, tmp_functions.values())
+
+    def _replace_function_nodes(self, function_addrs, stale_functions):
+        """
+        Replace removed Function objects in the transition graphs of some functions with the functions that are now at
+        the same addresses. Nodes of functions that no longer exist are removed.
+
+        :param iterable function_addrs:     Addresses of the functions whose transition graphs are updated.
+        :param iterable stale_functions:    The removed Function objects.
+        :return:                            None
+        """
+
+        stale_functions = list(stale_functions)
+        for func_addr in function_addrs:
+            function = self.kb.functions.function(addr=func_addr)
+            if function is None:
+                continue
+            mapping = { }
+            for old in stale_functions:
+                if old in function.transition_graph:
+                    new = self.kb.functions.function(addr=old.addr)
+                    if new is None:
+                        function.transition_graph.remove_node(old)
+                    elif new is not old:
+                        mapping[old] = new
+            if mapping:
+                networkx.relabel_nodes(function.transition_graph, mapping, copy=False)
+            function._local_transition_graph = None
+
     def _process_irrational_functions(self, functions, predetermined_function_addrs, blockaddr_to_function):
         """
         For unresolveable indirect jumps, angr marks those jump targets as individual functions. For example, usually
@@ -1,3 +1,4 @@
+import bisect
 import itertools
 import logging
 import math
@@ -10,6 +11,7 @@ from bintrees import AVLTree
 
 import claripy
 import cle
+from cle import TLSObject, ExternObject, KernelObject
 import pyvex
 from cle.address_translator import AT
 
@@ -17,6 +19,7 @@ from .cfg_arch_options import CFGArchOptions
 from .cfg_base import CFGBase, IndirectJump
 from .cfg_node import CFGNode
 from .indirect_jump_resolvers.default_resolvers import default_indirect_jump_resolvers
+from .prelift import prelift_blocks, lift_size_key
 from .. import register_analysis
 from ..forward_analysis import ForwardAnalysis
 from ... import sim_options as o
@@ -620,6 +623,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                  exclude_sparse_regions=True,
                  skip_specific_regions=True,
                  heuristic_plt_resolving=None,
+                 workers=1,
+                 compact_graph=False,
                  start=None,  # deprecated
                  end=None,  # deprecated
                  **extra_arch_options
@@ -655,6 +660,11 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                                              default indirect jump resolvers specific to this architecture and binary
                                              types will be loaded.
         :param base_state:              A state to use as a backer for all memory loads
+        :param int workers:             The number of worker processes to lift blocks in before the recovery starts.
+                                        The recovery itself is still serial, and yields the same CFG with any number
+                                        of workers. Blocks are only lifted in parallel if no base_state is specified.
+        :param bool compact_graph:      Store the graph in a CompactDiGraph, which uses much less memory per edge than a
+                                        networkx.DiGraph, but is slower to query.
         :param int start:               (Deprecated) The beginning address of CFG recovery.
         :param int end:                 (Deprecated) The end address of CFG recovery.
         :param CFGArchOptions arch_options: Architecture-specific options.
@@ -676,7 +686,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             normalize=normalize,
             binary=binary,
             force_segment=force_segment,
-            base_state=base_state)
+            base_state=base_state,
+            compact_graph=compact_graph)
 
         # necessary warnings
         if self.project.loader._auto_load_libs is True and end is None and len(self.project.loader.all_objects) > 3:
@@ -744,6 +755,10 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         self._extra_cross_references = extra_cross_references
 
+        self._workers = workers
+        # blocks lifted ahead of time, keyed by (address, size key)
+        self._prelifted = None
+
         try:
             self._arch_options = arch_options if arch_options is not None else CFGArchOptions(self.project.arch,
                                                                                               **extra_arch_options
@@ -876,6 +891,133 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         }
         return s
 
+    # Incremental update
+
+    def update(self, ranges=None, hooks=None, function_starts=None):
+        """
+        Update the CFG after the code in some address ranges changed, without recovering the whole CFG again.
+
+        Functions with a block overlapping with any of the changed ranges are removed from the graph and from the
+        knowledge base, and are recovered again from their start. Edges from unaffected blocks into removed blocks are
+        restored after the recovery. Ranges outside of the regions the CFG covers, for example newly mapped code, are
+        added to those regions and scanned. Post-processing, such as normalization and function rebuilding, only looks
+        at the recovered functions and the functions calling them. Blocks of other functions stay where they are.
+
+        :param list ranges:             A list of (start, end) tuples of the memory ranges whose bytes changed. End
+                                        addresses are exclusive.
+        :param list hooks:              A list of addresses that were hooked or unhooked.
+        :param list function_starts:    A list of addresses of new functions to scan.
+        :return:                        None
+        """
+        ranges = [ (start, end) for start, end in (ranges or [ ]) if end > start ]
+        ranges += [ (addr, addr + 1) for addr in (hooks or [ ]) ]
+        seeds = set(function_starts or [ ])
+
+        if ranges:
+            # the bytes of cached blocks may be stale
+            self.project.factory.default_engine.clear_cache()
+
+        for start, end in ranges:
+            if not self._inside_regions(start):
+                self._regions.insert(start, end)
+                self._regions_size += end - start
+                seeds.add(start)
+
+        # remove all blocks of the affected functions
+        dirty_nodes = self.nodes_in_ranges(ranges)
+        dirty_functions = set(n.function_address for n in dirty_nodes if n.function_address is not None)
+        removed = set(dirty_nodes)
+        removed.update(n for n in self.graph.nodes() if n.function_address in dirty_functions)
+
+        incoming_edges = [ ]
+        for dst in removed:
+            for src, _, data in self.graph.in_edges(dst, data=True):
+                if src not in removed:
+                    incoming_edges.append((src, dst.addr, dict(data)))
+
+        arm = self.project.arch.name in ('ARMLE', 'ARMHF')
+        for n in removed:
+            self._remove_node(n)
+            nodes = self._nodes_by_addr.get(n.addr, None)
+            if nodes is not None:
+                if n in nodes:
+                    nodes.remove(n)
+                if not nodes:
+                    del self._nodes_by_addr[n.addr]
+            self._traced_addresses.discard(((n.addr >> 1) << 1) if arm else n.addr)
+
+        # calls and jumps from other functions into the removed functions are restored once they are recovered
+        callgraph = self.kb.functions.callgraph
+        incoming_calls = [ ]
+        stale_functions = [ ]
+        for func_addr in dirty_functions:
+            function = self.kb.functions.function(addr=func_addr)
+            if function is not None:
+                stale_functions.append(function)
+                del self.kb.functions[func_addr]
+            if func_addr in callgraph:
+                incoming_calls.extend((src, func_addr, dict(data)) for src, _, data in
+                                      callgraph.in_edges(func_addr, data=True) if src not in dirty_functions)
+                callgraph.remove_node(func_addr)
+            self._function_exits.pop(func_addr, None)
+
+        l.debug("Updating the CFG: %d blocks in %d functions are removed.", len(removed), len(dirty_functions))
+
+        functions_before = set(self.kb.functions)
+        data_before = set(self._memory_data)
+
+        # recover the removed functions again
+        self._changed_functions = set()
+        for addr in sorted(dirty_functions | seeds, reverse=True):
+            if not self._inside_regions(addr):
+                continue
+            job = CFGJob(addr, addr, 'Ijk_Boring')
+            self._insert_job(job)
+            self._register_analysis_job(addr, job)
+
+        self._analysis_core_baremetal()
+
+        for src, dst_addr, data in incoming_edges:
+            dst = self._nodes.get(dst_addr, None)
+            if dst is not None and src in self.graph:
+                self._graph_add_edge(dst, src, data.get('jumpkind', None), data.get('ins_addr', None),
+                                     data.get('stmt_idx', None))
+
+        callers = self._restore_incoming_calls(incoming_calls, stale_functions)
+
+        # only the recovered functions, including new ones found while recovering them, and the functions calling them
+        # are post-processed again
+        recovered = set(a for a in dirty_functions | seeds if a in self.kb.functions)
+        recovered.update(a for a in self.kb.functions if a not in functions_before)
+        data_addrs = set(a for a in self._memory_data if a not in data_before)
+
+        self._normalized = False
+        self._post_analysis_incremental(recovered, data_addrs, callers=callers)
+
+    def _restore_incoming_calls(self, incoming_calls, stale_functions):
+        """
+        Restore call graph edges into functions that were removed and recovered again, and replace the removed Function
+        objects in the transition graphs of their callers with the recovered ones.
+
+        :param list incoming_calls:     A list of (caller address, callee address, edge data) tuples.
+        :param list stale_functions:    The removed Function objects.
+        :return:                        Addresses of the callers.
+        :rtype:                         set
+        """
+
+        callgraph = self.kb.functions.callgraph
+        callers = set()
+        for src, dst, data in incoming_calls:
+            if src not in self.kb.functions:
+                continue
+            callers.add(src)
+            if dst in self.kb.functions:
+                callgraph.add_edge(src, dst, **data)
+
+        self._replace_function_nodes(callers, stale_functions)
+
+        return callers
+
     # Methods for determining scanning scope
 
     def _inside_regions(self, address):
@@ -1168,6 +1310,31 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             # make function_prologue_addrs a set for faster lookups
             self._function_prologue_addrs = set(self._function_prologue_addrs)
 
+        if self._workers > 1 and self._base_state is None:
+            seeds = set(starting_points)
+            if self._function_prologue_addrs:
+                seeds |= self._function_prologue_addrs
+            self._prelifted = prelift_blocks(self.project, list(self._regions.iter_items()), seeds, self._workers,
+                                             sections=self._executable_sections())
+
+    def _executable_sections(self):
+        """
+        Get the executable sections of all objects covered by the recovery.
+
+        :return:    A sorted list of (start, end) tuples, or None if there is an object without sections.
+        """
+        sections = [ ]
+        for obj in self.project.loader.all_objects:
+            if isinstance(obj, (ExternObject, KernelObject, TLSObject)):
+                continue
+            executable = [ sec for sec in obj.sections if sec.is_executable ]
+            if not executable:
+                if any(self._inside_regions(seg.vaddr) for seg in obj.segments):
+                    return None
+                continue
+            sections.extend((sec.vaddr, sec.vaddr + sec.memsize) for sec in executable)
+        return sorted(sections)
+
     def _pre_job_handling(self, job):  # pylint:disable=arguments-differ
         """
         Some pre job-processing tasks, like update progress bar.
@@ -1322,12 +1489,15 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 self._insert_job(job)
                 self._register_analysis_job(addr, job)
 
-    def _post_analysis(self):
+    def _tidy_fakerets(self, functions):
+        """
+        Make sure all fake ret edges of the given functions are either confirmed or removed.
 
-        self._analyze_all_function_features()
+        :param iterable functions:  Functions to scan.
+        :return:                    None
+        """
 
-        # Scan all functions, and make sure all fake ret edges are either confirmed or removed
-        for f in self.functions.values():
+        for f in functions:
             all_edges = f.transition_graph.edges(data=True)
 
             callsites_to_functions = defaultdict(list) # callsites to functions mapping
@@ -1359,6 +1529,106 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             # Clear the cache
             f._local_transition_graph = None
 
+    def _post_analysis_incremental(self, function_addrs, data_addrs, callers=()):
+        """
+        Post-process the CFG after an incremental update. It does what _post_analysis() does, but only for the
+        recovered functions and the functions calling them.
+
+        :param set function_addrs:  Addresses of the functions recovered by the update.
+        :param set data_addrs:      Addresses of the memory data entries found by the update.
+        :param iterable callers:    Addresses of other functions calling the recovered functions.
+        :return:                    None
+        """
+
+        self._prelifted = None
+
+        callgraph = self.kb.functions.callgraph
+        callers = set(callers)
+        for func_addr in function_addrs:
+            if func_addr in callgraph:
+                callers.update(callgraph.predecessors(func_addr))
+        callers -= function_addrs
+
+        # _analyze_function_features() only looks at changed functions and their callers
+        self._changed_functions = set(function_addrs)
+        self._analyze_all_function_features()
+        self._changed_functions = set()
+
+        affected = [ self.functions.function(addr=a) for a in sorted(function_addrs | callers) ]
+        affected = [ f for f in affected if f is not None ]
+        self._tidy_fakerets(affected)
+        for f in affected:
+            if f.returning is None:
+                f.returning = len(f.endpoints) > 0  # pylint:disable=len-as-condition
+
+        if self.project.arch.name in ('X86', 'AMD64', 'MIPS32'):
+            self._remove_redundant_overlapping_blocks(nodes=self._overlapping_nodes(function_addrs))
+
+        if self._normalize:
+            self.normalize(nodes=self._overlapping_nodes(function_addrs))
+
+        # callers are rebuilt as well, so that their calls into the recovered functions match the graph
+        self._remake_functions(function_addrs | callers)
+        self.remove_function_alignments(function_addrs=function_addrs)
+
+        self._make_return_edges(function_addrs=function_addrs)
+
+        r = True
+        while r:
+            r = self._tidy_data_references(data_addrs=data_addrs)
+
+        if self._normalize:
+            for func_addr in function_addrs | callers:
+                f = self.functions.function(addr=func_addr)
+                if f is not None and not self.project.is_hooked(f.addr):
+                    f.normalize()
+
+    def _overlapping_nodes(self, function_addrs):
+        """
+        Get all nodes of the given functions, and all nodes of the graph that overlap with any of them.
+
+        :param set function_addrs:  Addresses of functions.
+        :return:                    A set of CFGNodes.
+        :rtype:                     set
+        """
+
+        nodes = set()
+        for func_addr in function_addrs:
+            f = self.functions.function(addr=func_addr)
+            if f is None:
+                continue
+            for block_addr in f.block_addrs_set:
+                nodes.update(self._nodes_by_addr.get(block_addr, [ ]))
+
+        ranges = sorted((n.addr, n.addr + n.size) for n in nodes if not n.is_simprocedure)
+        if not ranges:
+            return nodes
+        starts = [ start for start, _ in ranges ]
+        max_size = max(end - start for start, end in ranges)
+
+        for n in self.graph.nodes():
+            if n in nodes or n.is_simprocedure:
+                continue
+            # any range starting in [n.addr - max_size, n.addr + n.size) may overlap with n
+            i = bisect.bisect_left(starts, n.addr - max_size)
+            while i < len(ranges) and ranges[i][0] < n.addr + n.size:
+                if ranges[i][1] > n.addr:
+                    nodes.add(n)
+                    break
+                i += 1
+
+        return nodes
+
+    def _post_analysis(self):
+
+        # blocks lifted ahead of time that the recovery never reached
+        self._prelifted = None
+
+        self._analyze_all_function_features()
+
+        # Scan all functions, and make sure all fake ret edges are either confirmed or removed
+        self._tidy_fakerets(self.functions.values())
+
         # Scan all functions, and make sure .returning for all functions are either True or False
         for f in self.functions.values():
             if f.returning is None:
@@ -2114,9 +2384,11 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         self.insn_addr_to_memory_data[insn_addr] = self._memory_data[data_addr]
 
-    def _tidy_data_references(self):
+    def _tidy_data_references(self, data_addrs=None):
         """
 
+        :param set data_addrs:  Only tidy the memory data entries at these addresses. New entries found while doing so
+                                are added to the set. By default, all entries are tidied.
         :return: True if new data entries are found, False otherwise.
         :rtype: bool
         """
@@ -2124,6 +2396,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         # Make sure all memory data entries cover all data sections
         keys = sorted(self._memory_data.iterkeys())
         for i, data_addr in enumerate(keys):
+            if data_addrs is not None and data_addr not in data_addrs:
+                continue
             data = self._memory_data[data_addr]
             if self._addr_in_exec_memory_regions(data.address):
                 # TODO: Handle data among code regions (or executable regions)
@@ -2182,6 +2456,9 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             data_addr = keys[i]
             i += 1
 
+            if data_addrs is not None and data_addr not in data_addrs:
+                continue
+
             memory_data = self._memory_data[data_addr]
 
             if memory_data.sort in ('segment-boundary', ):
@@ -2213,6 +2490,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                                         max_size=memory_data.max_size - memory_data.size)
                     self._memory_data[new_addr] = new_md
                     keys.insert(i, new_addr)
+                    if data_addrs is not None:
+                        data_addrs.add(new_addr)
 
                 if data_type == 'pointer-array':
                     # make sure all pointers are identified
@@ -2253,6 +2532,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                             self._memory_data[ptr] = MemoryData(ptr, 0, 'unknown', None, None, None, None,
                                                                 pointer_addr=data_addr + j
                                                                 )
+                            if data_addrs is not None:
+                                data_addrs.add(ptr)
                             new_data_found = True
 
             else:
@@ -2498,7 +2779,7 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
     # Removers
 
-    def _remove_redundant_overlapping_blocks(self):
+    def _remove_redundant_overlapping_blocks(self, nodes=None):
         """
         On some architectures there are sometimes garbage bytes (usually nops) between functions in order to properly
         align the succeeding function. CFGFast does a linear sweeping which might create duplicated blocks for
@@ -2507,10 +2788,13 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         This method enumerates all blocks and remove overlapping blocks if one of them is aligned to 0x10 and the other
         contains only garbage bytes.
 
+        :param iterable nodes:  Only look at these nodes. By default, all nodes in the graph are looked at.
         :return: None
         """
 
-        sorted_nodes = sorted(self.graph.nodes(), key=lambda n: n.addr if n is not None else 0)
+        if nodes is None:
+            nodes = self.graph.nodes()
+        sorted_nodes = sorted((n for n in nodes if n in self.graph), key=lambda n: n.addr if n is not None else 0)
 
         all_plt_stub_addrs = set(itertools.chain.from_iterable(obj.reverse_plt.keys() for obj in self.project.loader.all_objects if isinstance(obj, cle.MetaELF)))
 
@@ -2944,15 +3228,22 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         return endpoints
 
-    def _make_return_edges(self):
+    def _make_return_edges(self, function_addrs=None):
         """
         For each returning function, create return edges in self.graph.
 
+        :param iterable function_addrs: Only create return edges of the functions at these addresses. By default,
+                                        return edges of all functions are created.
         :return: None
         """
 
-        for func_addr, func in self.functions.iteritems():
-            if func.returning is False:
+        if function_addrs is None:
+            functions = self.functions.iteritems()
+        else:
+            functions = ((a, self.functions.function(addr=a)) for a in sorted(function_addrs))
+
+        for func_addr, func in functions:
+            if func is None or func.returning is False:
                 continue
 
             # get the node on CFG
@@ -3372,7 +3663,11 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 irsb = None
                 irsb_string = None
                 try:
-                    lifted_block = self._lift(addr, size=distance)
+                    prelifted = self._prelifted.pop((addr, lift_size_key(distance)), None) if self._prelifted else None
+                    if prelifted is not None:
+                        lifted_block = self._lift(addr, vex=prelifted)
+                    else:
+                        lifted_block = self._lift(addr, size=distance)
                     irsb = lifted_block.vex
                     irsb_string = lifted_block.bytes[:irsb.size]
                 except SimTranslationError:
@@ -0,0 +1,756 @@
+import mmap
+import struct
+import collections
+import cPickle as pickle
+from cStringIO import StringIO
+
+import networkx
+
+import logging
+l = logging.getLogger("angr.analyses.cfg.cfg_snapshot")
+
+from ...errors import AngrCFGError
+
+MAGIC = 'ANGRCFG\x00'
+
+_NONE64 = 0xffffffffffffffff
+_NONE32 = 0xffffffff
+
+# magic, version, index offset, index size
+_HEADER = struct.Struct('<8sIQI')
+# address, size, function address, instruction offset, instruction count, byte string offset, byte string size,
+# simprocedure name, syscall name, flags
+_NODE = struct.Struct('<QIQQIQIiiB')
+# source node, destination node, jumpkind, instruction address, statement ID
+_EDGE = struct.Struct('<IIiQi')
+# instruction address
+_INSN = struct.Struct('<Q')
+# address, name, pickle offset, pickle size, flags
+_FUNCTION = struct.Struct('<QiQIB')
+# source function, destination function, type
+_CALL_EDGE = struct.Struct('<QQi')
+# address, size, sort, irsb address, statement ID, instruction address, pointer address, maximum size, references
+# offset, references count, content offset, content size
+_MEMORY_DATA = struct.Struct('<QIiQiQQIQIQI')
+# irsb address, statement ID, instruction address
+_REF = struct.Struct('<QiQ')
+
+# flags of nodes
+_NODE_THUMB = 1
+_NODE_SYSCALL = 2
+_NODE_NO_RET = 4
+_NODE_HAS_RETURN = 8
+_NODE_BLOCK_ID = 16
+
+# flags of functions
+_FUNCTION_PLT = 1
+_FUNCTION_SYSCALL = 2
+_FUNCTION_SIMPROCEDURE = 4
+
+
+class _Table(object):
+    """
+    A read-only array of fixed-size records in a buffer, sorted by their first field.
+    """
+
+    __slots__ = ('_buf', '_offset', '_struct', '_key', '_count', )
+
+    def __init__(self, buf, offset, record, count):
+        self._buf = buf
+        self._offset = offset
+        self._struct = record
+        self._key = struct.Struct('<' + record.format[1])
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._struct.unpack_from(self._buf, self._offset + i * self._struct.size)
+
+    def key(self, i):
+        return self._key.unpack_from(self._buf, self._offset + i * self._struct.size)[0]
+
+    def bisect_left(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key):
+        """
+        Get the indices of all records whose first field is `key`.
+        """
+        i = self.bisect_left(key)
+        while i < self._count and self.key(i) == key:
+            yield i
+            i += 1
+
+
+class _Writer(object):
+    """
+    Collects the string table and the blob area of a snapshot while it is being written.
+    """
+
+    def __init__(self):
+        self.strings = [ ]
+        self._string_ids = { }
+        self.blobs = StringIO()
+
+    def string(self, s):
+        if s is None:
+            return -1
+        try:
+            return self._string_ids[s]
+        except KeyError:
+            self._string_ids[s] = len(self.strings)
+            self.strings.append(s)
+            return self._string_ids[s]
+
+    def value(self, v):
+        """
+        Encode an int that may be None or a string instead, like statement IDs.
+        """
+        if v is None:
+            return -1
+        if isinstance(v, (int, long)) and v >= 0:
+            return v
+        return -2 - self.string(v)
+
+    def blob(self, data):
+        if data is None:
+            return 0, _NONE32
+        offset = self.blobs.tell()
+        self.blobs.write(data)
+        return offset, len(data)
+
+
+class CFGSnapshot(object):
+    """
+    A compact, memory-mapped snapshot of a CFGFast and of the functions in its knowledge base.
+
+    Nodes, edges, the call graph and memory data are stored as arrays of fixed-size records, sorted by address, so they
+    are looked up directly in the mapped file. Since the file is mapped read-only, every process loading the same
+    snapshot shares one copy of it. CFGNodes, Function and MemoryData instances are only created when they are
+    accessed.
+
+    Each function is stored as its own pickle. The functions a materialized function refers to in its transition
+    graph, which are its callees, start out as empty stubs that materialize themselves on first attribute access.
+
+    IRSBs of nodes are not kept, and only the jumpkind, ins_addr and stmt_idx attributes of edges are kept.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, project, buf, kb=None):
+        """
+        :param project:     The project of the CFG.
+        :param buf:         The buffer holding the snapshot, usually a mmap.
+        :param kb:          The knowledge base that materialized functions belong to. Defaults to project.kb.
+        """
+        self.project = project
+        self.kb = kb if kb is not None else project.kb
+        self._buf = buf
+
+        magic, version, index_offset, index_size = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise AngrCFGError("This is not a CFG snapshot.")
+        if version != self.FORMAT_VERSION:
+            raise AngrCFGError("Unsupported CFG snapshot format version %d." % version)
+
+        index = pickle.loads(buf[index_offset : index_offset + index_size])
+        self._strings = index['strings']
+        self._blobs_offset = index['blobs']
+        self._indirect_jumps_blob = index['indirect_jumps']
+
+        tables = index['tables']
+        self._nodes = _Table(buf, tables['nodes'][0], _NODE, tables['nodes'][1])
+        self._edges = _Table(buf, tables['edges'][0], _EDGE, tables['edges'][1])
+        self._insns = _Table(buf, tables['insns'][0], _INSN, tables['insns'][1])
+        self._function_table = _Table(buf, tables['functions'][0], _FUNCTION, tables['functions'][1])
+        self._call_edges = _Table(buf, tables['call_edges'][0], _CALL_EDGE, tables['call_edges'][1])
+        self._memory_data_table = _Table(buf, tables['memory_data'][0], _MEMORY_DATA, tables['memory_data'][1])
+        self._refs = _Table(buf, tables['refs'][0], _REF, tables['refs'][1])
+
+        # materialized objects
+        self._node_cache = { }
+        self._node_indices = { }
+        self._cfg = None
+        self._cfg_complete = False
+
+        self.functions = SnapshotFunctions(self)
+        self.memory_data = SnapshotMemoryData(self)
+
+    #
+    # Saving and loading
+    #
+
+    @staticmethod
+    def dump(cfg, path):
+        """
+        Save a CFGFast and the functions in its knowledge base as a snapshot.
+
+        :param cfg:         The CFGFast instance.
+        :param str path:    Path of the snapshot file.
+        :return:            None
+        """
+        if cfg.sort != 'fast':
+            raise AngrCFGError("Only CFGFast can be saved as a snapshot.")
+
+        w = _Writer()
+
+        # nodes
+        nodes = sorted(cfg.graph.nodes(), key=lambda n: n.addr)
+        node_indices = { }
+        node_records = [ ]
+        insn_records = [ ]
+        for i, n in enumerate(nodes):
+            node_indices[n] = i
+            flags = 0
+            if n.thumb:
+                flags |= _NODE_THUMB
+            if n.is_syscall:
+                flags |= _NODE_SYSCALL
+            if n.no_ret:
+                flags |= _NODE_NO_RET
+            if n.has_return:
+                flags |= _NODE_HAS_RETURN
+            if n.block_id is not None:
+                if n.block_id != n.addr:
+                    l.warning("Block ID %s of node %s is not its address. It is not saved.", n.block_id, n)
+                flags |= _NODE_BLOCK_ID
+            bytes_offset, bytes_size = w.blob(n.byte_string)
+            node_records.append(_NODE.pack(n.addr,
+                                           _NONE32 if n.size is None else n.size,
+                                           _NONE64 if n.function_address is None else n.function_address,
+                                           len(insn_records),
+                                           len(n.instruction_addrs),
+                                           bytes_offset,
+                                           bytes_size,
+                                           w.string(n.simprocedure_name),
+                                           w.string(n.syscall_name),
+                                           flags,
+                                           ))
+            insn_records.extend(_INSN.pack(a) for a in n.instruction_addrs)
+
+        # edges
+        edges = [ ]
+        for src, dst, data in cfg.graph.edges(data=True):
+            ins_addr = data.get('ins_addr', None)
+            edges.append((node_indices[src], node_indices[dst], w.string(data.get('jumpkind', None)),
+                          _NONE64 if ins_addr is None else ins_addr, w.value(data.get('stmt_idx', None))))
+        edge_records = [ _EDGE.pack(*e) for e in sorted(edges) ]
+
+        # functions
+        function_records = [ ]
+        function_manager = cfg.kb.functions
+        for func_addr in sorted(function_manager.keys()):
+            func = function_manager[func_addr]
+            flags = 0
+            if func.is_plt:
+                flags |= _FUNCTION_PLT
+            if func.is_syscall:
+                flags |= _FUNCTION_SYSCALL
+            if func.is_simprocedure:
+                flags |= _FUNCTION_SIMPROCEDURE
+            blob_offset, blob_size = w.blob(CFGSnapshot._dump_function(func, cfg.project, function_manager))
+            function_records.append(_FUNCTION.pack(func_addr, w.string(func.name), blob_offset, blob_size, flags))
+
+        call_edges = [ (src, dst, w.string(data.get('type', None)))
+                       for src, dst, data in function_manager.callgraph.edges(data=True) ]
+        call_edge_records = [ _CALL_EDGE.pack(*e) for e in sorted(call_edges) ]
+
+        # memory data
+        memory_data_records = [ ]
+        ref_records = [ ]
+        for addr in sorted(cfg.memory_data.iterkeys()):
+            d = cfg.memory_data[addr]
+            content = None if d.content is None else pickle.dumps(d.content, pickle.HIGHEST_PROTOCOL)
+            content_offset, content_size = w.blob(content)
+            memory_data_records.append(_MEMORY_DATA.pack(d.address,
+                                                         _NONE32 if d.size is None else d.size,
+                                                         w.string(d.sort),
+                                                         _NONE64 if d.irsb_addr is None else d.irsb_addr,
+                                                         w.value(d.stmt_idx),
+                                                         _NONE64 if d.insn_addr is None else d.insn_addr,
+                                                         _NONE64 if d.pointer_addr is None else d.pointer_addr,
+                                                         _NONE32 if d.max_size is None else d.max_size,
+                                                         len(ref_records),
+                                                         len(d.refs),
+                                                         content_offset,
+                                                         content_size,
+                                                         ))
+            for irsb_addr, stmt_idx, insn_addr in sorted(d.refs):
+                ref_records.append(_REF.pack(_NONE64 if irsb_addr is None else irsb_addr,
+                                             w.value(stmt_idx),
+                                             _NONE64 if insn_addr is None else insn_addr))
+
+        indirect_jumps = w.blob(pickle.dumps(cfg.indirect_jumps, pickle.HIGHEST_PROTOCOL))
+
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, CFGSnapshot.FORMAT_VERSION, 0, 0))
+
+            tables = { }
+            for name, records in (('nodes', node_records),
+                                  ('edges', edge_records),
+                                  ('insns', insn_records),
+                                  ('functions', function_records),
+                                  ('call_edges', call_edge_records),
+                                  ('memory_data', memory_data_records),
+                                  ('refs', ref_records),
+                                  ):
+                f.write('\x00' * (-f.tell() % 8))
+                tables[name] = (f.tell(), len(records))
+                f.write(''.join(records))
+
+            blobs_offset = f.tell()
+            f.write(w.blobs.getvalue())
+
+            index = pickle.dumps({
+                'tables': tables,
+                'strings': w.strings,
+                'blobs': blobs_offset,
+                'indirect_jumps': indirect_jumps,
+            }, pickle.HIGHEST_PROTOCOL)
+            index_offset = f.tell()
+            f.write(index)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, CFGSnapshot.FORMAT_VERSION, index_offset, len(index)))
+
+        l.debug("Saved a CFG snapshot of %d nodes, %d edges and %d functions to %s.",
+                len(node_records), len(edge_records), len(function_records), path)
+
+    @staticmethod
+    def _dump_function(func, project, function_manager):
+        """
+        Pickle the state of a function. The project, the function manager and all functions it refers to are stored as
+        references.
+        """
+        f = StringIO()
+        p = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+
+        def persistent_id(o):
+            if o is project:
+                return 'p'
+            if o is function_manager:
+                return 'm'
+            if isinstance(o, Function):
+                return 'f%x' % o.addr
+            return None
+
+        p.persistent_id = persistent_id
+        p.dump(func.__dict__)
+        return f.getvalue()
+
+    @classmethod
+    def load(cls, project, path, kb=None):
+        """
+        Load a snapshot by mapping its file into memory.
+
+        :param project:     The project of the CFG.
+        :param str path:    Path of the snapshot file.
+        :param kb:          The knowledge base that materialized functions belong to. Defaults to project.kb.
+        :return:            The snapshot.
+        :rtype:             CFGSnapshot
+        """
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(project, buf, kb=kb)
+
+    def close(self):
+        """
+        Unmap the snapshot. Objects materialized so far stay valid, but function stubs can no longer be materialized.
+        """
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    #
+    # Decoding
+    #
+
+    def _string(self, i):
+        return None if i == -1 else self._strings[i]
+
+    def _value(self, v):
+        if v == -1:
+            return None
+        if v >= 0:
+            return v
+        return self._strings[-2 - v]
+
+    def _blob(self, offset, size):
+        if size == _NONE32:
+            return None
+        start = self._blobs_offset + offset
+        return self._buf[start : start + size]
+
+    #
+    # Nodes
+    #
+
+    def _cfg_object(self):
+        """
+        Get the CFGFast instance that materialized nodes belong to, without materializing its graph.
+        """
+        if self._cfg is None:
+            cfg = CFGFast.__new__(CFGFast)
+            cfg.project = self.project
+            cfg.kb = self.kb
+            cfg.named_errors = { }
+            cfg.errors = [ ]
+            cfg.log = [ ]
+            cfg.sort = 'fast'
+            cfg._context_sensitivity_level = 0
+            cfg.__setstate__({
+                'graph': networkx.DiGraph(),
+                'indirect_jumps': pickle.loads(self._blob(*self._indirect_jumps_blob)),
+                '_nodes_by_addr': collections.defaultdict(list),
+                '_memory_data': { },
+            })
+            cfg._nodes = { }
+            cfg.insn_addr_to_memory_data = { }
+            self._cfg = cfg
+        return self._cfg
+
+    def _node(self, i):
+        try:
+            return self._node_cache[i]
+        except KeyError:
+            pass
+
+        addr, size, func_addr, insn_offset, insn_count, bytes_offset, bytes_size, simproc_name, syscall_name, \
+            flags = self._nodes[i]
+
+        node = CFGNode(addr,
+                       None if size == _NONE32 else size,
+                       self._cfg_object(),
+                       simprocedure_name=self._string(simproc_name),
+                       syscall_name=self._string(syscall_name),
+                       no_ret=bool(flags & _NODE_NO_RET),
+                       is_syscall=bool(flags & _NODE_SYSCALL),
+                       function_address=None if func_addr == _NONE64 else func_addr,
+                       block_id=addr if flags & _NODE_BLOCK_ID else None,
+                       instruction_addrs=[ self._insns[j][0] for j in xrange(insn_offset, insn_offset + insn_count) ],
+                       thumb=bool(flags & _NODE_THUMB),
+                       byte_string=self._blob(bytes_offset, bytes_size),
+                       )
+        node.has_return = bool(flags & _NODE_HAS_RETURN)
+
+        self._node_cache[i] = node
+        self._node_indices[node] = i
+        return node
+
+    def node_count(self):
+        return len(self._nodes)
+
+    def get_any_node(self, addr):
+        """
+        Get a node starting at an address.
+
+        :param int addr:    Address of the node.
+        :return:            A CFGNode, or None if there is no node starting at this address.
+        """
+        for i in self._nodes.find(addr):
+            return self._node(i)
+        return None
+
+    def get_all_nodes(self, addr):
+        """
+        Get all nodes starting at an address.
+
+        :param int addr:    Address of the nodes.
+        :return:            A list of CFGNodes.
+        """
+        return [ self._node(i) for i in self._nodes.find(addr) ]
+
+    def get_successors_and_jumpkind(self, node, excluding_fakeret=True):
+        """
+        Get the successors of a node along with the jumpkinds of the edges to them.
+
+        :param CFGNode node:            A node from this snapshot.
+        :param bool excluding_fakeret:  True to exclude successors connected to the node with a fakeret edge.
+        :return:                        A list of (CFGNode, jumpkind) tuples.
+        """
+        successors = [ ]
+        for j in self._edges.find(self._node_indices[node]):
+            _, dst, jumpkind, _, _ = self._edges[j]
+            jumpkind = self._string(jumpkind)
+            if not excluding_fakeret or jumpkind != 'Ijk_FakeRet':
+                successors.append((self._node(dst), jumpkind))
+        return successors
+
+    @property
+    def cfg(self):
+        """
+        The CFGFast instance, with all its nodes, edges and memory data materialized.
+        """
+        cfg = self._cfg_object()
+        if self._cfg_complete:
+            return cfg
+
+        for i in xrange(len(self._nodes)):
+            node = self._node(i)
+            cfg.graph.add_node(node)
+            if node.addr not in cfg._nodes:
+                cfg._nodes[node.addr] = node
+            cfg._nodes_by_addr[node.addr].append(node)
+
+        for i in xrange(len(self._edges)):
+            src, dst, jumpkind, ins_addr, stmt_idx = self._edges[i]
+            cfg.graph.add_edge(self._node(src), self._node(dst),
+                               jumpkind=self._string(jumpkind),
+                               ins_addr=None if ins_addr == _NONE64 else ins_addr,
+                               stmt_idx=self._value(stmt_idx),
+                               )
+
+        for addr, d in self.memory_data.iteritems():
+            cfg.memory_data[addr] = d
+            for _, _, insn_addr in d.refs:
+                if insn_addr is not None:
+                    cfg.insn_addr_to_memory_data[insn_addr] = d
+
+        self._cfg_complete = True
+        return cfg
+
+    #
+    # Functions
+    #
+
+    def _load_function(self, i, cache):
+        """
+        Materialize a function. Functions it refers to are created as stubs, which are materialized when they are first
+        used.
+        """
+        func = self._function_stub(self._function_table.key(i), cache)
+        if type(func) is _FunctionStub:  # pylint:disable=unidiomatic-typecheck
+            self._materialize_function(func)
+        return func
+
+    def _function_stub(self, addr, cache):
+        try:
+            return cache[addr]
+        except KeyError:
+            pass
+        f = _FunctionStub.__new__(_FunctionStub)
+        f.__dict__['_snapshot_load'] = (self, addr, cache)
+        cache[addr] = f
+        return f
+
+    def _materialize_function(self, f):
+        """
+        Load the state of a function stub from the snapshot, and turn it into a Function.
+        """
+        _, addr, cache = f.__dict__.pop('_snapshot_load')
+        f.__class__ = Function
+
+        def persistent_load(pid):
+            if pid == 'p':
+                return self.project
+            if pid == 'm':
+                return self.kb.functions
+            if pid[0] == 'f':
+                return self._function_stub(int(pid[1:], 16), cache)
+            raise pickle.UnpicklingError("Unknown persistent id %r" % pid)
+
+        j = self._function_table.bisect_left(addr)
+        if j < len(self._function_table) and self._function_table.key(j) == addr:
+            _, _, blob_offset, blob_size, _ = self._function_table[j]
+            p = pickle.Unpickler(StringIO(self._blob(blob_offset, blob_size)))
+            p.persistent_load = persistent_load
+            f.__dict__.update(p.load())
+        else:
+            # a function that is referred to but was not in the function manager
+            f.__init__(self.kb.functions, addr)
+
+    def restore_functions(self, kb=None):
+        """
+        Materialize all functions and put them, along with the call graph, into the function manager of a knowledge
+        base.
+
+        :param kb:  The knowledge base. Defaults to the knowledge base of this snapshot.
+        :return:    The function manager.
+        """
+        if kb is not None and kb is not self.kb:
+            raise AngrCFGError("Functions can only be restored into the knowledge base the snapshot is loaded with.")
+        function_manager = self.kb.functions
+        function_manager.clear()
+        for addr, func in self.functions.iteritems():
+            function_manager[addr] = func
+        function_manager.callgraph = self.functions.callgraph.copy()
+        return function_manager
+
+
+class SnapshotFunctions(collections.Mapping):
+    """
+    A read-only mapping of function addresses to functions in a snapshot, materializing functions on access. It
+    supports the lookup methods of FunctionManager.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._table = snapshot._function_table
+        self._cache = { }
+        self._callgraph = None
+
+    def _index(self, addr):
+        i = self._table.bisect_left(addr)
+        if i < len(self._table) and self._table.key(i) == addr:
+            return i
+        return None
+
+    def _get(self, i):
+        addr = self._table.key(i)
+        if addr not in self._cache:
+            self._snapshot._load_function(i, self._cache)
+        return self._cache[addr]
+
+    def __getitem__(self, k):
+        if isinstance(k, (int, long)):
+            f = self.function(addr=k)
+        elif isinstance(k, str):
+            f = self.function(name=k)
+        else:
+            raise ValueError("SnapshotFunctions.__getitem__ does not support keys of type %s" % type(k))
+
+        if f is None:
+            raise KeyError(k)
+        return f
+
+    def __len__(self):
+        return len(self._table)
+
+    def __iter__(self):
+        for i in xrange(len(self._table)):
+            yield self._table.key(i)
+
+    def __contains__(self, addr):
+        return isinstance(addr, (int, long)) and self._index(addr) is not None
+
+    def contains_addr(self, addr):
+        return self._index(addr) is not None
+
+    def function(self, addr=None, name=None, plt=None):
+        """
+        Get a function.
+
+        :param int addr:            Address of the function.
+        :param str name:            Name of the function.
+        :param bool or None plt:    True to find the PLT stub, False to find a non-PLT stub, None to disable this
+                                    restriction.
+        :return:                    The Function instance, or None if the function is not found.
+        """
+        if addr is not None:
+            i = self._index(addr)
+            candidates = [ ] if i is None else [ i ]
+        elif name is not None:
+            candidates = (i for i in xrange(len(self._table)) if self._snapshot._string(self._table[i][1]) == name)
+        else:
+            return None
+
+        for i in candidates:
+            is_plt = bool(self._table[i][4] & _FUNCTION_PLT)
+            if plt is None or is_plt == plt:
+                return self._get(i)
+        return None
+
+    def floor_func(self, addr):
+        i = self._table.bisect_left(addr + 1) - 1
+        return self._get(i) if i >= 0 else None
+
+    def ceiling_func(self, addr):
+        i = self._table.bisect_left(addr)
+        return self._get(i) if i < len(self._table) else None
+
+    @property
+    def callgraph(self):
+        if self._callgraph is None:
+            g = networkx.MultiDiGraph()
+            g.add_nodes_from(self)
+            table = self._snapshot._call_edges
+            for i in xrange(len(table)):
+                src, dst, type_ = table[i]
+                g.add_edge(src, dst, type=self._snapshot._string(type_))
+            self._callgraph = g
+        return self._callgraph
+
+
+class SnapshotMemoryData(collections.Mapping):
+    """
+    A read-only mapping of addresses to MemoryData instances in a snapshot, materializing them on access.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._table = snapshot._memory_data_table
+        self._cache = { }
+
+    def __getitem__(self, addr):
+        try:
+            return self._cache[addr]
+        except KeyError:
+            pass
+
+        for i in self._table.find(addr):
+            break
+        else:
+            raise KeyError(addr)
+
+        s = self._snapshot
+        address, size, sort, irsb_addr, stmt_idx, insn_addr, pointer_addr, max_size, refs_offset, refs_count, \
+            content_offset, content_size = self._table[i]
+
+        d = MemoryData(address, None if size == _NONE32 else size, s._string(sort), None,
+                       None if irsb_addr == _NONE64 else irsb_addr, None, s._value(stmt_idx),
+                       pointer_addr=None if pointer_addr == _NONE64 else pointer_addr,
+                       max_size=None if max_size == _NONE32 else max_size,
+                       insn_addr=None if insn_addr == _NONE64 else insn_addr,
+                       )
+        content = s._blob(content_offset, content_size)
+        if content is not None:
+            d.content = pickle.loads(content)
+        d.refs = set()
+        for j in xrange(refs_offset, refs_offset + refs_count):
+            ref_irsb_addr, ref_stmt_idx, ref_insn_addr = s._refs[j]
+            d.refs.add((None if ref_irsb_addr == _NONE64 else ref_irsb_addr,
+                        s._value(ref_stmt_idx),
+                        None if ref_insn_addr == _NONE64 else ref_insn_addr))
+
+        self._cache[addr] = d
+        return d
+
+    def __len__(self):
+        return len(self._table)
+
+    def __iter__(self):
+        for i in xrange(len(self._table)):
+            yield self._table.key(i)
+
+from .cfg_fast import CFGFast, MemoryData
+from .cfg_node import CFGNode
+from ...knowledge_plugins.functions import Function
+
+
+class _FunctionStub(Function):
+    """
+    A function in a snapshot that has not been materialized yet. Its state is loaded from the snapshot on the first
+    access to any of its attributes, after which it is a plain Function. Since functions hash by identity, stubs can be
+    put into the transition graphs of other functions before they are loaded.
+    """
+
+    def __getattr__(self, name):
+        try:
+            snapshot = self.__dict__['_snapshot_load'][0]
+        except KeyError:
+            raise AttributeError(name)
+        snapshot._materialize_function(self)
+        return getattr(self, name)
+
+    def __repr__(self):
+        return '<Function stub %#x>' % self.__dict__['_snapshot_load'][1]
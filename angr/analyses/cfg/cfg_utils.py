@@ -1,4 +1,5 @@
 
+import itertools
 from collections import defaultdict
 
 import networkx
@@ -110,6 +111,116 @@ class CFGUtils(object):
             addrs_to_index[n.addr] = i
         return sorted(nodes, key=lambda n: addrs_to_index[n.addr], reverse=True)
 
+    @staticmethod
+    def scc_reverse_post_order(graph, startpoints=None):
+        """
+        Sort all nodes in a graph in reverse post-order while keeping each strongly connected component contiguous.
+
+        Strongly connected components are ordered by a reverse post-order of the condensed graph. Inside each
+        component, the node through which the depth-first search entered it becomes the loop head. The head is placed
+        first, edges going back to it are removed, and the rest of the component is sorted recursively in the same
+        way. Loop heads are exactly where a fixed-point iteration should widen, so they are collected along the way,
+        one for each (nested) strongly connected component.
+
+        :param networkx.DiGraph graph: The graph to sort.
+        :param iterable startpoints:   Nodes to start the traversal from. Nodes without predecessors are used if None.
+        :return:                       A tuple of (a list of sorted nodes, a set of loop heads).
+        :rtype:                        tuple
+        """
+
+        nodes = graph.nodes()
+        if startpoints is None:
+            startpoints = [ n for n in nodes if graph.in_degree(n) == 0 ]
+            if not startpoints and nodes:
+                startpoints = [ nodes[0] ]
+
+        ordered_nodes = [ ]
+        loop_heads = set()
+
+        CFGUtils._scc_reverse_post_order(graph, nodes, None, startpoints, ordered_nodes, loop_heads)
+
+        return ordered_nodes, loop_heads
+
+    @staticmethod
+    def _scc_reverse_post_order(graph, nodes, head, startpoints, ordered_nodes, loop_heads):
+        """
+        Sort nodes of a graph region in reverse post-order, and recurse into every strongly connected component.
+
+        :param networkx.DiGraph graph: The graph where all nodes belong to.
+        :param list nodes:             Nodes of the region to sort.
+        :param head:                   Head of the region. Edges going to the head are ignored. None for the whole
+                                       graph.
+        :param iterable startpoints:   Nodes to start the traversal from.
+        :param list ordered_nodes:     Ordered nodes. Sorted nodes are appended to it.
+        :param set loop_heads:         Loop heads found so far.
+        :return:                       None
+        """
+
+        region = set(nodes)
+
+        def _successors(node):
+            return [ succ for succ in graph.successors(node) if succ in region and succ != head ]
+
+        # Tarjan's algorithm, made iterative so that large graphs do not hit the recursion limit. Components are
+        # emitted in reverse topological order, and since the depth-first search begins from the startpoints,
+        # reversing them gives a reverse post-order of the condensed graph.
+        dfs_index = { }
+        low_link = { }
+        stack = [ ]
+        on_stack = set()
+        sccs = [ ]
+
+        for root in itertools.chain(startpoints, nodes):
+            if root in dfs_index or root not in region:
+                continue
+
+            dfs_index[root] = low_link[root] = len(dfs_index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [ (root, iter(_successors(root))) ]
+
+            while work:
+                node, succs = work[-1]
+                for succ in succs:
+                    if succ not in dfs_index:
+                        dfs_index[succ] = low_link[succ] = len(dfs_index)
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(_successors(succ))))
+                        break
+                    elif succ in on_stack:
+                        low_link[node] = min(low_link[node], dfs_index[succ])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low_link[parent] = min(low_link[parent], low_link[node])
+
+                    if low_link[node] == dfs_index[node]:
+                        scc = [ ]
+                        while True:
+                            n = stack.pop()
+                            on_stack.discard(n)
+                            scc.append(n)
+                            if n == node:
+                                break
+                        sccs.append(scc)
+
+        for scc in reversed(sccs):
+            if len(scc) == 1:
+                node = scc[0]
+                if node != head and graph.has_edge(node, node):
+                    # self loop
+                    loop_heads.add(node)
+                ordered_nodes.append(node)
+                continue
+
+            # the first node that the depth-first search reached is where the component is entered
+            scc_head = min(scc, key=lambda n: dfs_index[n])
+            loop_heads.add(scc_head)
+            scc.sort(key=lambda n: dfs_index[n])
+            CFGUtils._scc_reverse_post_order(graph, scc, scc_head, [ scc_head ], ordered_nodes, loop_heads)
+
     @staticmethod
     def quasi_topological_sort_nodes(graph, nodes=None):
         """
@@ -0,0 +1,788 @@
+import array
+import weakref
+
+import networkx
+
+# flags of edge attributes stored in arrays
+_JUMPKIND = 1
+_INS_ADDR = 2
+_INS_ADDR_NONE = 4
+_STMT_IDX = 8
+
+_MAX_ADDR = 256 ** array.array('L').itemsize - 1
+_MAX_VALUE_ID = 2 ** 15 - 1
+
+
+class _EdgeData(object):
+    """
+    A live view of the attributes of an edge, behaving like the attribute dict of an edge in networkx. Once the edge is
+    removed from the graph, the view keeps a copy of its attributes, like the dict networkx would have returned.
+    """
+
+    __slots__ = ('_g', '_eid', '__weakref__', )
+
+    def __init__(self, g, eid):
+        self._g = g
+        self._eid = eid
+
+    def __getitem__(self, k):
+        return self._g._get_attr(self._eid, k)
+
+    def __setitem__(self, k, v):
+        self._g._set_attr(self._eid, k, v)
+
+    def __delitem__(self, k):
+        self._g._del_attr(self._eid, k)
+
+    def __contains__(self, k):
+        try:
+            self._g._get_attr(self._eid, k)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self._g._attr_keys(self._eid))
+
+    def __len__(self):
+        return len(self._g._attr_keys(self._eid))
+
+    def __eq__(self, other):
+        if isinstance(other, _EdgeData):
+            other = other.copy()
+        return self.copy() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def get(self, k, default=None):
+        try:
+            return self._g._get_attr(self._eid, k)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._g._attr_keys(self._eid)
+
+    def values(self):
+        return [ self[k] for k in self.keys() ]
+
+    def items(self):
+        return [ (k, self[k]) for k in self.keys() ]
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def update(self, other=None, **kwargs):
+        if other is not None:
+            for k in other.keys():
+                self[k] = other[k]
+        for k, v in kwargs.iteritems():
+            self[k] = v
+
+    def copy(self):
+        return dict(self.items())
+
+
+class _DetachedEdgeAttrs(object):
+    """
+    The attributes of an edge that was removed from a CompactDiGraph, kept for the views of it that are still around.
+    """
+
+    __slots__ = ('_attrs', )
+
+    def __init__(self, attrs):
+        self._attrs = attrs
+
+    def _get_attr(self, eid, k):  # pylint:disable=unused-argument
+        return self._attrs[k]
+
+    def _set_attr(self, eid, k, v):  # pylint:disable=unused-argument
+        self._attrs[k] = v
+
+    def _del_attr(self, eid, k):  # pylint:disable=unused-argument
+        del self._attrs[k]
+
+    def _attr_keys(self, eid):  # pylint:disable=unused-argument
+        return list(self._attrs)
+
+
+class _AdjView(object):
+    """
+    A view of the successors (or predecessors) of a node, mapping each of them to the attributes of the edge between
+    them, like G[n] in networkx.
+    """
+
+    __slots__ = ('_g', '_id', '_out', )
+
+    def __init__(self, g, node_id, out):
+        self._g = g
+        self._id = node_id
+        self._out = out
+
+    def _edge_ids(self):
+        return self._g._out_edge_ids(self._id) if self._out else self._g._in_edge_ids(self._id)
+
+    def _other(self, eid):
+        return self._g._nodes[self._g._dst[eid] if self._out else self._g._src[eid]]
+
+    def __iter__(self):
+        for eid in self._edge_ids():
+            yield self._other(eid)
+
+    def __len__(self):
+        return sum(1 for _ in self._edge_ids())
+
+    def __contains__(self, n):
+        return self._find(n) is not None
+
+    def _find(self, n):
+        other_id = self._g._node_id(n)
+        if other_id is None:
+            return None
+        if self._out:
+            return self._g._find_edge(self._id, other_id)
+        return self._g._find_edge(other_id, self._id)
+
+    def __getitem__(self, n):
+        eid = self._find(n)
+        if eid is None:
+            raise KeyError(n)
+        return self._g._edge_data(eid)
+
+    def get(self, n, default=None):
+        eid = self._find(n)
+        return default if eid is None else self._g._edge_data(eid)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [ (self._other(eid), self._g._edge_data(eid)) for eid in self._edge_ids() ]
+
+    iterkeys = __iter__
+
+    def iteritems(self):
+        return iter(self.items())
+
+
+class _AdjacencyView(object):
+    """
+    A view mapping each node to its _AdjView, like G.succ, G.pred and G.adj in networkx.
+    """
+
+    __slots__ = ('_g', '_out', )
+
+    def __init__(self, g, out):
+        self._g = g
+        self._out = out
+
+    def __getitem__(self, n):
+        node_id = self._g._node_id(n)
+        if node_id is None:
+            raise KeyError(n)
+        return _AdjView(self._g, node_id, self._out)
+
+    def __contains__(self, n):
+        return n in self._g
+
+    def __iter__(self):
+        return iter(self._g)
+
+    def __len__(self):
+        return len(self._g)
+
+    def keys(self):
+        return list(self._g)
+
+    def items(self):
+        return [ (n, self[n]) for n in self._g ]
+
+    def iteritems(self):
+        return iter(self.items())
+
+
+class _NodeAttrView(object):
+    """
+    A view mapping each node to its attribute dict, like G.node in networkx.
+    """
+
+    __slots__ = ('_g', )
+
+    def __init__(self, g):
+        self._g = g
+
+    def __getitem__(self, n):
+        node_id = self._g._node_id(n)
+        if node_id is None:
+            raise KeyError(n)
+        return self._g._node_attrs.setdefault(node_id, { })
+
+    def __contains__(self, n):
+        return n in self._g
+
+    def __iter__(self):
+        return iter(self._g)
+
+    def __len__(self):
+        return len(self._g)
+
+    def items(self):
+        return [ (n, self[n]) for n in self._g ]
+
+    def iteritems(self):
+        return iter(self.items())
+
+
+class CompactDiGraph(object):
+    """
+    A directed graph storing its edges in flat arrays instead of dicts.
+
+    Each node is given an integer ID. The edges are kept in parallel arrays of source IDs, destination IDs, and the
+    jumpkind, ins_addr and stmt_idx attributes of CFG edges, and are chained into per-node lists of outgoing and incoming
+    edges. An edge therefore costs a few dozen bytes instead of the several dicts networkx allocates for it. Attributes
+    that do not fit into the arrays are kept in a dict per edge.
+
+    The graph implements the part of the networkx DiGraph API used by CFGs and the analyses on top of them, and enough
+    of its internals (G[n], succ, pred, adj, node) for networkx algorithms to run on it. Like networkx 1.x, nodes(),
+    edges(), successors() and predecessors() return lists. Edge attributes are returned as live views, one per edge,
+    which keep a copy of the attributes once their edge is removed.
+    """
+
+    def __init__(self, data=None, **attr):
+        self.graph = { }
+        self.graph.update(attr)
+        self.clear()
+
+        if data is not None:
+            for n in data.nodes():
+                self.add_node(n)
+            for u, v, d in data.edges(data=True):
+                self.add_edge(u, v, **dict(d.items()))
+
+    def clear(self):
+        # views of the edges that are being removed keep their attributes
+        for eid, view in list(getattr(self, '_views', { }).items()):
+            view._g = _DetachedEdgeAttrs(self._attrs_of(eid))
+
+        # nodes
+        self._ids = { }
+        self._nodes = [ ]
+        self._free_nodes = [ ]
+        self._node_attrs = { }
+        self._out_head = array.array('l')
+        self._out_tail = array.array('l')
+        self._in_head = array.array('l')
+        self._in_tail = array.array('l')
+
+        # edges
+        self._src = array.array('l')
+        self._dst = array.array('l')
+        self._next_out = array.array('l')
+        self._next_in = array.array('l')
+        self._flags = array.array('B')
+        self._jumpkind = array.array('h')
+        self._ins_addr = array.array('L')
+        self._stmt_idx = array.array('l')
+        self._edge_attrs = { }
+        self._free_edges = [ ]
+        self._edge_count = 0
+        # edge ID -> the view of its attributes, as long as anyone holds it
+        self._views = weakref.WeakValueDictionary()
+
+        # interned jumpkinds and non-integer statement IDs
+        self._values = [ ]
+        self._value_ids = { }
+
+    #
+    # Internals
+    #
+
+    def _node_id(self, n):
+        try:
+            return self._ids.get(n, None)
+        except TypeError:
+            # unhashable
+            return None
+
+    def _add_node(self, n):
+        node_id = self._ids.get(n, None)
+        if node_id is not None:
+            return node_id
+
+        if self._free_nodes:
+            node_id = self._free_nodes.pop()
+            self._nodes[node_id] = n
+            self._out_head[node_id] = self._out_tail[node_id] = -1
+            self._in_head[node_id] = self._in_tail[node_id] = -1
+        else:
+            node_id = len(self._nodes)
+            self._nodes.append(n)
+            self._out_head.append(-1)
+            self._out_tail.append(-1)
+            self._in_head.append(-1)
+            self._in_tail.append(-1)
+        self._ids[n] = node_id
+        return node_id
+
+    def _out_edge_ids(self, node_id):
+        eid = self._out_head[node_id]
+        while eid != -1:
+            # the next edge is read first, so that the current one may be removed
+            next_eid = self._next_out[eid]
+            yield eid
+            eid = next_eid
+
+    def _in_edge_ids(self, node_id):
+        eid = self._in_head[node_id]
+        while eid != -1:
+            next_eid = self._next_in[eid]
+            yield eid
+            eid = next_eid
+
+    def _find_edge(self, src_id, dst_id):
+        for eid in self._out_edge_ids(src_id):
+            if self._dst[eid] == dst_id:
+                return eid
+        return None
+
+    def _new_edge(self, src_id, dst_id):
+        if self._free_edges:
+            eid = self._free_edges.pop()
+            self._src[eid] = src_id
+            self._dst[eid] = dst_id
+            self._next_out[eid] = self._next_in[eid] = -1
+            self._flags[eid] = 0
+        else:
+            eid = len(self._src)
+            self._src.append(src_id)
+            self._dst.append(dst_id)
+            self._next_out.append(-1)
+            self._next_in.append(-1)
+            self._flags.append(0)
+            self._jumpkind.append(0)
+            self._ins_addr.append(0)
+            self._stmt_idx.append(0)
+
+        # append the edge to the lists of its nodes, keeping the order edges were added in
+        tail = self._out_tail[src_id]
+        if tail == -1:
+            self._out_head[src_id] = eid
+        else:
+            self._next_out[tail] = eid
+        self._out_tail[src_id] = eid
+
+        tail = self._in_tail[dst_id]
+        if tail == -1:
+            self._in_head[dst_id] = eid
+        else:
+            self._next_in[tail] = eid
+        self._in_tail[dst_id] = eid
+
+        self._edge_count += 1
+        return eid
+
+    def _remove_edge_id(self, eid):
+        src_id, dst_id = self._src[eid], self._dst[eid]
+
+        prev = -1
+        cur = self._out_head[src_id]
+        while cur != eid:
+            prev, cur = cur, self._next_out[cur]
+        if prev == -1:
+            self._out_head[src_id] = self._next_out[eid]
+        else:
+            self._next_out[prev] = self._next_out[eid]
+        if self._out_tail[src_id] == eid:
+            self._out_tail[src_id] = prev
+
+        prev = -1
+        cur = self._in_head[dst_id]
+        while cur != eid:
+            prev, cur = cur, self._next_in[cur]
+        if prev == -1:
+            self._in_head[dst_id] = self._next_in[eid]
+        else:
+            self._next_in[prev] = self._next_in[eid]
+        if self._in_tail[dst_id] == eid:
+            self._in_tail[dst_id] = prev
+
+        # the ID is reused by the next edge, so views of this one must not read through to the arrays anymore
+        view = self._views.pop(eid, None)
+        if view is not None:
+            view._g = _DetachedEdgeAttrs(self._attrs_of(eid))
+
+        self._src[eid] = self._dst[eid] = -1
+        self._edge_attrs.pop(eid, None)
+        self._free_edges.append(eid)
+        self._edge_count -= 1
+
+    def _value_id(self, v):
+        try:
+            return self._value_ids[v]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable
+            return None
+        if len(self._values) > _MAX_VALUE_ID:
+            return None
+        self._value_ids[v] = len(self._values)
+        self._values.append(v)
+        return self._value_ids[v]
+
+    def _get_attr(self, eid, k):
+        flags = self._flags[eid]
+        if k == 'jumpkind' and flags & _JUMPKIND:
+            return self._values[self._jumpkind[eid]]
+        if k == 'ins_addr' and flags & (_INS_ADDR | _INS_ADDR_NONE):
+            return None if flags & _INS_ADDR_NONE else self._ins_addr[eid]
+        if k == 'stmt_idx' and flags & _STMT_IDX:
+            v = self._stmt_idx[eid]
+            return v if v >= 0 else self._values[-1 - v]
+        attrs = self._edge_attrs.get(eid, None)
+        if attrs is None:
+            raise KeyError(k)
+        return attrs[k]
+
+    def _set_attr(self, eid, k, v):
+        self._del_attr(eid, k, missing_ok=True)
+
+        if k == 'jumpkind':
+            value_id = self._value_id(v)
+            if value_id is not None:
+                self._jumpkind[eid] = value_id
+                self._flags[eid] |= _JUMPKIND
+                return
+        elif k == 'ins_addr':
+            if v is None:
+                self._flags[eid] |= _INS_ADDR_NONE
+                return
+            if isinstance(v, (int, long)) and 0 <= v <= _MAX_ADDR:
+                self._ins_addr[eid] = v
+                self._flags[eid] |= _INS_ADDR
+                return
+        elif k == 'stmt_idx':
+            if isinstance(v, (int, long)) and 0 <= v <= 2 ** 31 - 1:
+                self._stmt_idx[eid] = v
+                self._flags[eid] |= _STMT_IDX
+                return
+            value_id = self._value_id(v)
+            if value_id is not None:
+                self._stmt_idx[eid] = -1 - value_id
+                self._flags[eid] |= _STMT_IDX
+                return
+
+        self._edge_attrs.setdefault(eid, { })[k] = v
+
+    def _del_attr(self, eid, k, missing_ok=False):
+        flags = self._flags[eid]
+        if k == 'jumpkind' and flags & _JUMPKIND:
+            self._flags[eid] = flags & ~_JUMPKIND
+        elif k == 'ins_addr' and flags & (_INS_ADDR | _INS_ADDR_NONE):
+            self._flags[eid] = flags & ~(_INS_ADDR | _INS_ADDR_NONE)
+        elif k == 'stmt_idx' and flags & _STMT_IDX:
+            self._flags[eid] = flags & ~_STMT_IDX
+        else:
+            attrs = self._edge_attrs.get(eid, None)
+            if attrs is not None and k in attrs:
+                del attrs[k]
+                if not attrs:
+                    del self._edge_attrs[eid]
+            elif not missing_ok:
+                raise KeyError(k)
+
+    def _attr_keys(self, eid):
+        flags = self._flags[eid]
+        keys = [ ]
+        if flags & _JUMPKIND:
+            keys.append('jumpkind')
+        if flags & (_INS_ADDR | _INS_ADDR_NONE):
+            keys.append('ins_addr')
+        if flags & _STMT_IDX:
+            keys.append('stmt_idx')
+        attrs = self._edge_attrs.get(eid, None)
+        if attrs is not None:
+            keys.extend(attrs)
+        return keys
+
+    def _attrs_of(self, eid):
+        return dict((k, self._get_attr(eid, k)) for k in self._attr_keys(eid))
+
+    def _edge_data(self, eid):
+        view = self._views.get(eid, None)
+        if view is None:
+            view = _EdgeData(self, eid)
+            self._views[eid] = view
+        return view
+
+    def _nbunch_ids(self, nbunch):
+        if nbunch is None:
+            return [ i for i, n in enumerate(self._nodes) if n is not None ]
+        node_id = self._node_id(nbunch)
+        if node_id is not None:
+            return [ node_id ]
+        return [ i for i in (self._node_id(n) for n in nbunch) if i is not None ]
+
+    def _edge_tuple(self, eid, data):
+        if data:
+            return self._nodes[self._src[eid]], self._nodes[self._dst[eid]], self._edge_data(eid)
+        return self._nodes[self._src[eid]], self._nodes[self._dst[eid]]
+
+    #
+    # Nodes
+    #
+
+    def add_node(self, n, attr_dict=None, **attr):
+        node_id = self._add_node(n)
+        if attr_dict:
+            self._node_attrs.setdefault(node_id, { }).update(attr_dict)
+        if attr:
+            self._node_attrs.setdefault(node_id, { }).update(attr)
+
+    def add_nodes_from(self, nodes, **attr):
+        for n in nodes:
+            self.add_node(n, **attr)
+
+    def remove_node(self, n):
+        node_id = self._node_id(n)
+        if node_id is None:
+            raise networkx.NetworkXError("The node %s is not in the graph." % (n, ))
+
+        for eid in list(self._out_edge_ids(node_id)):
+            self._remove_edge_id(eid)
+        for eid in list(self._in_edge_ids(node_id)):
+            self._remove_edge_id(eid)
+
+        del self._ids[n]
+        self._nodes[node_id] = None
+        self._node_attrs.pop(node_id, None)
+        self._free_nodes.append(node_id)
+
+    def remove_nodes_from(self, nodes):
+        for n in nodes:
+            if n in self:
+                self.remove_node(n)
+
+    def has_node(self, n):
+        return n in self
+
+    def nodes(self, data=False):
+        if data:
+            return [ (n, self._node_attrs.get(self._ids[n], { })) for n in self ]
+        return list(self)
+
+    def nodes_iter(self, data=False):
+        return iter(self.nodes(data=data))
+
+    def number_of_nodes(self):
+        return len(self._ids)
+
+    order = number_of_nodes
+
+    @property
+    def node(self):
+        return _NodeAttrView(self)
+
+    #
+    # Edges
+    #
+
+    def add_edge(self, u, v, attr_dict=None, **attr):
+        src_id = self._add_node(u)
+        dst_id = self._add_node(v)
+        eid = self._find_edge(src_id, dst_id)
+        if eid is None:
+            eid = self._new_edge(src_id, dst_id)
+        if attr_dict:
+            for k, val in attr_dict.iteritems():
+                self._set_attr(eid, k, val)
+        for k, val in attr.iteritems():
+            self._set_attr(eid, k, val)
+
+    def add_edges_from(self, ebunch, **attr):
+        for e in ebunch:
+            if len(e) == 3:
+                u, v, d = e
+                self.add_edge(u, v, attr_dict=d, **attr)
+            else:
+                u, v = e
+                self.add_edge(u, v, **attr)
+
+    def remove_edge(self, u, v):
+        src_id, dst_id = self._node_id(u), self._node_id(v)
+        eid = self._find_edge(src_id, dst_id) if src_id is not None and dst_id is not None else None
+        if eid is None:
+            raise networkx.NetworkXError("The edge %s-%s is not in the graph." % (u, v))
+        self._remove_edge_id(eid)
+
+    def remove_edges_from(self, ebunch):
+        for e in ebunch:
+            if self.has_edge(e[0], e[1]):
+                self.remove_edge(e[0], e[1])
+
+    def has_edge(self, u, v):
+        src_id, dst_id = self._node_id(u), self._node_id(v)
+        return src_id is not None and dst_id is not None and self._find_edge(src_id, dst_id) is not None
+
+    def get_edge_data(self, u, v, default=None):
+        src_id, dst_id = self._node_id(u), self._node_id(v)
+        eid = self._find_edge(src_id, dst_id) if src_id is not None and dst_id is not None else None
+        return default if eid is None else self._edge_data(eid)
+
+    def out_edges(self, nbunch=None, data=False):
+        return [ self._edge_tuple(eid, data) for node_id in self._nbunch_ids(nbunch)
+                 for eid in self._out_edge_ids(node_id) ]
+
+    edges = out_edges
+
+    def in_edges(self, nbunch=None, data=False):
+        return [ self._edge_tuple(eid, data) for node_id in self._nbunch_ids(nbunch)
+                 for eid in self._in_edge_ids(node_id) ]
+
+    def edges_iter(self, nbunch=None, data=False):
+        return iter(self.out_edges(nbunch=nbunch, data=data))
+
+    out_edges_iter = edges_iter
+
+    def in_edges_iter(self, nbunch=None, data=False):
+        return iter(self.in_edges(nbunch=nbunch, data=data))
+
+    def number_of_edges(self, u=None, v=None):
+        if u is None:
+            return self._edge_count
+        return 1 if self.has_edge(u, v) else 0
+
+    def size(self):
+        return self._edge_count
+
+    #
+    # Neighbors and degrees
+    #
+
+    def successors(self, n):
+        node_id = self._node_id(n)
+        if node_id is None:
+            raise networkx.NetworkXError("The node %s is not in the graph." % (n, ))
+        return [ self._nodes[self._dst[eid]] for eid in self._out_edge_ids(node_id) ]
+
+    neighbors = successors
+
+    def predecessors(self, n):
+        node_id = self._node_id(n)
+        if node_id is None:
+            raise networkx.NetworkXError("The node %s is not in the graph." % (n, ))
+        return [ self._nodes[self._src[eid]] for eid in self._in_edge_ids(node_id) ]
+
+    def successors_iter(self, n):
+        return iter(self.successors(n))
+
+    neighbors_iter = successors_iter
+
+    def predecessors_iter(self, n):
+        return iter(self.predecessors(n))
+
+    def out_degree(self, nbunch=None):
+        node_id = self._node_id(nbunch) if nbunch is not None else None
+        if node_id is not None:
+            return sum(1 for _ in self._out_edge_ids(node_id))
+        return dict((self._nodes[i], sum(1 for _ in self._out_edge_ids(i))) for i in self._nbunch_ids(nbunch))
+
+    def in_degree(self, nbunch=None):
+        node_id = self._node_id(nbunch) if nbunch is not None else None
+        if node_id is not None:
+            return sum(1 for _ in self._in_edge_ids(node_id))
+        return dict((self._nodes[i], sum(1 for _ in self._in_edge_ids(i))) for i in self._nbunch_ids(nbunch))
+
+    def degree(self, nbunch=None):
+        node_id = self._node_id(nbunch) if nbunch is not None else None
+        if node_id is not None:
+            return self.out_degree(nbunch) + self.in_degree(nbunch)
+        out_degrees = self.out_degree(nbunch)
+        in_degrees = self.in_degree(nbunch)
+        return dict((n, out_degrees[n] + in_degrees[n]) for n in out_degrees)
+
+    @property
+    def succ(self):
+        return _AdjacencyView(self, True)
+
+    adj = succ
+
+    @property
+    def pred(self):
+        return _AdjacencyView(self, False)
+
+    def __getitem__(self, n):
+        return self.succ[n]
+
+    #
+    # Graph
+    #
+
+    def __contains__(self, n):
+        return self._node_id(n) is not None
+
+    def __iter__(self):
+        # nodes are iterated in the order they were added in
+        return (n for n in self._nodes if n is not None)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def is_directed():
+        return True
+
+    @staticmethod
+    def is_multigraph():
+        return False
+
+    def __getstate__(self):
+        s = dict(self.__dict__)
+        del s['_views']
+        return s
+
+    def __setstate__(self, s):
+        self.__dict__.update(s)
+        self._views = weakref.WeakValueDictionary()
+
+    def copy(self):
+        g = CompactDiGraph(self)
+        g.graph.update(self.graph)
+        for n, attrs in self.nodes(data=True):
+            if attrs:
+                g.add_node(n, **attrs)
+        return g
+
+    def subgraph(self, nbunch):
+        nodes = set(n for n in nbunch if n in self)
+        g = CompactDiGraph()
+        g.graph.update(self.graph)
+        for n in nodes:
+            g.add_node(n, **self._node_attrs.get(self._ids[n], { }))
+        for u, v, d in self.out_edges(nodes, data=True):
+            if v in nodes:
+                g.add_edge(u, v, **dict(d.items()))
+        return g
+
+    def to_networkx(self):
+        """
+        Convert the graph to a networkx DiGraph.
+
+        :rtype: networkx.DiGraph
+        """
+        g = networkx.DiGraph()
+        g.graph.update(self.graph)
+        for n, attrs in self.nodes(data=True):
+            g.add_node(n, **attrs)
+        for u, v, d in self.out_edges(data=True):
+            g.add_edge(u, v, **dict(d.items()))
+        return g
@@ -0,0 +1,130 @@
+import sys
+import bisect
+import multiprocessing
+import cPickle as pickle
+
+import logging
+l = logging.getLogger("angr.analyses.cfg.prelift")
+
+from ...errors import SimEngineError, SimMemoryError, SimTranslationError
+
+VEX_IRSB_MAX_SIZE = 400
+
+# the project held by each worker process. workers inherit it when they are forked.
+_worker_project = None
+
+
+def lift_size_key(distance):
+    """
+    Normalize the maximum size a block is lifted with the same way SimEngineVEX does, so that it can be used as a key.
+    """
+    return VEX_IRSB_MAX_SIZE if distance is None else min(distance, VEX_IRSB_MAX_SIZE)
+
+
+def _section_distance(sections, addr):
+    """
+    Get the distance between an address and the end of the executable section it belongs to, like CFGFast does.
+
+    :param sections:    A sorted list of (start, end) tuples of executable sections, or None if they are unknown.
+    :return:            The distance, or None if it is unknown.
+    """
+    if not sections:
+        return None
+    i = bisect.bisect_right(sections, (addr, float('inf'))) - 1
+    if i < 0 or not sections[i][0] <= addr < sections[i][1]:
+        return None
+    return min(sections[i][1] - addr, VEX_IRSB_MAX_SIZE)
+
+
+def _lift_chunk(start, end, seeds, sections):
+    """
+    Lift the blocks reachable from some seed addresses through direct jumps, without leaving a chunk of memory.
+
+    :return:    A pickled list of ((address, size key), IRSB) tuples.
+    """
+    project = _worker_project
+    lifted = [ ]
+    traced = set()
+    queue = [ a for a in seeds if start <= a < end ]
+
+    while queue:
+        addr = queue.pop()
+        if addr in traced:
+            continue
+        traced.add(addr)
+
+        distance = _section_distance(sections, addr)
+        try:
+            irsb = project.factory.block(addr, size=distance).vex
+        except (SimEngineError, SimMemoryError, SimTranslationError):
+            continue
+        if irsb.size == 0 or irsb.jumpkind == 'Ijk_NoDecode':
+            continue
+        lifted.append(((addr, lift_size_key(distance)), irsb))
+
+        targets = set(irsb.constant_jump_targets)
+        if irsb.jumpkind == 'Ijk_Call' or irsb.jumpkind.startswith('Ijk_Sys'):
+            targets.add(addr + irsb.size)
+        for target in targets:
+            if start <= target < end and target not in traced:
+                queue.append(target)
+
+    return pickle.dumps(lifted, pickle.HIGHEST_PROTOCOL)
+
+
+def _split_regions(regions, num_chunks):
+    total = sum(e - s for s, e in regions)
+    chunk_size = max(0x1000, total // max(num_chunks, 1))
+    chunks = [ ]
+    for start, end in regions:
+        while start < end:
+            chunks.append((start, min(start + chunk_size, end)))
+            start += chunk_size
+    return chunks
+
+
+def prelift_blocks(project, regions, seeds, workers, sections=None):
+    """
+    Lift blocks in a pool of worker processes ahead of a CFG recovery.
+
+    The regions are split into chunks, and each worker follows the direct jumps between blocks from the seed addresses
+    of a chunk. Blocks are lifted exactly like CFGFast lifts them when no base state is used, so that they can be used
+    in place of lifting them again.
+
+    :param project:     The project.
+    :param regions:     A list of (start, end) tuples of the memory regions to lift blocks in.
+    :param seeds:       An iterable of addresses to start following jumps from. Chunk starts are always used as seeds.
+    :param int workers: The number of worker processes.
+    :param sections:    A sorted list of (start, end) tuples of executable sections, or None.
+    :return:            A dict of (address, size key) -> IRSB.
+    """
+    global _worker_project  # pylint:disable=global-statement
+
+    if sys.platform.startswith('win'):
+        # workers cannot inherit the project without fork()
+        l.warning("Lifting blocks in parallel is not supported on Windows.")
+        return { }
+
+    chunks = _split_regions(regions, workers * 4)
+    seeds = sorted(set(seeds))
+    chunk_seeds = [ ]
+    for start, end in chunks:
+        lo, hi = bisect.bisect_left(seeds, start), bisect.bisect_left(seeds, end)
+        chunk_seeds.append([ start ] + seeds[lo:hi])
+
+    _worker_project = project
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = [ pool.apply_async(_lift_chunk, (start, end, s, sections))
+                    for (start, end), s in zip(chunks, chunk_seeds) ]
+        blocks = { }
+        for r in pending:
+            for key, irsb in pickle.loads(r.get()):
+                blocks[key] = irsb
+    finally:
+        pool.terminate()
+        pool.join()
+        _worker_project = None
+
+    l.debug("Lifted %d blocks in %d chunks with %d workers.", len(blocks), len(chunks), workers)
+    return blocks
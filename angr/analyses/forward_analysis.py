@@ -1,6 +1,7 @@
-import networkx
+import heapq
+import itertools
 
-from claripy.utils.orderedset import OrderedSet
+import networkx
 
 from ..misc.ux import deprecated
 # errors
@@ -22,9 +23,15 @@ class GraphVisitor(object):
     """
     def __init__(self):
 
-        self._sorted_nodes = OrderedSet()
+        # all nodes in traversal order
+        self._sorted_nodes = [ ]
         self._node_to_index = { }
         self._reached_fixedpoint = set()
+        self._widening_points = set()
+
+        # the worklist is a heap of indices into self._sorted_nodes
+        self._worklist = [ ]
+        self._worklist_indices = set()
 
     #
     # Interfaces
@@ -76,6 +83,28 @@ class GraphVisitor(object):
     # Public methods
     #
 
+    def widening_points(self):
+        """
+        Get all widening points in the graph, which are heads of (nested) strongly connected components. They are only
+        available after the nodes are sorted.
+
+        :return: A set of nodes.
+        :rtype:  set
+        """
+
+        return self._widening_points
+
+    def is_widening_point(self, node):
+        """
+        Check if a node is a widening point in the graph.
+
+        :param node: The node to check.
+        :return:     True if the node is a widening point, False otherwise.
+        :rtype:      bool
+        """
+
+        return node in self._widening_points
+
     def nodes(self):
         """
         Return an iterator of nodes following an optimal traversal order.
@@ -103,13 +132,16 @@ class GraphVisitor(object):
         :return: None
         """
 
-        self._sorted_nodes.clear()
         self._node_to_index.clear()
         self._reached_fixedpoint.clear()
 
-        for i, n in enumerate(self.sort_nodes()):
+        self._sorted_nodes = list(self.sort_nodes())
+        for i, n in enumerate(self._sorted_nodes):
             self._node_to_index[n] = i
-            self._sorted_nodes.add(n)
+
+        # all nodes are to be visited
+        self._worklist = list(range(len(self._sorted_nodes)))
+        self._worklist_indices = set(self._worklist)
 
     def next_node(self):
         """
@@ -118,10 +150,12 @@ class GraphVisitor(object):
         :return: A node in the graph.
         """
 
-        if not self._sorted_nodes:
+        if not self._worklist:
             return None
 
-        return self._sorted_nodes.pop(last=False)
+        index = heapq.heappop(self._worklist)
+        self._worklist_indices.discard(index)
+        return self._sorted_nodes[index]
 
     def all_successors(self, node, skip_reached_fixedpoint=False):
         """
@@ -156,13 +190,10 @@ class GraphVisitor(object):
         successors = self.successors(node) #, skip_reached_fixedpoint=True)
 
         if include_self:
-            self._sorted_nodes.add(node)
+            self._add_to_worklist(node)
 
         for succ in successors:
-            self._sorted_nodes.add(succ)
-
-        # reorder it
-        self._sorted_nodes = OrderedSet(sorted(self._sorted_nodes, key=lambda n: self._node_to_index[n]))
+            self._add_to_worklist(succ)
 
     def reached_fixedpoint(self, node):
         """
@@ -174,6 +205,42 @@ class GraphVisitor(object):
 
         self._reached_fixedpoint.add(node)
 
+    #
+    # Private methods
+    #
+
+    def _add_to_worklist(self, node):
+        """
+        Add a node to the worklist, unless it is already there.
+
+        :param node: The node to add.
+        :return:     None
+        """
+
+        index = self._node_to_index[node]
+        if index not in self._worklist_indices:
+            self._worklist_indices.add(index)
+            heapq.heappush(self._worklist, index)
+
+    def _sort_graph_nodes(self, graph, nodes=None):
+        """
+        Sort nodes of a graph in reverse post-order with strongly connected components kept together, and record all
+        loop heads as widening points.
+
+        :param networkx.DiGraph graph: The graph to sort.
+        :param iterable nodes:         A collection of nodes to sort. If none, all nodes in the graph will be used.
+        :return:                       A list of sorted nodes.
+        :rtype:                        list
+        """
+
+        sorted_nodes, self._widening_points = CFGUtils.scc_reverse_post_order(graph, startpoints=self.startpoints())
+
+        if nodes is not None:
+            nodes = set(nodes)
+            sorted_nodes = [ n for n in sorted_nodes if n in nodes ]
+
+        return sorted_nodes
+
 
 class FunctionGraphVisitor(GraphVisitor):
     def __init__(self, function):
@@ -202,12 +269,7 @@ class FunctionGraphVisitor(GraphVisitor):
 
     def sort_nodes(self, nodes=None):
 
-        sorted_nodes = CFGUtils.quasi_topological_sort_nodes(self.function.graph)
-
-        if nodes is not None:
-            sorted_nodes = [ n for n in sorted_nodes if n in set(nodes) ]
-
-        return sorted_nodes
+        return self._sort_graph_nodes(self.function.graph, nodes=nodes)
 
 
 class CallGraphVisitor(GraphVisitor):
@@ -245,12 +307,7 @@ class CallGraphVisitor(GraphVisitor):
 
     def sort_nodes(self, nodes=None):
 
-        sorted_nodes = CFGUtils.quasi_topological_sort_nodes(self.callgraph)
-
-        if nodes is not None:
-            sorted_nodes = [ n for n in sorted_nodes if n in set(nodes) ]
-
-        return sorted_nodes
+        return self._sort_graph_nodes(self.callgraph, nodes=nodes)
 
 
 #
@@ -318,6 +375,104 @@ class JobInfo(object):
         self.jobs.append((job, job_type))
 
 
+class JobInfoQueue(object):
+    """
+    A priority queue of JobInfo instances, ordered by a sorting key that is computed once when a job info is inserted.
+    Among job infos with the same key, the one that is inserted last comes first.
+
+    It is backed by a binary heap, so insertions and removals of the first job info take O(log n) time. Removing other
+    job infos is lazy and takes O(1) time. It supports the subset of list operations that ForwardAnalysis and its
+    subclasses use on the job queue.
+    """
+
+    def __init__(self, key):
+        """
+        :param func key: A method that takes a JobInfo instance and returns its sorting key.
+        """
+
+        self._key = key
+        self._heap = [ ]
+        # id of job info -> heap entry of the job info
+        self._entries = { }
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __nonzero__(self):
+        return bool(self._entries)
+
+    __bool__ = __nonzero__
+
+    def __contains__(self, job_info):
+        return id(job_info) in self._entries
+
+    def __iter__(self):
+        return iter([ entry[2] for entry in sorted(self._entries.values()) ])
+
+    def __getitem__(self, pos):
+        if pos == 0:
+            self._drop_removed()
+            if not self._heap:
+                raise IndexError('JobInfoQueue index out of range')
+            return self._heap[0][2]
+        return list(self)[pos]
+
+    def append(self, job_info):
+        """
+        Insert a job info at its position in the queue.
+
+        :param JobInfo job_info: The job info to insert.
+        :return:                 None
+        """
+
+        if id(job_info) in self._entries:
+            self.remove(job_info)
+
+        entry = [ self._key(job_info), -next(self._counter), job_info ]
+        self._entries[id(job_info)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, job_info):
+        """
+        Remove a job info from the queue.
+
+        :param JobInfo job_info: The job info to remove.
+        :return:                 None
+        """
+
+        entry = self._entries.pop(id(job_info), None)
+        if entry is None:
+            raise ValueError('JobInfoQueue.remove(x): x not in queue')
+        # the entry stays in the heap until it bubbles up to the top
+        entry[2] = None
+
+    def pop(self, pos=-1):
+        """
+        Remove a job info from the queue and return it.
+
+        :param int pos: Position of the job info.
+        :return:        The job info.
+        :rtype:         JobInfo
+        """
+
+        if pos != 0:
+            job_info = self[pos]
+            self.remove(job_info)
+            return job_info
+
+        self._drop_removed()
+        if not self._heap:
+            raise IndexError('pop from empty JobInfoQueue')
+        job_info = heapq.heappop(self._heap)[2]
+        del self._entries[id(job_info)]
+        return job_info
+
+    def _drop_removed(self):
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+
 class ForwardAnalysis(object):
     """
     This is my very first attempt to build a static forward analysis framework that can serve as the base of multiple
@@ -366,7 +521,10 @@ class ForwardAnalysis(object):
         self._should_abort = False
 
         # All remaining jobs
-        self._job_info_queue = [ ]
+        if self._order_jobs:
+            self._job_info_queue = JobInfoQueue(lambda job_info: self._job_sorting_key(job_info.job))
+        else:
+            self._job_info_queue = [ ]
 
         # A map between job key to job. Jobs with the same key will be merged by calling _merge_jobs()
         self._job_map = { }
@@ -621,14 +779,14 @@ class ForwardAnalysis(object):
                 continue
             except AngrSkipJobNotice:
                 # consume and skip this job
-                self._job_info_queue = self._job_info_queue[1:]
+                self._job_info_queue.pop(0)
                 self._job_map.pop(self._job_key(job_info.job), None)
                 continue
 
             # remove the job info from the map
             self._job_map.pop(self._job_key(job_info.job), None)
 
-            self._job_info_queue = self._job_info_queue[1:]
+            self._job_info_queue.pop(0)
 
             self._process_job_and_get_successors(job_info)
 
@@ -666,7 +824,7 @@ class ForwardAnalysis(object):
     def _insert_job(self, job):
         """
         Insert a new job into the job queue. If the job queue is ordered, this job will be inserted at the correct
-        position.
+        position in O(log n) time.
 
         :param job: The job to insert
         :return:    None
@@ -715,11 +873,8 @@ class ForwardAnalysis(object):
         else:
             job_info = JobInfo(key, job)
 
-        if self._order_jobs:
-            self._binary_insert(self._job_info_queue, job_info, lambda elem: self._job_sorting_key(elem.job))
-
-        else:
-            self._job_info_queue.append(job_info)
+        # an ordered job queue puts the job at its position by itself
+        self._job_info_queue.append(job_info)
 
     def _peek_job(self, pos):
         """
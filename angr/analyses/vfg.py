@@ -331,7 +331,7 @@ class VFG(ForwardAnalysis, Analysis):   # pylint:disable=abstract-method
 
         self._function_merge_points = {}
         self._function_widening_points = {}
-        self._function_node_addrs = {}  # sorted in reverse post-order
+        self._function_node_addrs = {}  # node address to its position in reverse post-order
 
         self._mergeable_plugins = ('memory', 'registers')
 
@@ -533,8 +533,8 @@ class VFG(ForwardAnalysis, Analysis):   # pylint:disable=abstract-method
             return 0
 
         try:
-            block_in_function_pos = self._ordered_node_addrs(job.func_addr).index(job.addr)
-        except ValueError:
+            block_in_function_pos = self._ordered_node_addrs(job.func_addr)[job.addr]
+        except KeyError:
             # block not found. what?
             block_in_function_pos = min(job.addr - job.func_addr, MAX_BLOCKS_PER_FUNCTION - 1)
 
@@ -1776,50 +1776,57 @@ class VFG(ForwardAnalysis, Analysis):   # pylint:disable=abstract-method
 
     def _widening_points(self, function_address):
         """
-        Return the ordered widening points for a specific function.
+        Return the widening points for a specific function.
 
         :param int function_address: Address of the querying function.
-        :return: A list of sorted merge points (addresses).
-        :rtype: list
+        :return: A set of widening point addresses.
+        :rtype: set
         """
 
-        # we are entering a new function. now it's time to figure out how to optimally traverse the control flow
-        # graph by generating the sorted merge points
-        try:
-            new_function = self.kb.functions[function_address]
-        except KeyError:
-            # the function does not exist
-            return [ ]
-
         if function_address not in self._function_widening_points:
-            if not new_function.normalized:
-                new_function.normalize()
-            widening_points = CFGUtils.find_widening_points(function_address, new_function.endpoints,
-                                                                    new_function.graph)
-            self._function_widening_points[function_address] = widening_points
+            self._sort_function_nodes(function_address)
 
         return self._function_widening_points[function_address]
 
     def _ordered_node_addrs(self, function_address):
         """
-        For a given function, return all nodes in an optimal traversal order. If the function does not exist, return an
-        empty list.
+        For a given function, return the positions of all nodes in an optimal traversal order. If the function does
+        not exist, return an empty dict.
 
         :param int function_address: Address of the function.
-        :return: A ordered list of the nodes.
-        :rtype: list
+        :return: A mapping from node addresses to their positions.
+        :rtype: dict
+        """
+
+        if function_address not in self._function_node_addrs:
+            self._sort_function_nodes(function_address)
+
+        return self._function_node_addrs[function_address]
+
+    def _sort_function_nodes(self, function_address):
+        """
+        Sort all nodes of a function in reverse post-order with strongly connected components kept together, and find
+        all widening points of the function. Results are cached.
+
+        :param int function_address: Address of the function.
+        :return: None
         """
 
         try:
             function = self.kb.functions[function_address]
         except KeyError:
             # the function does not exist
-            return [ ]
+            self._function_node_addrs[function_address] = { }
+            self._function_widening_points[function_address] = set()
+            return
 
-        if function_address not in self._function_node_addrs:
-            sorted_nodes = CFGUtils.quasi_topological_sort_nodes(function.graph)
-            self._function_node_addrs[function_address] = [ n.addr for n in sorted_nodes ]
+        if not function.normalized:
+            function.normalize()
 
-        return self._function_node_addrs[function_address]
+        sorted_nodes, _ = CFGUtils.scc_reverse_post_order(function.graph, startpoints=[ function.startpoint ])
+
+        self._function_node_addrs[function_address] = dict((n.addr, i) for i, n in enumerate(sorted_nodes))
+        self._function_widening_points[function_address] = set(
+            CFGUtils.find_widening_points(function_address, function.endpoints, function.graph))
 
 register_analysis(VFG, 'VFG')
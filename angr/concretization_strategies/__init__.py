@@ -6,6 +6,10 @@ class SimConcretizationStrategy(object):
     memory index concretization behavior can be modified.
     """
 
+    # whether the result only depends on the constraints of the state and on the address, so that it can be reused
+    # until the constraints change
+    deterministic = False
+
     def __init__(self, filter=None, exact=True): #pylint:disable=redefined-builtin
         """
         Initializes the base SimConcretizationStrategy.
@@ -5,5 +5,7 @@ class SimConcretizationStrategyMax(SimConcretizationStrategy):
     Concretization strategy that returns the maximum address.
     """
 
+    deterministic = True
+
     def _concretize(self, memory, addr):
         return [ self._max(memory, addr) ]
@@ -5,6 +5,8 @@ class SimConcretizationStrategyRange(SimConcretizationStrategy):
     Concretization strategy that resolves addresses to a range.
     """
 
+    deterministic = True
+
     def __init__(self, limit, **kwargs): #pylint:disable=redefined-builtin
         super(SimConcretizationStrategyRange, self).__init__(**kwargs)
         self._limit = limit
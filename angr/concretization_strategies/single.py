@@ -5,6 +5,8 @@ class SimConcretizationStrategySingle(SimConcretizationStrategy):
     Concretization strategy that ensures a single solution for an address.
     """
 
+    deterministic = True
+
     def _concretize(self, memory, addr):
         addrs = self._eval(memory, addr, 2)
         if len(addrs) == 1:
@@ -6,6 +6,8 @@ class SimConcretizationStrategySolutions(SimConcretizationStrategy):
     limited number of solutions.
     """
 
+    deterministic = True
+
     def __init__(self, limit, **kwargs):
         super(SimConcretizationStrategySolutions, self).__init__(**kwargs)
         self._limit = limit
@@ -1,7 +1,7 @@
 from .successors import SimSuccessors
 from .engine import SimEngine
 
-from .vex import SimEngineVEX
+from .vex import SimEngineVEX, PersistentLiftCache
 from .procedure import SimEngineProcedure
 from .unicorn import SimEngineUnicorn
 from .failure import SimEngineFailure
@@ -57,6 +57,9 @@ class SimEngine(object):
                 raise
             old_state.project._simos.handle_exception(successors, self, *sys.exc_info())
 
+        # categorize the successors whose satisfiability checks were batched
+        successors.categorize_deferred()
+
         new_state._inspect('engine_process', when=BP_AFTER, sim_successors=successors, address=addr)
         successors = new_state._inspect_getattr('sim_successors', successors)
 
@@ -46,6 +46,9 @@ class SimSuccessors(object):
         self.sort = None
         self.artifacts = {}
 
+        # successors whose satisfiability check is batched until the end of the step
+        self._deferred_sat_checks = [ ]
+
     @classmethod
     def failure(cls):
         return cls(None, None)
@@ -216,7 +219,6 @@ class SimSuccessors(object):
         """
 
         self.all_successors.append(state)
-        target = state.scratch.target
 
         # categorize the state
         if o.APPROXIMATE_GUARDS in state.options and state.se.is_false(state.scratch.guard, exact=False):
@@ -231,9 +233,26 @@ class SimSuccessors(object):
             self.unsat_successors.append(state)
         elif not state.scratch.guard.symbolic and state.se.is_false(state.scratch.guard):
             self.unsat_successors.append(state)
+        elif o.LAZY_SOLVES not in state.options and o.BATCH_SUCCESSOR_SAT_CHECKS in state.options:
+            self._deferred_sat_checks.append(state)
         elif o.LAZY_SOLVES not in state.options and not state.satisfiable():
             self.unsat_successors.append(state)
-        elif o.NO_SYMBOLIC_JUMP_RESOLUTION in state.options and state.se.symbolic(target):
+        else:
+            self._categorize_satisfiable_successor(state)
+
+        return state
+
+    def _categorize_satisfiable_successor(self, state):
+        """
+        Append a state that is known to be satisfiable (or is not checked at all) into successor lists.
+
+        :param state: a SimState instance
+        :return: The state
+        """
+
+        target = state.scratch.target
+
+        if o.NO_SYMBOLIC_JUMP_RESOLUTION in state.options and state.se.symbolic(target):
             self.unconstrained_successors.append(state)
         elif not state.se.symbolic(target) and not state.history.jumpkind.startswith("Ijk_Sys"):
             # a successor with a concrete IP, and it's not a syscall
@@ -306,6 +325,59 @@ class SimSuccessors(object):
         return state
 
 
+    def categorize_deferred(self):
+        """
+        Check the satisfiability of all successors whose check was deferred with BATCH_SUCCESSOR_SAT_CHECKS, in a
+        single batch, and categorize them.
+
+        :return: None
+        """
+        if not self._deferred_sat_checks:
+            return
+
+        states, self._deferred_sat_checks = self._deferred_sat_checks, [ ]
+        for state, sat in zip(states, self._batch_satisfiable(states)):
+            if sat:
+                self._categorize_satisfiable_successor(state)
+            else:
+                self.unsat_successors.append(state)
+
+    def _batch_satisfiable(self, states):
+        """
+        Check the satisfiability of several successor states.
+
+        All successors of a step extend the constraints of the initial state. Instead of solving each of them from
+        scratch, the constraints they add are checked as extra constraints on the solver of the initial state, which has
+        the shared constraints loaded already.
+
+        :param states:  A list of successor states.
+        :return:        A list of booleans, one per state.
+        """
+        base = self.initial_state
+        if len(states) < 2 or base is None or o.SYMBOLIC not in base.options or o.ABSTRACT_SOLVER in base.options \
+                or base._global_condition is not None:
+            return [ state.satisfiable() for state in states ]
+
+        prefix_keys = { c.cache_key for c in base.se.constraints }
+
+        results = [ ]
+        for state in states:
+            if state is base or state._global_condition is not None:
+                results.append(state.satisfiable())
+                continue
+
+            constraints = state.se.constraints
+            keys = { c.cache_key for c in constraints }
+            if not prefix_keys.issubset(keys):
+                # the initial state has been modified in place (e.g., by an inline step)
+                results.append(state.satisfiable())
+                continue
+
+            extra = [ c for c in constraints if c.cache_key not in prefix_keys ]
+            results.append(base.se.satisfiable(extra_constraints=extra))
+
+        return results
+
     # misc stuff
     @staticmethod
     def _resolve_syscall(state):
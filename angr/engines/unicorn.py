@@ -1,3 +1,4 @@
+import time
 import logging
 
 from ..engines import SimEngine
@@ -8,15 +9,65 @@ from ..state_plugins.inspect import BP_AFTER
 l = logging.getLogger("angr.engines.unicorn")
 
 
+class UnicornSiteStats(object):
+    """
+    What entering unicorn at one site, i.e., one block in one calling context, has been like so far.
+    """
+
+    __slots__ = ('entries', 'blocks', 'seconds', 'skipped', 'backoff', )
+
+    def __init__(self):
+        self.entries = 0
+        # moving averages of the blocks executed and the seconds spent per entry, including setup and teardown
+        self.blocks = 0.0
+        self.seconds = 0.0
+        # the number of times unicorn was skipped since it was last entered here, and how many skips to do in a row
+        self.skipped = 0
+        self.backoff = 1
+
+    def __repr__(self):
+        return "<UnicornSiteStats: %d entries, %.1f blocks and %.6f seconds on average>" % (self.entries, self.blocks,
+                                                                                            self.seconds)
+
+    def update(self, blocks, seconds, alpha):
+        if self.entries == 0:
+            self.blocks, self.seconds = float(blocks), seconds
+        else:
+            self.blocks += alpha * (blocks - self.blocks)
+            self.seconds += alpha * (seconds - self.seconds)
+        self.entries += 1
+
+
 class SimEngineUnicorn(SimEngine):
     """
     Concrete execution in the Unicorn Engine, a fork of qemu.
+
+    With UNICORN_ADAPTIVE_ENTRY, the engine keeps track of the blocks executed and the time spent per entry into
+    unicorn at every block and calling context. Once a site has been entered a few times, unicorn is skipped there if
+    the blocks it executes on average would take less time to step with VEX than an entry costs, which is the case at
+    sites that bail out early. Skipped sites are tried again after a number of skips that doubles every time unicorn
+    still does not pay off.
     """
-    def __init__(self, base_stop_points=None):
+    def __init__(self, base_stop_points=None, vex_block_cost=0.0005, min_site_entries=3, max_site_backoff=64,
+                 site_stats_alpha=0.25):
+        """
+        :param base_stop_points:    Addresses at which unicorn always stops.
+        :param vex_block_cost:      The estimated number of seconds it takes to step one block with VEX.
+        :param min_site_entries:    The number of entries at a site before unicorn may be skipped there.
+        :param max_site_backoff:    The maximum number of skips in a row at a site.
+        :param site_stats_alpha:    The weight of the latest entry in the averages of a site.
+        """
 
         super(SimEngineUnicorn, self).__init__()
 
         self.base_stop_points = base_stop_points
+        self.vex_block_cost = vex_block_cost
+        self.min_site_entries = min_site_entries
+        self.max_site_backoff = max_site_backoff
+        self.site_stats_alpha = site_stats_alpha
+
+        # (block address, call site address) -> UnicornSiteStats
+        self._site_stats = { }
 
     def process(self, state,
             step=None,
@@ -79,6 +130,10 @@ class SimEngineUnicorn(SimEngine):
             unicorn.countdown_symbolic_registers = unicorn.cooldown_symbolic_registers
             return False
 
+        if o.UNICORN_ADAPTIVE_ENTRY in state.options and self._skip_site(state):
+            l.info("entering unicorn does not pay off at this site")
+            return False
+
         return True
 
     def _process(self, state, successors, step, extra_stop_points):
@@ -109,6 +164,9 @@ class SimEngineUnicorn(SimEngine):
                 # will then be handled by another engine that can more accurately step instruction-by-instruction.
                 extra_stop_points.add(bp.kwargs["instruction"])
 
+        site = (successors.addr, state.callstack.call_site_addr)
+        start_time = time.time()
+
         # initialize unicorn plugin
         state.unicorn.setup()
         try:
@@ -121,6 +179,9 @@ class SimEngineUnicorn(SimEngine):
         finally:
             state.unicorn.destroy()
 
+        if o.UNICORN_ADAPTIVE_ENTRY in state.options:
+            self._record_site(site, state.unicorn.steps, time.time() - start_time)
+
         if state.unicorn.steps == 0 or state.unicorn.stop_reason == STOP.STOP_NOSTART:
             # fail out, force fallback to next engine
             successors.initial_state.unicorn.countdown_symbolic_memory = state.unicorn.countdown_symbolic_memory
@@ -149,6 +210,35 @@ class SimEngineUnicorn(SimEngine):
         successors.description = description
         successors.processed = True
 
+    def _record_site(self, site, blocks, seconds):
+        stats = self._site_stats.get(site, None)
+        if stats is None:
+            stats = self._site_stats[site] = UnicornSiteStats()
+        stats.update(blocks, seconds, self.site_stats_alpha)
+
+    def _skip_site(self, state):
+        """
+        Decide if stepping the current site with VEX is cheaper than entering unicorn, based on the previous entries.
+
+        :return:    True if unicorn should be skipped.
+        """
+        stats = self._site_stats.get((state.addr, state.callstack.call_site_addr), None)
+        if stats is None or stats.entries < self.min_site_entries:
+            return False
+
+        if stats.blocks * self.vex_block_cost >= stats.seconds:
+            stats.backoff = 1
+            return False
+
+        if stats.skipped < stats.backoff:
+            stats.skipped += 1
+            return True
+
+        # try again, and wait longer next time if it still does not pay off
+        stats.skipped = 0
+        stats.backoff = min(stats.backoff * 2, self.max_site_backoff)
+        return False
+
     @staticmethod
     def _countdown(state):
         state.unicorn.countdown_nonunicorn_blocks -= 1
@@ -164,10 +254,19 @@ class SimEngineUnicorn(SimEngine):
     def __setstate__(self, state):
         super(SimEngineUnicorn, self).__setstate__(state)
         self.base_stop_points = state['base_stop_points']
+        self.vex_block_cost = state['vex_block_cost']
+        self.min_site_entries = state['min_site_entries']
+        self.max_site_backoff = state['max_site_backoff']
+        self.site_stats_alpha = state['site_stats_alpha']
+        self._site_stats = { }
 
     def __getstate__(self):
         s = super(SimEngineUnicorn, self).__getstate__()
         s['base_stop_points'] = self.base_stop_points
+        s['vex_block_cost'] = self.vex_block_cost
+        s['min_site_entries'] = self.min_site_entries
+        s['max_site_backoff'] = self.max_site_backoff
+        s['site_stats_alpha'] = self.site_stats_alpha
         return s
 
 from ..state_plugins.unicorn_engine import STOP, _UC_NATIVE, unicorn as uc_module
@@ -12,8 +12,11 @@ from ...errors import (SimError, SimIRSBError, SimSolverError, SimMemoryAddressE
                        UnsupportedDirtyError, SimTranslationError, SimEngineError, SimSegfaultError,
                        SimMemoryError, SimIRSBNoDecodeError)
 from ..engine import SimEngine
+from ...misc import profiling
+from ...misc.profiling import profiled
 from .statements import translate_stmt
 from .expressions import translate_expr
+from .plan import IRSBPlan, STEP_STMT, STEP_IMARK, STEP_EXIT
 
 import logging
 l = logging.getLogger("angr.engines.vex.engine")
@@ -33,7 +36,12 @@ class SimEngineVEX(SimEngine):
             cache_size=10000,
             default_opt_level=1,
             support_selfmodifying_code=False,
-            single_step=False):
+            single_step=False,
+            persistent_cache=None):
+        """
+        :param persistent_cache:    A PersistentLiftCache that lifted blocks are additionally stored to and loaded
+                                    from. It may be shared by any number of engines and processes.
+        """
 
         super(SimEngineVEX, self).__init__()
 
@@ -43,18 +51,25 @@ class SimEngineVEX(SimEngine):
         self._support_selfmodifying_code = support_selfmodifying_code
         self._single_step = single_step
         self._cache_size = cache_size
+        self._persistent_cache = persistent_cache
 
         self._block_cache = None
+        self._plan_cache = None
         self._cache_hit_count = 0
         self._cache_miss_count = 0
+        self._persistent_cache_hit_count = 0
+        self._persistent_cache_miss_count = 0
 
         self._initialize_block_cache()
 
 
     def _initialize_block_cache(self):
         self._block_cache = LRUCache(maxsize=self._cache_size)
+        self._plan_cache = LRUCache(maxsize=self._cache_size)
         self._cache_hit_count = 0
         self._cache_miss_count = 0
+        self._persistent_cache_hit_count = 0
+        self._persistent_cache_miss_count = 0
 
     def process(self, state,
             irsb=None,
@@ -112,6 +127,20 @@ class SimEngineVEX(SimEngine):
         addr = successors.addr
 
         state._inspect('irsb', BP_BEFORE, address=addr)
+        prof = profiling.active_profiler
+        if prof is not None:
+            prof.enter('block %#x' % addr)
+        try:
+            self._process_irsb_loop(state, successors, addr, irsb, skip_stmts, last_stmt, whitelist, insn_bytes, size,
+                                    num_inst, traceflags, thumb, opt_level)
+        finally:
+            if prof is not None:
+                prof.exit()
+
+        successors.processed = True
+
+    def _process_irsb_loop(self, state, successors, addr, irsb, skip_stmts, last_stmt, whitelist, insn_bytes, size,
+                           num_inst, traceflags, thumb, opt_level):
         while True:
             if irsb is None:
                 irsb = self.lift(
@@ -171,12 +200,24 @@ class SimEngineVEX(SimEngine):
                 break
         state._inspect('irsb', BP_AFTER, address=addr)
 
-        successors.processed = True
+    def _get_plan(self, irsb):
+        """
+        Get the execution plan of an IRSB, building it if it is not cached yet.
+        """
+        if not self._use_cache:
+            return IRSBPlan(irsb)
+
+        # plans are keyed by the identity of the IRSB. the plan holds a reference to its IRSB, so the id of a cached
+        # plan cannot be reused by another IRSB
+        plan = self._plan_cache.get(id(irsb), None)
+        if plan is None or plan.irsb is not irsb:
+            plan = IRSBPlan(irsb)
+            self._plan_cache[id(irsb)] = plan
+        return plan
 
     def _handle_irsb(self, state, successors, irsb, skip_stmts, last_stmt, whitelist):
-        # shortcut. we'll be typing this a lot
-        ss = irsb.statements
-        num_stmts = len(ss)
+        plan = self._get_plan(irsb)
+        num_stmts = len(plan)
 
         # fill in artifacts
         successors.artifacts['irsb'] = irsb
@@ -184,43 +225,31 @@ class SimEngineVEX(SimEngine):
         successors.artifacts['irsb_direct_next'] = irsb.direct_next
         successors.artifacts['irsb_default_jumpkind'] = irsb.jumpkind
 
-        insn_addrs = [ ]
+        insn_addrs = plan.insn_addrs
 
         # if we've told the block to truncate before it ends, it will definitely have a default
         # exit barring errors
         has_default_exit = num_stmts <= last_stmt
 
         # This option makes us only execute the last four instructions
-        if o.SUPER_FASTPATH in state.options:
-            imark_counter = 0
-            for i in xrange(len(ss) - 1, -1, -1):
-                if type(ss[i]) is pyvex.IRStmt.IMark:
-                    imark_counter += 1
-                if imark_counter >= 4:
-                    skip_stmts = max(skip_stmts, i)
-                    break
+        if o.SUPER_FASTPATH in state.options and plan.fastpath_skip is not None:
+            skip_stmts = max(skip_stmts, plan.fastpath_skip)
 
         # set the current basic block address that's being processed
         state.scratch.bbl_addr = irsb.addr
 
-        for stmt_idx, stmt in enumerate(ss):
-            if isinstance(stmt, pyvex.IRStmt.IMark):
-                insn_addrs.append(stmt.addr + stmt.delta)
-
+        for stmt_idx, stmt, stmt_class, kind, insn_count in plan.steps:
             if stmt_idx < skip_stmts:
-                l.debug("Skipping statement %d", stmt_idx)
                 continue
             if last_stmt is not None and stmt_idx > last_stmt:
-                l.debug("Truncating statement %d", stmt_idx)
                 continue
             if whitelist is not None and stmt_idx not in whitelist:
-                l.debug("Blacklisting statement %d", stmt_idx)
                 continue
 
             try:
                 state.scratch.stmt_idx = stmt_idx
                 state._inspect('statement', BP_BEFORE, statement=stmt_idx)
-                self._handle_statement(state, successors, stmt)
+                self._handle_statement(state, successors, stmt, stmt_class=stmt_class, kind=kind)
                 state._inspect('statement', BP_AFTER)
             except UnsupportedDirtyError:
                 if o.BYPASS_UNSUPPORTED_IRDIRTY not in state.options:
@@ -234,11 +263,12 @@ class SimEngineVEX(SimEngine):
             except (SimSolverError, SimMemoryAddressError):
                 l.warning("%#x hit an error while analyzing statement %d", successors.addr, stmt_idx, exc_info=True)
                 has_default_exit = False
+                insn_addrs = insn_addrs[:insn_count]
                 break
 
         state.scratch.stmt_idx = num_stmts
 
-        successors.artifacts['insn_addrs'] = insn_addrs
+        successors.artifacts['insn_addrs'] = list(insn_addrs)
 
         # If there was an error, and not all the statements were processed,
         # then this block does not have a default exit. This can happen if
@@ -306,33 +336,41 @@ class SimEngineVEX(SimEngine):
             l.debug('Add an incomplete successor state as the result of an incomplete execution due to the white-list.')
             successors.flat_successors.append(state)
 
-    def _handle_statement(self, state, successors, stmt):
+    def _handle_statement(self, state, successors, stmt, stmt_class=None, kind=None):
         """
         This function receives an initial state and imark and processes a list of pyvex.IRStmts
         It annotates the request with a final state, last imark, and a list of SimIRStmts
+
+        :param stmt_class:  The SimIRStmt class handling the statement, if it has already been resolved.
+        :param kind:        The kind of the statement, as recorded in an IRSBPlan, if it is already known.
         """
-        if type(stmt) == pyvex.IRStmt.IMark:
+        if kind is None:
+            stmt_type = type(stmt)
+            kind = STEP_IMARK if stmt_type is pyvex.IRStmt.IMark else STEP_EXIT if stmt_type is pyvex.IRStmt.Exit else STEP_STMT
+
+        if kind == STEP_IMARK:
             ins_addr = stmt.addr + stmt.delta
             state.scratch.ins_addr = ins_addr
 
             # Raise an exception if we're suddenly in self-modifying code
-            for subaddr in xrange(stmt.len):
-                if subaddr + stmt.addr in state.scratch.dirty_addrs:
-                    raise SimReliftException(state)
+            dirty_addrs = state.scratch.dirty_addrs
+            if dirty_addrs:
+                for subaddr in xrange(stmt.len):
+                    if subaddr + stmt.addr in dirty_addrs:
+                        raise SimReliftException(state)
             state._inspect('instruction', BP_AFTER)
 
-            l.debug("IMark: %#x", stmt.addr)
             state.scratch.num_insns += 1
             state._inspect('instruction', BP_BEFORE, instruction=ins_addr)
 
         # process it!
-        s_stmt = translate_stmt(stmt, state)
+        s_stmt = translate_stmt(stmt, state, stmt_class=stmt_class)
         if s_stmt is not None:
             state.history.extend_actions(s_stmt.actions)
 
         # for the exits, put *not* taking the exit on the list of constraints so
         # that we can continue on. Otherwise, add the constraints
-        if type(stmt) == pyvex.IRStmt.Exit:
+        if kind == STEP_EXIT:
             l.debug("%s adding conditional exit", self)
 
             # Produce our successor state!
@@ -346,6 +384,7 @@ class SimEngineVEX(SimEngine):
             state.add_constraints(cont_condition)
             state.scratch.guard = claripy.And(state.scratch.guard, cont_condition)
 
+    @profiled('lift')
     def lift(self,
             state=None,
             clemory=None,
@@ -460,6 +499,19 @@ class SimEngineVEX(SimEngine):
         if not buff or size == 0:
             raise SimEngineError("No bytes in memory for block starting at %#x." % addr)
 
+        # phase 4.5: check the persistent cache
+        persistent_key = raw = None
+        if self._use_cache and self._persistent_cache is not None:
+            raw = buff if isinstance(buff, str) else str(pyvex.ffi.buffer(buff, size))
+            persistent_key = self._persistent_cache.key(arch, addr, size, num_inst, thumb, opt_level, traceflags)
+            irsb = self._persistent_cache.get(persistent_key, raw[:size])
+            # stop points depend on the hooks of the current project, so they are never baked into persistent entries
+            if irsb is not None and self._first_stoppoint(irsb) is None:
+                self._persistent_cache_hit_count += 1
+                self._block_cache[cache_key] = irsb
+                return irsb
+            self._persistent_cache_miss_count += 1
+
         # phase 5: call into pyvex
         l.debug("Creating pyvex.IRSB of arch %s at %#x", arch.name, addr)
         try:
@@ -478,6 +530,9 @@ class SimEngineVEX(SimEngine):
                         size = stop_point - addr
                         continue
 
+                    if persistent_key is not None:
+                        self._persistent_cache.put(persistent_key, raw, irsb, offset=thumb)
+
                 if self._use_cache:
                     self._block_cache[cache_key] = irsb
                 return irsb
@@ -563,9 +618,12 @@ class SimEngineVEX(SimEngine):
 
     def clear_cache(self):
         self._block_cache = LRUCache(maxsize=self._cache_size)
+        self._plan_cache = LRUCache(maxsize=self._cache_size)
 
         self._cache_hit_count = 0
         self._cache_miss_count = 0
+        self._persistent_cache_hit_count = 0
+        self._persistent_cache_miss_count = 0
 
     #
     # Pickling
@@ -580,6 +638,7 @@ class SimEngineVEX(SimEngine):
         self._support_selfmodifying_code = state['_support_selfmodifying_code']
         self._single_step = state['_single_step']
         self._cache_size = state['_cache_size']
+        self._persistent_cache = state.get('_persistent_cache', None)
 
         # rebuild block cache
         self._initialize_block_cache()
@@ -593,5 +652,6 @@ class SimEngineVEX(SimEngine):
         s['_support_selfmodifying_code'] = self._support_selfmodifying_code
         s['_single_step'] = self._single_step
         s['_cache_size'] = self._cache_size
+        s['_persistent_cache'] = self._persistent_cache
 
         return s
@@ -1,21 +1,44 @@
+# IRExpr type -> the SimIRExpr subclass handling it, or None if it is unsupported
+_expr_classes = { }
+
+def resolve_expr_class(expr_type):
+    """
+    Resolve the SimIRExpr subclass that handles a type of IRExpr.
+
+    :param expr_type:   A pyvex IRExpr class.
+    :return:            The SimIRExpr subclass, or None if the expression type is not supported.
+    """
+    try:
+        return _expr_classes[expr_type]
+    except KeyError:
+        expr_name = 'SimIRExpr_' + expr_type.__name__.split('IRExpr')[-1].split('.')[-1]
+        expr_class = globals().get(expr_name, None)
+        _expr_classes[expr_type] = expr_class
+        return expr_class
+
 def translate_expr(expr, state):
-    expr_name = 'SimIRExpr_' + type(expr).__name__.split('IRExpr')[-1].split('.')[-1]
-    g = globals()
+    expr_class = resolve_expr_class(type(expr))
 
-    if expr_name not in g and o.BYPASS_UNSUPPORTED_IREXPR not in state.options:
-        raise UnsupportedIRExprError("Unsupported expression type %s" % (type(expr)))
-    elif expr_name not in g:
+    if expr_class is None:
+        if o.BYPASS_UNSUPPORTED_IREXPR not in state.options:
+            raise UnsupportedIRExprError("Unsupported expression type %s" % (type(expr)))
         expr_class = SimIRExpr_Unsupported
-    else:
-        expr_class = g[expr_name]
 
-    l.debug("Processing expression %s", expr_name)
     e = expr_class(expr, state)
-    e.process()
+    prof = profiling.active_profiler
+    if prof is None:
+        e.process()
+    else:
+        prof.enter('expr:' + expr_class.__name__[10:])
+        try:
+            e.process()
+        finally:
+            prof.exit()
     return e
 
 from ....errors import UnsupportedIRExprError
 from .... import sim_options as o
+from ....misc import profiling
 
 import logging
 l = logging.getLogger("angr.engines.vex.expressions.")
@@ -14,6 +14,7 @@ l = logging.getLogger("angr.engines.vex.irop")
 
 import pyvex
 import claripy
+from claripy.ast.bv import BV
 
 #
 # The more sane approach
@@ -157,6 +158,51 @@ def supports_vector(f):
     f.supports_vector = True
     return f
 
+#
+# Concrete implementations of common integer operations, used when all the arguments of an operation are concrete.
+# They work on python ints, and return the unsigned result, or None if the operation cannot be handled.
+#
+
+def _signed(v, size):
+    return v - (1 << size) if (v >> (size - 1)) & 1 else v
+
+def _concrete_shl(a, b, size):
+    return a << b if b < size else 0
+
+def _concrete_shr(a, b, size):
+    return a >> b if b < size else 0
+
+def _concrete_sar(a, b, size):
+    return _signed(a, size) >> min(b, size - 1)
+
+concrete_mapped_operations = {
+    'Add': lambda a, b, size: a + b,
+    'Sub': lambda a, b, size: a - b,
+    'Mul': lambda a, b, size: a * b,
+    'Xor': lambda a, b, size: a ^ b,
+    'Or': lambda a, b, size: a | b,
+    'And': lambda a, b, size: a & b,
+    'Not': lambda a, size: ~a,
+    'Shl': _concrete_shl,
+    'Shr': _concrete_shr,
+    'Sar': _concrete_sar,
+}
+concrete_compare_operations = {
+    'CmpEQ': operator.eq,
+    'CasCmpEQ': operator.eq,
+    'CmpNE': operator.ne,
+    'ExpCmpNE': operator.ne,
+    'CasCmpNE': operator.ne,
+    'CmpGT': operator.gt,
+    'CasCmpGT': operator.gt,
+    'CmpGE': operator.ge,
+    'CasCmpGE': operator.ge,
+    'CmpLT': operator.lt,
+    'CasCmpLT': operator.lt,
+    'CmpLE': operator.le,
+    'CasCmpLE': operator.le,
+}
+
 
 class SimIROp(object):
     """
@@ -336,6 +382,19 @@ class SimIROp(object):
             l.debug("... can't support operations")
             raise UnsupportedIROpError("no calculate function identified for %s" % self.name)
 
+        # is there a fast path for concrete arguments?
+        self._concrete_calculate = None
+        if not self._float and self._vector_count is None:
+            calculate = self._calculate.im_func
+            if calculate is SimIROp._op_mapped.im_func and self._generic_name in concrete_mapped_operations:
+                self._concrete_calculate = self._concrete_mapped
+            elif self._generic_name in concrete_compare_operations:
+                self._concrete_calculate = self._concrete_compare
+            elif calculate is SimIROp._op_generic_Mull.im_func:
+                self._concrete_calculate = self._concrete_mull
+            elif calculate in _concrete_conversions:
+                self._concrete_calculate = getattr(self, _concrete_conversions[calculate])
+
     def __repr__(self):
         return "<SimIROp %s>" % self.name
 
@@ -346,6 +405,11 @@ class SimIROp(object):
                 print "... %s: %s" % (k, v)
 
     def calculate(self, *args):
+        if self._concrete_calculate is not None:
+            r = self._calculate_concrete(args)
+            if r is not None:
+                return r
+
         if not all(isinstance(a, claripy.ast.Base) for a in args):
             import ipdb; ipdb.set_trace()
             raise SimOperationError("IROp needs all args as claripy expressions")
@@ -380,6 +444,80 @@ class SimIROp(object):
     def is_signed(self):
         return self._from_signed == 'S' or self._vector_signed == 'S'
 
+    #
+    # The concrete fast path
+    #
+
+    def _calculate_concrete(self, args):
+        """
+        Compute the result of the operation on python ints if all the arguments are concrete bitvectors, without
+        building any intermediate AST.
+
+        :returns:   A BVV, or None if any argument is not a plain concrete bitvector or if the fast path does not
+                    support the arguments.
+        """
+        values = [ ]
+        sizes = [ ]
+        for a in args:
+            if type(a) is not BV or a.op != 'BVV' or a.annotations:
+                return None
+            values.append(a.args[0])
+            sizes.append(a.args[1])
+
+        r = self._concrete_calculate(values, sizes)
+        if r is None:
+            return None
+        return claripy.BVV(r & ((1 << self._output_size_bits) - 1), self._output_size_bits)
+
+    def _concrete_mapped(self, values, sizes):
+        size = sizes[0] if self._from_size is None else self._from_size
+        if size != self._output_size_bits:
+            return None
+
+        sized_values = [ ]
+        for v, s in zip(values, sizes):
+            if s > size:
+                return None
+            elif s < size and self.is_signed:
+                v = _signed(v, s) & ((1 << size) - 1)
+            sized_values.append(v)
+
+        return concrete_mapped_operations[self._generic_name](*(sized_values + [ size ]))
+
+    def _concrete_compare(self, values, sizes):
+        if len(values) != 2 or sizes[0] != sizes[1]:
+            return None
+        a, b = values
+        if self.is_signed:
+            a, b = _signed(a, sizes[0]), _signed(b, sizes[1])
+        return 1 if concrete_compare_operations[self._generic_name](a, b) else 0
+
+    def _concrete_mull(self, values, sizes):
+        if self._to_signed == 'S' or (self._from_signed == 'S' and self._to_signed is None):
+            values = [ _signed(v, s) for v, s in zip(values, sizes) ]
+        return values[0] * values[1]
+
+    def _concrete_concat(self, values, sizes):
+        r = 0
+        for v, s in zip(values, sizes):
+            r = (r << s) | v
+        return r if sum(sizes) == self._output_size_bits else None
+
+    def _concrete_hi_half(self, values, sizes):
+        return values[0] >> (sizes[0] / 2) if sizes[0] / 2 == self._output_size_bits else None
+
+    def _concrete_lo_half(self, values, sizes):
+        return values[0] if sizes[0] / 2 == self._output_size_bits else None
+
+    def _concrete_extract(self, values, sizes):
+        return values[0] if self._to_size == self._output_size_bits else None
+
+    def _concrete_sign_extend(self, values, sizes):
+        return _signed(values[0], sizes[0]) if self._to_size == self._output_size_bits else None
+
+    def _concrete_zero_extend(self, values, sizes):
+        return values[0] if self._to_size == self._output_size_bits else None
+
     #
     # The actual operation handlers go here.
     #
@@ -896,6 +1034,16 @@ class SimIROp(object):
     #   return accumulator
 
 
+_concrete_conversions = {
+    SimIROp._op_concat.im_func: '_concrete_concat',
+    SimIROp._op_Iop_64x4toV256.im_func: '_concrete_concat',
+    SimIROp._op_hi_half.im_func: '_concrete_hi_half',
+    SimIROp._op_lo_half.im_func: '_concrete_lo_half',
+    SimIROp._op_extract.im_func: '_concrete_extract',
+    SimIROp._op_sign_extend.im_func: '_concrete_sign_extend',
+    SimIROp._op_zero_extend.im_func: '_concrete_zero_extend',
+}
+
 #
 # Op Handler
 #
@@ -0,0 +1,244 @@
+import os
+import errno
+import zlib
+import hashlib
+import tempfile
+import cPickle as pickle
+
+import logging
+l = logging.getLogger("angr.engines.vex.lift_cache")
+
+
+class PersistentLiftCache(object):
+    """
+    An on-disk cache of lifted IRSBs that can be shared by many processes.
+
+    Every entry lives in its own file, named after a hash of the binary it came from, all lifting parameters and the
+    bytes the block was lifted from. Since the length of a block is only known after lifting it, a small index file per
+    location records the length of the block last lifted there, and lookups hash exactly that many bytes. Bytes after
+    the end of a block therefore never affect its key. Files are written to a temporary file and atomically renamed
+    into place, so concurrent readers never observe partial writes. When the total size of the cache exceeds
+    `max_size` bytes, the least recently used files are evicted.
+    """
+
+    SUFFIX = '.irsb'
+    INDEX_SUFFIX = '.len'
+
+    def __init__(self, path, max_size=512 * 1024 * 1024, namespace=None):
+        """
+        :param str path:        The directory in which cache entries are stored. It is created if it does not exist.
+        :param int max_size:    The maximum size in bytes of the cache directory.
+        :param str namespace:   An identifier of the binary the cached blocks belong to, usually a hash of it.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.namespace = namespace
+
+        # an estimate of the total size of the cache directory. it is recomputed on every eviction pass.
+        self._approx_size = None
+
+        try:
+            os.makedirs(self.path)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def hash_file(filename, chunk_size=1024 * 1024):
+        """
+        Compute a hash of a binary on disk, suitable for use as the namespace of a cache.
+
+        :param str filename:    Path to the file.
+        :return:                A hexadecimal digest.
+        :rtype:                 str
+        """
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return h.hexdigest()
+
+    def key(self, arch, addr, size, num_inst, thumb, opt_level, traceflags):
+        """
+        Build the key of a block location from lifting parameters. The bytes of the block are not part of it.
+
+        :param arch:        The architecture of the block.
+        :param int addr:    Address of the block.
+        :param int size:    The maximum number of bytes the block is lifted from.
+        :return:            The key of the location.
+        :rtype:             str
+        """
+        h = hashlib.sha256()
+        h.update(repr((self.namespace, arch.name, arch.memory_endness, addr, size, num_inst, thumb, opt_level,
+                       traceflags)))
+        return h.hexdigest()
+
+    @staticmethod
+    def _entry_key(location, block_bytes):
+        h = hashlib.sha256()
+        h.update(location)
+        h.update(block_bytes)
+        return h.hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.path, key[:2], key + suffix)
+
+    def get(self, location, buff):
+        """
+        Load an IRSB from the cache.
+
+        :param str location:    Key of the block location, as returned by key().
+        :param str buff:        The bytes at the location. Only as many bytes as the cached block spans are compared.
+        :return:                The cached IRSB, or None if it is not in the cache.
+        """
+        try:
+            with open(self._path(location, self.INDEX_SUFFIX), 'rb') as f:
+                length = int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+        if length > len(buff):
+            return None
+
+        entry_path = self._path(self._entry_key(location, buff[:length]), self.SUFFIX)
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+            irsb = pickle.loads(zlib.decompress(data))
+        except (IOError, OSError):
+            return None
+        except Exception:  # pylint:disable=broad-except
+            # a corrupted or incompatible entry. remove it so that it is regenerated
+            l.warning("Removing corrupted lift cache entry %s.", entry_path, exc_info=True)
+            self._remove(entry_path)
+            return None
+
+        # bump the access time so that eviction is approximately LRU
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+
+        return irsb
+
+    def put(self, location, buff, irsb, offset=0):
+        """
+        Store an IRSB in the cache.
+
+        :param str location:    Key of the block location, as returned by key().
+        :param str buff:        The bytes the IRSB was lifted from.
+        :param irsb:            The IRSB to store.
+        :param int offset:      The offset in `buff` at which lifting started.
+        :return:                None
+        """
+        length = offset + irsb.size
+
+        try:
+            data = zlib.compress(pickle.dumps(irsb, pickle.HIGHEST_PROTOCOL))
+        except Exception:  # pylint:disable=broad-except
+            l.debug("IRSB at %#x cannot be serialized. It will not be cached on disk.", irsb.addr, exc_info=True)
+            return
+
+        # the entry goes first, so that a reader following the index never finds it missing
+        if not self._write(self._path(self._entry_key(location, buff[:length]), self.SUFFIX), data):
+            return
+        self._write(self._path(location, self.INDEX_SUFFIX), str(length))
+
+        if self._approx_size is None:
+            self._approx_size = self._directory_size()
+        else:
+            self._approx_size += len(data)
+
+        if self._approx_size > self.max_size:
+            self.evict()
+
+    def _write(self, path, data):
+        entry_dir = os.path.dirname(path)
+        try:
+            if not os.path.isdir(entry_dir):
+                try:
+                    os.makedirs(entry_dir)
+                except OSError as ex:
+                    if ex.errno != errno.EEXIST:
+                        raise
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.rename(tmp_path, path)
+            except:
+                self._remove(tmp_path)
+                raise
+        except (IOError, OSError):
+            l.warning("Failed to write lift cache entry %s.", path, exc_info=True)
+            return False
+        return True
+
+    def _iter_entries(self):
+        for root, _, files in os.walk(self.path):
+            for filename in files:
+                if not filename.endswith((self.SUFFIX, self.INDEX_SUFFIX)):
+                    continue
+                entry_path = os.path.join(root, filename)
+                try:
+                    st = os.stat(entry_path)
+                except OSError:
+                    # removed by another process
+                    continue
+                yield entry_path, st
+
+    def _directory_size(self):
+        return sum(st.st_size for _, st in self._iter_entries())
+
+    def evict(self, target_ratio=0.8):
+        """
+        Remove the least recently used entries until the cache takes at most `target_ratio` of its maximum size.
+
+        :param float target_ratio:  The ratio of the maximum size to shrink the cache to.
+        :return:                    None
+        """
+        entries = sorted(self._iter_entries(), key=lambda e: max(e[1].st_atime, e[1].st_mtime))
+        total = sum(st.st_size for _, st in entries)
+        target = self.max_size * target_ratio
+
+        for entry_path, st in entries:
+            if total <= target:
+                break
+            self._remove(entry_path)
+            total -= st.st_size
+
+        self._approx_size = total
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        for entry_path, _ in list(self._iter_entries()):
+            self._remove(entry_path)
+        self._approx_size = 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    #
+    # Pickling
+    #
+
+    def __getstate__(self):
+        return {
+            'path': self.path,
+            'max_size': self.max_size,
+            'namespace': self.namespace,
+        }
+
+    def __setstate__(self, s):
+        self.path = s['path']
+        self.max_size = s['max_size']
+        self.namespace = s['namespace']
+        self._approx_size = None
@@ -0,0 +1,53 @@
+import pyvex
+
+from .statements import resolve_stmt_class
+
+# kinds of steps in an execution plan
+STEP_STMT = 0
+STEP_IMARK = 1
+STEP_EXIT = 2
+
+
+class IRSBPlan(object):
+    """
+    A flat execution plan of an IRSB.
+
+    Everything about executing an IRSB that does not depend on the state is computed once, when the plan is built: the
+    SimIRStmt class handling each statement, the kind of each statement, the addresses of the instructions and the
+    statement index the SUPER_FASTPATH option starts execution at. Plans are cached by SimEngineVEX along with the
+    lifted blocks they are built from, so that a block executed many times only pays for this once.
+
+    Each step of the plan is a tuple of (statement index, statement, SimIRStmt class, kind, number of instructions up
+    to and including this statement).
+    """
+
+    __slots__ = ('irsb', 'steps', 'insn_addrs', 'fastpath_skip', )
+
+    def __init__(self, irsb):
+        self.irsb = irsb
+        self.steps = [ ]
+        self.insn_addrs = [ ]
+
+        for stmt_idx, stmt in enumerate(irsb.statements):
+            stmt_type = type(stmt)
+            if stmt_type is pyvex.IRStmt.IMark:
+                kind = STEP_IMARK
+                self.insn_addrs.append(stmt.addr + stmt.delta)
+            elif stmt_type is pyvex.IRStmt.Exit:
+                kind = STEP_EXIT
+            else:
+                kind = STEP_STMT
+            self.steps.append((stmt_idx, stmt, resolve_stmt_class(stmt_type), kind, len(self.insn_addrs)))
+
+        # the first statement of the last four instructions
+        self.fastpath_skip = None
+        imark_counter = 0
+        for stmt_idx, _, _, kind, _ in reversed(self.steps):
+            if kind == STEP_IMARK:
+                imark_counter += 1
+            if imark_counter >= 4:
+                self.fastpath_skip = stmt_idx
+                break
+
+    def __len__(self):
+        return len(self.steps)
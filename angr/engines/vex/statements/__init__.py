@@ -1,5 +1,6 @@
 from ....errors import UnsupportedIRStmtError, UnsupportedDirtyError, SimStatementError
 from .... import sim_options as o
+from ....misc import profiling
 
 from .base import SimIRStmt
 from .noop import SimIRStmt_NoOp
@@ -20,13 +21,39 @@ from .puti import SimIRStmt_PutI
 import logging
 l = logging.getLogger("angr.engines.vex.statements.")
 
-def translate_stmt(stmt, state):
-    stmt_name = 'SimIRStmt_' +  type(stmt).__name__.split('IRStmt')[-1].split('.')[-1]
+# IRStmt type -> the SimIRStmt subclass handling it, or None if it is unsupported
+_stmt_classes = { }
 
-    if stmt_name in globals():
-        stmt_class = globals()[stmt_name]
+def resolve_stmt_class(stmt_type):
+    """
+    Resolve the SimIRStmt subclass that handles a type of IRStmt.
+
+    :param stmt_type:   A pyvex IRStmt class.
+    :return:            The SimIRStmt subclass, or None if the statement type is not supported.
+    """
+    try:
+        return _stmt_classes[stmt_type]
+    except KeyError:
+        stmt_name = 'SimIRStmt_' + stmt_type.__name__.split('IRStmt')[-1].split('.')[-1]
+        stmt_class = globals().get(stmt_name, None)
+        _stmt_classes[stmt_type] = stmt_class
+        return stmt_class
+
+def translate_stmt(stmt, state, stmt_class=None):
+    if stmt_class is None:
+        stmt_class = resolve_stmt_class(type(stmt))
+
+    if stmt_class is not None:
         s = stmt_class(stmt, state)
-        s.process()
+        prof = profiling.active_profiler
+        if prof is None:
+            s.process()
+        else:
+            prof.enter('stmt:' + stmt_class.__name__[10:])
+            try:
+                s.process()
+            finally:
+                prof.exit()
         return s
     else:
         l.error("Unsupported statement type %s", (type(stmt)))
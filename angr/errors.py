@@ -209,6 +209,9 @@ class SimSolverModeError(SimSolverError):
 class SimSolverOptionError(SimSolverError):
     pass
 
+class SimSolverTimeoutError(SimSolverError):
+    pass
+
 class SimValueError(SimSolverError):
     pass
 
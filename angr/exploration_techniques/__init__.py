@@ -112,11 +112,13 @@ from .crash_monitor import CrashMonitor
 from .tracer import Tracer
 from .explorer import Explorer
 from .threading import Threading
+from .process_pool import ProcessPool
+from .async_solving import AsyncSolving
 from .dfs import DFS
 from .looplimiter import LoopLimiter
 from .lengthlimiter import LengthLimiter
 from .veritesting import Veritesting
 from .oppologist import Oppologist
 from .director import Director, ExecuteAddressGoal, CallFunctionGoal
-from .spiller import Spiller
+from .spiller import Spiller, SpillStore
 from ..errors import AngrError, AngrExplorationTechniqueError
@@ -0,0 +1,133 @@
+import time
+
+import logging
+l = logging.getLogger("angr.exploration_techniques.async_solving")
+
+from . import ExplorationTechnique
+
+
+class AsyncSolving(ExplorationTechnique):
+    """
+    Check the satisfiability of new states in a pool of solver worker processes, while other states keep stepping.
+
+    States are stepped with LAZY_SOLVES, so the engine does not check their satisfiability itself. Every new state
+    that picked up constraints during its step is instead sent to the worker pool and parked in the `pending_stash`.
+    At the next step, states whose query has finished move back to the stepped stash if they are satisfiable, or to
+    the unsat stash (if the simulation manager saves unsat states) if they are not. States whose query takes longer
+    than `timeout` seconds move to the `timeout_stash`, and states whose query failed are recorded as errored.
+
+    When nothing is left to step, the technique waits for the first pending query to finish.
+    """
+
+    def __init__(self, pool=None, timeout=None, pending_stash='solving', timeout_stash='timeout', poll_interval=0.01):
+        """
+        :param pool:            The SolverWorkerPool to use. Defaults to the pool shared by all states.
+        :param timeout:         The number of seconds a query may take. Defaults to the timeout of the pool.
+        :param pending_stash:   The stash holding states whose satisfiability is being checked.
+        :param timeout_stash:   The stash receiving states whose check timed out.
+        :param poll_interval:   The number of seconds to wait between polls when waiting for pending queries.
+        """
+        super(AsyncSolving, self).__init__()
+        self.pool = pool
+        self.timeout = timeout
+        self.pending_stash = pending_stash
+        self.timeout_stash = timeout_stash
+        self.poll_interval = poll_interval
+
+        # id of state -> (state, future)
+        self._pending = { }
+
+    def setup(self, simgr):
+        if self.pool is None:
+            self.pool = solver_worker_pool
+        for stash in (self.pending_stash, self.timeout_stash):
+            if stash not in simgr.stashes:
+                simgr.stashes[stash] = [ ]
+
+    def step(self, simgr, stash, **kwargs):
+        self._collect(simgr, stash)
+
+        for state in simgr.stashes[stash]:
+            state.options.add(o.LAZY_SOLVES)
+        stepped = set(id(state) for state in simgr.stashes[stash])
+
+        simgr = simgr.step(stash=stash, **kwargs)
+
+        active = [ ]
+        for state in simgr.stashes[stash]:
+            if id(state) not in stepped and state.history.recent_constraints:
+                self._submit(state)
+                simgr.stashes[self.pending_stash].append(state)
+            else:
+                active.append(state)
+        simgr.stashes[stash] = active
+
+        # do not let run() stop while there are states left to check
+        while not simgr.stashes[stash] and self._pending:
+            self._wait()
+            self._collect(simgr, stash)
+
+        return simgr
+
+    def _submit(self, state):
+        constraints = state.se.constraints
+        future = self.pool.submit('satisfiable', constraints, timeout=self.timeout)
+        self._pending[id(state)] = (state, future)
+
+    def _wait(self):
+        """
+        Wait until any pending query finishes or times out.
+        """
+        while True:
+            for _, future in self._pending.itervalues():
+                if future.done() or future.timed_out():
+                    return
+            time.sleep(self.poll_interval)
+
+    def _collect(self, simgr, stash):
+        """
+        Move states whose query has finished or timed out out of the pending stash.
+        """
+        if not self._pending:
+            return
+
+        still_pending = [ ]
+        for state in simgr.stashes[self.pending_stash]:
+            entry = self._pending.get(id(state), None)
+            if entry is None:
+                # it was moved here by someone else
+                still_pending.append(state)
+                continue
+
+            _, future = entry
+            if future.timed_out():
+                del self._pending[id(state)]
+                simgr.stashes[self.timeout_stash].append(state)
+                continue
+            if not future.done():
+                still_pending.append(state)
+                continue
+
+            del self._pending[id(state)]
+            try:
+                sat = future.result()
+            except SimSolverTimeoutError:
+                simgr.stashes[self.timeout_stash].append(state)
+            except SimError as ex:
+                simgr.errored.append(ErrorRecord(state, ex, None))
+            else:
+                if sat:
+                    simgr.stashes[stash].append(state)
+                elif simgr.save_unsat:
+                    simgr.stashes.setdefault('unsat', [ ]).append(state)
+
+        simgr.stashes[self.pending_stash] = still_pending
+
+        # forget states that were removed from the pending stash by someone else
+        for key in set(self._pending) - set(id(state) for state in still_pending):
+            del self._pending[key]
+
+from .. import sim_options as o
+from ..errors import SimError, SimSolverTimeoutError
+from ..manager import ErrorRecord
+from ..state_plugins.solver_pool import solver_worker_pool
@@ -0,0 +1,210 @@
+import sys
+import multiprocessing
+import cPickle as pickle
+from cStringIO import StringIO
+
+import logging
+l = logging.getLogger("angr.exploration_techniques.process_pool")
+
+from . import ExplorationTechnique
+
+# the project held by each worker process. it is set once, when the worker starts.
+_worker_project = None
+
+
+def _init_worker(project_blob):
+    global _worker_project  # pylint:disable=global-statement
+    if project_blob is not None:
+        _worker_project = pickle.loads(project_blob)
+
+
+def _dumps(obj, project):
+    """
+    Pickle `obj`, replacing references to `project` with a token so that the project is never serialized.
+    """
+    f = StringIO()
+    p = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+    p.persistent_id = lambda o: 'project' if o is project else None
+    p.dump(obj)
+    return f.getvalue()
+
+
+def _loads(blob, project):
+    """
+    Unpickle data created by _dumps(), replacing the project token with `project`.
+    """
+    p = pickle.Unpickler(StringIO(blob))
+    def persistent_load(pid):
+        if pid != 'project':
+            raise pickle.UnpicklingError("Unknown persistent id %r" % pid)
+        return project
+    p.persistent_load = persistent_load
+    return p.load()
+
+
+def _detach_history(successor, root):
+    """
+    Cut the history of `successor` right below `root`, so that the history of the stepped state is not sent back.
+    """
+    h = successor.history
+    while h.parent is not None and h.parent is not root:
+        h = h.parent
+    if h.parent is root:
+        h.parent = None
+
+
+def _step_batch(blob, resilience, kwargs):
+    """
+    Step a batch of states inside a worker process.
+
+    :return: A pickled tuple of the successor stashes of every state, and the (index, error) pairs of the states that
+             errored.
+    """
+    project = _worker_project
+    states = _loads(blob, project)
+
+    simgr = SimulationManager(project, hierarchy=False, resilience=resilience)
+    results = [ ]
+    for state in states:
+        stashes = simgr._one_state_step(state, **kwargs)
+        for successors in stashes.itervalues():
+            for successor in successors:
+                if successor is not state:
+                    _detach_history(successor, state.history)
+        results.append(dict(stashes))
+
+    indices = { id(state): i for i, state in enumerate(states) }
+    errored = [ (indices[id(e.state)], e.error) for e in simgr.errored ]
+    return _dumps((results, errored), project)
+
+
+class ProcessPool(ExplorationTechnique):
+    """
+    Step states in a pool of worker processes.
+
+    Every worker holds its own copy of the project, including its lifted block cache, for its whole lifetime. Each step,
+    the states to tick are sent to the workers in batches, stepped there, and their successor stashes are sent back.
+    Filtering and completion hooks of other techniques still run in this process.
+
+    Only the basic stepping procedure can run remotely. If a custom successor function is provided or if any technique
+    hooks step_state or is applied *before* this one (hence hooking step inside it), stepping falls back to the current
+    process. Use this technique before any other to benefit from it.
+    """
+    def __init__(self, workers=None, batch_size=8, min_states=2):
+        """
+        :param workers:     The number of worker processes. Defaults to the number of CPUs.
+        :param batch_size:  The maximum number of states sent to a worker at once.
+        :param min_states:  The minimum number of states to step for the pool to be used at all.
+        """
+        super(ProcessPool, self).__init__()
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.min_states = min_states
+        self._pool = None
+
+    def setup(self, simgr):
+        self._start_pool()
+
+    def _start_pool(self):
+        global _worker_project  # pylint:disable=global-statement
+        if self._pool is not None:
+            return
+
+        if sys.platform.startswith('win'):
+            # no fork(). ship the project to each worker.
+            project_blob = pickle.dumps(self.project, pickle.HIGHEST_PROTOCOL)
+        else:
+            # workers inherit the project when they are forked
+            _worker_project = self.project
+            project_blob = None
+
+        self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(project_blob,))
+
+    def shutdown(self):
+        """
+        Terminate the worker processes.
+        """
+        global _worker_project  # pylint:disable=global-statement
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if _worker_project is self.project:
+            _worker_project = None
+
+    def __del__(self):
+        try:
+            self.shutdown()
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+    def __getstate__(self):
+        s = dict(self.__dict__)
+        s['_pool'] = None
+        return s
+
+    def step(self, simgr, stash, selector_func=None, successor_func=None, **kwargs):
+        if successor_func is not None or simgr._hooks_step_state or simgr._hooks_step:
+            return simgr.step(stash=stash, selector_func=selector_func, successor_func=successor_func, **kwargs)
+
+        new_stashes = simgr._copy_stashes()
+        new_active = [ ]
+        if selector_func is None:
+            to_tick = list(simgr.stashes[stash])
+        else:
+            to_tick = [ ]
+            for state in simgr.stashes[stash]:
+                if selector_func(state):
+                    to_tick.append(state)
+                else:
+                    new_active.append(state)
+
+        if len(to_tick) < self.min_states:
+            return simgr.step(stash=stash, selector_func=selector_func, **kwargs)
+
+        self._start_pool()
+        new_stashes[stash] = [ ]
+
+        batches = [ to_tick[i:i + self.batch_size] for i in xrange(0, len(to_tick), self.batch_size) ]
+        pending = [ ]
+        for batch in batches:
+            # do not send the ancestry of the states. it is restored when the successors come back
+            parents = [ state.history.parent for state in batch ]
+            for state in batch:
+                state.history.parent = None
+            try:
+                blob = _dumps(batch, self.project)
+            finally:
+                for state, parent in zip(batch, parents):
+                    state.history.parent = parent
+            pending.append(self._pool.apply_async(_step_batch, (blob, simgr._resilience, kwargs)))
+
+        for batch, async_result in zip(batches, pending):
+            results, errored = _loads(async_result.get(), self.project)
+
+            for state, result_stashes in zip(batch, results):
+                for successors in result_stashes.itervalues():
+                    for successor in successors:
+                        self._reattach_history(successor, state)
+                simgr._record_step_results(new_stashes, new_active, result_stashes)
+
+            for i, error in errored:
+                simgr.errored.append(ErrorRecord(batch[i], error, None))
+
+        new_stashes[stash].extend(new_active)
+        return simgr._successor(new_stashes)
+
+    @staticmethod
+    def _reattach_history(successor, state):
+        h = successor.history
+        while h.parent is not None:
+            h = h.parent
+
+        if h.depth > state.history.depth:
+            # the usual case: the history of a successor of the stepped state
+            h.parent = state.history
+        else:
+            # a copy of the stepped state itself, e.g. a deadended or pruned state
+            h.parent = state.history.parent
+
+from ..manager import SimulationManager, ErrorRecord
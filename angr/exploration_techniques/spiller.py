@@ -1,3 +1,10 @@
+import os
+import zlib
+import sqlite3
+import tempfile
+import threading
+from collections import defaultdict
+
 import logging
 
 l = logging.getLogger("angr.exploration_techniques.spiller")
@@ -15,6 +22,263 @@ class SpilledState(ana.Storable):
     def _ana_setstate(self, s):
         self.state = s[0]
 
+class SpillStore(object):
+    """
+    A local store of spilled states, backed by an SQLite database.
+
+    States are written in batches, one transaction per batch, and their pickles are compressed. They are serialized by
+    a StateSerializer, so the memory pages, large ASTs and history nodes that spilled states have in common are stored
+    once, no matter how many states refer to them. Shared objects are reference-counted, and removed along with the
+    last state referring to them. The project is never pickled.
+
+    After states are loaded, the next batch can be prefetched in a background thread: the rows are read and
+    decompressed ahead of time, so that only unpickling is left for the next load.
+    """
+
+    def __init__(self, path=None, project=None, compression_level=1, dedup_depth=4):
+        """
+        :param path:                The path of the database. By default, a temporary file that is removed by close().
+        :param project:             The project of the spilled states. The Spiller sets it to its own project.
+        :param compression_level:   The zlib compression level of the stored pickles.
+        :param dedup_depth:         The minimum depth of ASTs stored separately from the states referring to them.
+        """
+        self.serializer = StateSerializer(project=project, dedup_depth=dedup_depth)
+        self.compression_level = compression_level
+
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='angr-spill-', suffix='.sqlite')
+            os.close(fd)
+            self._remove_on_close = True
+        else:
+            self._remove_on_close = False
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # spilled states do not outlive the process. trade durability for speed
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute("PRAGMA journal_mode = MEMORY")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS states (id INTEGER PRIMARY KEY AUTOINCREMENT, priority, data BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS states_priority ON states (priority, id);
+            CREATE TABLE IF NOT EXISTS state_refs (state_id INTEGER NOT NULL, digest TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS state_refs_state ON state_refs (state_id);
+            CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, refs INTEGER NOT NULL, data BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS object_refs (digest TEXT NOT NULL, ref TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS object_refs_digest ON object_refs (digest);
+        """)
+        self._db.commit()
+        self._len = self._db.execute("SELECT COUNT(*) FROM states").fetchone()[0]
+
+        self._prefetch_thread = None
+        # state id -> (decompressed pickle, digests of the objects it refers to)
+        self._prefetched = { }
+        # digest -> decompressed pickle
+        self._prefetched_objects = { }
+
+    @property
+    def project(self):
+        return self.serializer.project
+
+    @project.setter
+    def project(self, v):
+        self.serializer.project = v
+
+    def __len__(self):
+        return self._len
+
+    #
+    # Storing and loading
+    #
+
+    def store(self, states):
+        """
+        Store a batch of states.
+
+        :param states:  A list of (priority, state) tuples. States with the lowest priority are loaded first.
+        """
+        if not states:
+            return
+
+        memo = { }
+        objects = { }
+        rows = [ ]
+        for priority, state in states:
+            blob, refs = self.serializer.dump(state, objects, memo)
+            rows.append((priority, zlib.compress(blob, self.compression_level), refs))
+
+        with self._lock:
+            with self._db:
+                new = [ digest for digest in objects
+                        if self._db.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone() is None ]
+                self._db.executemany("INSERT INTO objects (digest, refs, data) VALUES (?, 0, ?)",
+                                     ((digest, sqlite3.Binary(zlib.compress(objects[digest][0],
+                                                                            self.compression_level)))
+                                      for digest in new))
+                self._db.executemany("INSERT INTO object_refs (digest, ref) VALUES (?, ?)",
+                                     ((digest, ref) for digest in new for ref in objects[digest][1]))
+
+                # every new object and every state holds a reference to each of the objects it refers to directly
+                refs = defaultdict(int)
+                for digest in new:
+                    for ref in objects[digest][1]:
+                        refs[ref] += 1
+                for priority, data, state_refs in rows:
+                    state_id = self._db.execute("INSERT INTO states (priority, data) VALUES (?, ?)",
+                                                (priority, sqlite3.Binary(data))).lastrowid
+                    self._db.executemany("INSERT INTO state_refs (state_id, digest) VALUES (?, ?)",
+                                         ((state_id, ref) for ref in state_refs))
+                    for ref in state_refs:
+                        refs[ref] += 1
+                self._db.executemany("UPDATE objects SET refs = refs + ? WHERE digest = ?",
+                                     ((n, ref) for ref, n in refs.iteritems()))
+            self._len += len(rows)
+
+        l.debug("Spilled %d states, %d shared objects (%d new).", len(rows), len(objects), len(new))
+
+    def _fetch(self, state_ids, exclude_objects=()):
+        """
+        Read the rows of some states and of the objects they refer to directly. The lock must be held.
+        """
+        fetched = { }
+        digests = set()
+        for state_id in state_ids:
+            data = self._db.execute("SELECT data FROM states WHERE id = ?", (state_id,)).fetchone()[0]
+            refs = [ d for (d,) in self._db.execute("SELECT digest FROM state_refs WHERE state_id = ?", (state_id,)) ]
+            fetched[state_id] = (data, refs)
+            digests.update(refs)
+
+        objects = { }
+        for digest in digests:
+            if digest not in exclude_objects:
+                objects[digest] = self._db.execute("SELECT data FROM objects WHERE digest = ?", (digest,)).fetchone()[0]
+        return fetched, objects
+
+    def _top_ids(self, n):
+        return [ i for (i,) in self._db.execute("SELECT id FROM states ORDER BY priority, id LIMIT ?", (n,)) ]
+
+    def _get_object(self, digest):
+        try:
+            return self._prefetched_objects[digest]
+        except KeyError:
+            pass
+
+        with self._lock:
+            data = self._db.execute("SELECT data FROM objects WHERE digest = ?", (digest,)).fetchone()[0]
+        blob = zlib.decompress(data)
+        self._prefetched_objects[digest] = blob
+        return blob
+
+    def load(self, n):
+        """
+        Load and remove the `n` states of lowest priority from the store.
+
+        :return:    A list of states.
+        """
+        if n <= 0 or not self._len:
+            return [ ]
+        self._wait_prefetch()
+
+        with self._lock:
+            state_ids = self._top_ids(n)
+            missing = [ i for i in state_ids if i not in self._prefetched ]
+            fetched, objects = self._fetch(missing, exclude_objects=self._prefetched_objects)
+
+        for state_id, (data, refs) in fetched.iteritems():
+            self._prefetched[state_id] = (zlib.decompress(data), refs)
+        for digest, data in objects.iteritems():
+            self._prefetched_objects[digest] = zlib.decompress(data)
+
+        cache = { }
+        states = [ self.serializer.load(self._prefetched[i][0], self._get_object, cache) for i in state_ids ]
+
+        released = [ ]
+        for state_id in state_ids:
+            released.extend(self._prefetched.pop(state_id)[1])
+
+        with self._lock:
+            with self._db:
+                self._db.executemany("DELETE FROM states WHERE id = ?", ((i,) for i in state_ids))
+                self._db.executemany("DELETE FROM state_refs WHERE state_id = ?", ((i,) for i in state_ids))
+                removed = self._release(released)
+            self._len -= len(state_ids)
+
+        # the loaded states hold the objects now. do not keep their pickles around
+        self._prefetched_objects = { }
+
+        l.debug("Loaded %d states, removed %d shared objects.", len(states), len(removed))
+        return states
+
+    def _release(self, digests):
+        """
+        Drop a reference to each of some objects, and remove the objects that are not referred to anymore, along with
+        their own references. The lock must be held.
+
+        :return:    The digests of the removed objects.
+        """
+        removed = [ ]
+        while digests:
+            refs = defaultdict(int)
+            for digest in digests:
+                refs[digest] += 1
+            self._db.executemany("UPDATE objects SET refs = refs - ? WHERE digest = ?",
+                                 ((n, digest) for digest, n in refs.iteritems()))
+
+            orphans = [ digest for digest in refs
+                        if self._db.execute("SELECT refs FROM objects WHERE digest = ?", (digest,)).fetchone()[0] <= 0 ]
+            digests = [ ]
+            for digest in orphans:
+                digests.extend(r for (r,) in self._db.execute("SELECT ref FROM object_refs WHERE digest = ?",
+                                                              (digest,)))
+            self._db.executemany("DELETE FROM objects WHERE digest = ?", ((d,) for d in orphans))
+            self._db.executemany("DELETE FROM object_refs WHERE digest = ?", ((d,) for d in orphans))
+            removed.extend(orphans)
+        return removed
+
+    def prefetch(self, n):
+        """
+        Start reading and decompressing the `n` states of lowest priority in a background thread.
+        """
+        if n <= 0 or not self._len:
+            return
+        self._wait_prefetch()
+        self._prefetch_thread = threading.Thread(target=self._prefetch, args=(n,), name='angr-spill-prefetch')
+        self._prefetch_thread.daemon = True
+        self._prefetch_thread.start()
+
+    def _prefetch(self, n):
+        try:
+            with self._lock:
+                state_ids = [ i for i in self._top_ids(n) if i not in self._prefetched ]
+                fetched, objects = self._fetch(state_ids, exclude_objects=set(self._prefetched_objects))
+            # zlib releases the GIL while decompressing
+            for state_id, (data, refs) in fetched.iteritems():
+                self._prefetched[state_id] = (zlib.decompress(data), refs)
+            for digest, data in objects.iteritems():
+                self._prefetched_objects[digest] = zlib.decompress(data)
+        except Exception:  # pylint:disable=broad-except
+            # prefetching is only an optimization. load() reads whatever is missing
+            l.warning("Failed to prefetch spilled states.", exc_info=True)
+
+    def _wait_prefetch(self):
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join()
+            self._prefetch_thread = None
+
+    def close(self):
+        """
+        Close the database, and remove it if it is a temporary file.
+        """
+        self._wait_prefetch()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._remove_on_close:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
 class Spiller(ExplorationTechnique):
     """
     Automatically spill states out. It can spill out states to a different stash, spill
@@ -25,7 +289,7 @@ class Spiller(ExplorationTechnique):
         self,
         src_stash="active", min=5, max=10, #pylint:disable=redefined-builtin
         staging_stash="spill_stage", staging_min=10, staging_max=20,
-        pickle_callback=None, unpickle_callback=None, priority_key=None
+        pickle_callback=None, unpickle_callback=None, priority_key=None, storage=None
     ):
         """
         Initializes the spiller.
@@ -35,6 +299,7 @@ class Spiller(ExplorationTechnique):
         @param staging_stash: the stash *to* which to spill states (default: "spill_stage")
         @param staging_max: the number of states that can be in the staging stash before things get spilled to ANA (default: None. If staging_stash is set, then this means unlimited, and ANA will not be used).
         @param priority_key: a function that takes a state and returns its numberical priority (MAX_INT is lowest priority). By default, self.state_priority will be used, which prioritizes by object ID.
+        @param storage: a SpillStore to spill states to, in batches, instead of ANA (default: None).
         """
         super(Spiller, self).__init__()
         self.max = max
@@ -49,15 +314,26 @@ class Spiller(ExplorationTechnique):
         self.unpickle_callback = unpickle_callback
         self.pickle_callback = pickle_callback
 
+        self.storage = storage
+
         # tracking of pickled stuff
         self._pickled_states = [ ]
         self._ever_pickled = 0
         self._ever_unpickled = 0
 
+    def setup(self, simgr):
+        if self.storage is not None and self.storage.project is None:
+            self.storage.project = self.project
+
     def _unpickle(self, n):
-        self._pickled_states.sort()
-        unpickled = [ SpilledState.ana_load(pid).state for _,pid in self._pickled_states[:n] ]
-        self._pickled_states[:n] = [ ]
+        if self.storage is not None:
+            unpickled = self.storage.load(n)
+            # the next batch is likely to be needed soon
+            self.storage.prefetch(n)
+        else:
+            self._pickled_states.sort()
+            unpickled = [ SpilledState.ana_load(pid).state for _,pid in self._pickled_states[:n] ]
+            self._pickled_states[:n] = [ ]
         self._ever_unpickled += len(unpickled)
         if self.unpickle_callback:
             map(self.unpickle_callback, unpickled)
@@ -69,6 +345,10 @@ class Spiller(ExplorationTechnique):
     def _pickle(self, states):
         if self.pickle_callback:
             map(self.pickle_callback, states)
+        if self.storage is not None:
+            self._ever_pickled += len(states)
+            self.storage.store([ (self._get_priority(state), state) for state in states ])
+            return
         wrappers = [ SpilledState(state) for state in states ]
         self._ever_pickled += len(states)
         for w in wrappers:
@@ -118,3 +398,5 @@ class Spiller(ExplorationTechnique):
     @staticmethod
     def state_priority(state):
         return id(state)
+
+from ..state_serializer import StateSerializer
@@ -6,6 +6,26 @@ class KnowledgeBasePlugin(object):
     def copy(self):
         raise NotImplementedError
 
+    def function_data(self, func_addr):  # pylint:disable=unused-argument,no-self-use
+        """
+        Get the data this plugin holds about a single function, so that it can be merged into the same plugin of
+        another knowledge base with merge_function_data().
+
+        :param int func_addr:   Address of the function.
+        :return:                The data, or None if there is no data about this function.
+        """
+        return None
+
+    def merge_function_data(self, func_addr, data):
+        """
+        Merge data about a single function, returned by function_data(), into this plugin.
+
+        :param int func_addr:   Address of the function.
+        :param data:            The data.
+        :return:                None
+        """
+        raise NotImplementedError
+
     @staticmethod
     def register_default(name, cls):
         if name in default_plugins:
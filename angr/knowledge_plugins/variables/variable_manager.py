@@ -320,6 +320,13 @@ class VariableManager(KnowledgeBasePlugin):
 
         return self.function_managers[func_addr]
 
+    def function_data(self, func_addr):
+        return self.function_managers.get(func_addr, None)
+
+    def merge_function_data(self, func_addr, data):
+        data.manager = self
+        self.function_managers[func_addr] = data
+
     def initialize_variable_names(self):
         self.global_manager.assign_variable_names()
         for manager in self.function_managers.itervalues():
@@ -7,6 +7,7 @@ from collections import defaultdict
 import ana
 import claripy
 import mulpyplexer
+import concurrent.futures
 
 from .errors import SimError, SimMergeError
 
@@ -86,6 +87,9 @@ class SimulationManager(ana.Storable):
         self.stashes = self._make_stashes_dict(active=active_states) if stashes is None else stashes
         self.completion_mode = completion_mode
 
+        # the executor stepping individual states during step_async() and run_async()
+        self._state_executor = None
+
     #
     # Pickling
     #
@@ -99,6 +103,7 @@ class SimulationManager(ana.Storable):
         del s['_hooks_step_state']
         del s['_hooks_filter']
         del s['_hooks_complete']
+        del s['_state_executor']
         return s
 
     def _ana_setstate(self, s):
@@ -111,6 +116,7 @@ class SimulationManager(ana.Storable):
         self._hooks_filter = []
         self._hooks_complete = []
         self._hooks_all = []
+        self._state_executor = None
         for hook in hooks:
             self._apply_hooks(hook)
 
@@ -127,6 +133,7 @@ class SimulationManager(ana.Storable):
         out._hooks_filter = list(self._hooks_filter)
         out._hooks_complete = list(self._hooks_complete)
         out.completion_mode = self.completion_mode
+        out._state_executor = self._state_executor
         return out
 
     def _make_stashes_dict(self,
@@ -216,13 +223,16 @@ class SimulationManager(ana.Storable):
         l.debug("... returning %d matches and %d non-matches", len(match), len(nomatch))
         return match, nomatch
 
-    def _one_state_step(self, a, successor_func=None, resilience=None, **kwargs):
+    def _one_state_step(self, a, successor_func=None, resilience=None, step_state_hooks=True, defer_successors=False,
+                        **kwargs):
         """
         Internal function to step a single state forward.
 
-        :param a:               The state.
-        :param successor_func:  A function to run on the state instead of doing a.step().
-        :param resilience:      Quash all errors (and put the offending state in the errored stash).
+        :param a:                   The state.
+        :param successor_func:      A function to run on the state instead of doing a.step().
+        :param resilience:          Quash all errors (and put the offending state in the errored stash).
+        :param step_state_hooks:    Whether step_state hooks should be given a chance to step the state.
+        :param defer_successors:    Return None instead of computing the successors when no hook steps the state.
 
         :returns:               A dict mapping stash names to state lists
         """
@@ -238,7 +248,7 @@ class SimulationManager(ana.Storable):
         try:
             # if we have a hook, use it. If we succeed at using the hook, we will break out of this loop
             # otherwise we execute the else-clause, which does the normal step procedure
-            for hook in self._hooks_step_state:
+            for hook in (self._hooks_step_state if step_state_hooks else ()):
                 # FIXME hack to handle some hooks not expecting strong_reference
                 argspec = inspect.getargspec(hook)
                 if argspec.keywords is None and "strong_reference" not in argspec.args:
@@ -253,10 +263,9 @@ class SimulationManager(ana.Storable):
                     new_stashes = self._make_stashes_dict(**out)
                     break
             else:
-                if successor_func is not None:
-                    ss = successor_func(a)
-                else:
-                    ss = self._project.factory.successors(a, **kwargs)
+                if defer_successors:
+                    return None
+                ss = self._state_successors(a, successor_func=successor_func, **kwargs)
 
                 new_stashes = self._make_stashes_dict(
                     active=ss.flat_successors,
@@ -278,6 +287,20 @@ class SimulationManager(ana.Storable):
 
         return new_stashes
 
+    def _state_successors(self, a, successor_func=None, **kwargs):
+        """
+        Compute the successors of a state, without running any hook.
+
+        :param a:               The state.
+        :param successor_func:  A function to run on the state instead of doing a.step().
+        :returns:               The successors of the state.
+        :rtype:                 SimSuccessors
+        """
+
+        if successor_func is not None:
+            return successor_func(a)
+        return self._project.factory.successors(a, **kwargs)
+
     def _record_step_results(self, new_stashes, new_active, successor_stashes):
         """
         Take a whole bunch of intermediate values and smushes them together
@@ -377,8 +400,25 @@ class SimulationManager(ana.Storable):
 
         # for each state we want to tick, tick it!
         # each tick produces a dict of stashes. use _record_step_results to dump them into the result pool.
-        for a in to_tick:
-            result_stashes = self._one_state_step(a, successor_func=successor_func, **kwargs)
+        if self._state_executor is not None and len(to_tick) > 1:
+            # step_state hooks and everything else that touches the simulation manager or techniques run on this
+            # thread. only the successors of states no hook stepped are computed concurrently, and all results are
+            # recorded in order
+            if self._hierarchy:
+                kwargs["strong_reference"] = True
+            hooked = [ self._one_state_step(a, successor_func=successor_func, defer_successors=True, **kwargs)
+                       for a in to_tick ]
+            futures = [ self._state_executor.submit(self._state_successors, a, successor_func=successor_func, **kwargs)
+                        if r is None else None for a, r in zip(to_tick, hooked) ]
+            all_result_stashes = (
+                r if r is not None else
+                self._one_state_step(a, successor_func=lambda _, f=f: f.result(), step_state_hooks=False, **kwargs)
+                for a, r, f in zip(to_tick, hooked, futures)
+            )
+        else:
+            all_result_stashes = (self._one_state_step(a, successor_func=successor_func, **kwargs) for a in to_tick)
+
+        for result_stashes in all_result_stashes:
             self._record_step_results(new_stashes, new_active, result_stashes)
 
         # finish up and return our result! this may just be the same as self because of mutability optimizations
@@ -919,7 +959,7 @@ class SimulationManager(ana.Storable):
         self.remove_tech(tech)
         return out
 
-    def run(self, stash=None, n=None, step_func=None):
+    def run(self, stash=None, n=None, step_func=None, profiler=None):
         """
         Run until the SimulationManager has reached a completed state, according to
         the current exploration techniques.
@@ -931,6 +971,7 @@ class SimulationManager(ana.Storable):
         :param n:           Step at most this many times
         :param step_func:   If provided, should be a function that takes a SimulationManager and returns a new SimulationManager. Will
                             be called with the current SimulationManager at every step.
+        :param profiler:    An ExecutionProfiler to record the time spent in each part of the execution with.
         :return:            The resulting SimulationManager.
         :rtype:             SimulationManager
         """
@@ -938,7 +979,66 @@ class SimulationManager(ana.Storable):
             l.warn("No completion state defined for SimulationManager; stepping until all states deadend")
 
         until_func = lambda pg: self.completion_mode(h(pg) for h in self._hooks_complete)
-        return self.step(n=n, step_func=step_func, until=until_func, stash=stash)
+        if profiler is None:
+            return self.step(n=n, step_func=step_func, until=until_func, stash=stash)
+        with profiler:
+            return self.step(n=n, step_func=step_func, until=until_func, stash=stash)
+
+    def step_async(self, executor=None, threads=8, **kwargs):
+        """
+        Start stepping in the background, and return without waiting for it. All arguments of step() are accepted.
+
+        Stepping is driven by a background thread, and the successors of the states of each round are computed
+        concurrently by `executor`. Solver calls and native code release the GIL, so they overlap across states. All
+        hooks of techniques, including step_state hooks, run on the driving thread, and results are recorded in order,
+        so hooks run in the same order as they do with step().
+
+        The simulation manager must not be used until the returned future is done.
+
+        :param executor:    A concurrent.futures.Executor stepping individual states. By default, a thread pool of
+                            `threads` workers is created for this call.
+        :param threads:     The number of workers of the default executor.
+        :return:            A concurrent.futures.Future of the resulting SimulationManager. It can be awaited in asyncio
+                            after wrapping it with asyncio.wrap_future().
+        :rtype:             concurrent.futures.Future
+        """
+        return self._in_background(self.step, executor, threads, kwargs)
+
+    def run_async(self, executor=None, threads=8, **kwargs):
+        """
+        Start running in the background, and return without waiting for it. All arguments of run() are accepted.
+
+        See step_async() for how states are stepped.
+
+        :param executor:    A concurrent.futures.Executor stepping individual states. By default, a thread pool of
+                            `threads` workers is created for this call.
+        :param threads:     The number of workers of the default executor.
+        :return:            A concurrent.futures.Future of the resulting SimulationManager.
+        :rtype:             concurrent.futures.Future
+        """
+        return self._in_background(self.run, executor, threads, kwargs)
+
+    def _in_background(self, func, executor, threads, kwargs):
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+
+        def drive():
+            self._state_executor = executor
+            try:
+                pg = func(**kwargs)
+            finally:
+                self._state_executor = None
+                if own_executor:
+                    executor.shutdown(wait=False)
+            pg._state_executor = None
+            return pg
+
+        driver = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = driver.submit(drive)
+        # the driver thread exits once the call is done
+        driver.shutdown(wait=False)
+        return future
 
 
 class ErrorRecord(object):
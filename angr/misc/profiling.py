@@ -0,0 +1,192 @@
+import json
+import time
+import functools
+from collections import defaultdict
+
+import logging
+l = logging.getLogger("angr.misc.profiling")
+
+# the profiler currently recording, if any. instrumented code checks this before doing anything else.
+active_profiler = None
+
+
+class ExecutionProfiler(object):
+    """
+    Records where the time of symbolic execution goes: lifting, statements and expressions of each block, memory loads
+    and stores, and solver calls.
+
+    Time is attributed to a stack of frames. The outermost frame of every stack is the basic block being executed, so
+    that the time of everything that happens while executing a block is attributed to that block. Self time (excluding
+    nested frames) and total time (including them) are both recorded.
+
+    Use it as a context manager, or pass it to SimulationManager.run()::
+
+        with ExecutionProfiler() as prof:
+            simgr.run()
+        print prof.format_report()
+    """
+
+    def __init__(self, timer=time.time):
+        self._timer = timer
+        self._stack = [ ]
+        self._previous = None
+
+        # path (a tuple of frames) -> [ count, self time, total time ]
+        self._records = defaultdict(lambda: [ 0, 0.0, 0.0 ])
+
+    #
+    # Activation
+    #
+
+    def enable(self):
+        global active_profiler  # pylint:disable=global-statement
+        if active_profiler is self:
+            return
+        self._previous = active_profiler
+        active_profiler = self
+
+    def disable(self):
+        global active_profiler  # pylint:disable=global-statement
+        if active_profiler is self:
+            active_profiler = self._previous
+        self._previous = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # unwind frames left open by an exception
+        while self._stack:
+            self.exit()
+        self.disable()
+
+    def reset(self):
+        self._stack = [ ]
+        self._records.clear()
+
+    #
+    # Recording
+    #
+
+    def enter(self, frame):
+        """
+        Start timing a frame, nested in the currently open frame.
+
+        :param str frame:   Name of the frame.
+        """
+        now = self._timer()
+        if self._stack:
+            # pause the self time of the parent frame
+            parent = self._stack[-1]
+            parent[2] += now - parent[1]
+        self._stack.append([ frame, now, 0.0, now ])
+
+    def exit(self):
+        """
+        Stop timing the innermost open frame.
+        """
+        now = self._timer()
+        path = tuple(f[0] for f in self._stack)
+        frame, resumed, self_time, started = self._stack.pop()
+
+        record = self._records[path]
+        record[0] += 1
+        record[1] += self_time + now - resumed
+        record[2] += now - started
+
+        if self._stack:
+            # resume the self time of the parent frame
+            self._stack[-1][1] = now
+
+    #
+    # Reporting
+    #
+
+    @staticmethod
+    def _block_of(path):
+        for frame in path:
+            if frame.startswith('block '):
+                return int(frame[6:], 16)
+        return None
+
+    def report(self, sort_by='self_time', limit=None):
+        """
+        Aggregate the recorded time per block and per category. The category of a frame is its name, without the block
+        address, e.g. "block", "lift", "stmt:WrTmp", "expr:Load", "load:mem" or "solver:satisfiable".
+
+        :param str sort_by: Key to sort rows by, in descending order: "self_time", "total_time" or "count".
+        :param int limit:   Only return this many rows.
+        :return:            A list of dicts with the keys "block", "category", "count", "self_time" and "total_time".
+        """
+        rows = defaultdict(lambda: [ 0, 0.0, 0.0 ])
+        for path, (count, self_time, total_time) in self._records.iteritems():
+            category = 'block' if path[-1].startswith('block ') else path[-1]
+            row = rows[(self._block_of(path), category)]
+            row[0] += count
+            row[1] += self_time
+            # a frame nested in a frame of the same category is already accounted for
+            if path[-1] not in path[:-1]:
+                row[2] += total_time
+
+        out = [ {
+            'block': block,
+            'category': category,
+            'count': count,
+            'self_time': self_time,
+            'total_time': total_time,
+        } for (block, category), (count, self_time, total_time) in rows.iteritems() ]
+        out.sort(key=lambda r: r[sort_by], reverse=True)
+        return out if limit is None else out[:limit]
+
+    def format_report(self, sort_by='self_time', limit=30):
+        """
+        Format the report as a human-readable table.
+        """
+        lines = [ "%-18s %-28s %10s %12s %12s" % ('block', 'category', 'count', 'self (s)', 'total (s)') ]
+        for r in self.report(sort_by=sort_by, limit=limit):
+            block = '%#x' % r['block'] if r['block'] is not None else '-'
+            lines.append("%-18s %-28s %10d %12.6f %12.6f" % (block, r['category'], r['count'], r['self_time'],
+                                                             r['total_time']))
+        return "\n".join(lines)
+
+    def to_json(self, **kwargs):
+        """
+        Serialize the report to JSON. Keyword arguments are passed to report().
+        """
+        return json.dumps(self.report(**kwargs))
+
+    def to_folded(self):
+        """
+        Serialize the recorded stacks in the "folded" format understood by flame graph tools, with one line per stack
+        and the self time of the stack in microseconds.
+        """
+        lines = [ ]
+        for path, (_, self_time, _) in sorted(self._records.iteritems()):
+            us = int(self_time * 1000000)
+            if us > 0:
+                lines.append("%s %d" % (";".join(path), us))
+        return "\n".join(lines)
+
+
+def profiled(frame):
+    """
+    Decorate a function so that its calls are recorded by the active profiler, if any.
+
+    :param frame:   The name of the frame, or a function that takes the arguments of the decorated function and returns
+                    the name of the frame.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def profiled_f(*args, **kwargs):
+            prof = active_profiler
+            if prof is None:
+                return f(*args, **kwargs)
+
+            prof.enter(frame(*args, **kwargs) if callable(frame) else frame)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                prof.exit()
+        return profiled_f
+    return decorator
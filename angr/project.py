@@ -105,6 +105,8 @@ class Project(object):
                                         will try to read code from the current state instead of the original memory,
                                         regardless of the current memory protections.
     :type support_selfmodifying_code:   bool
+    :param persistent_lift_cache:       A directory in which lifted basic blocks are cached across processes and
+                                        projects, or a PersistentLiftCache instance. Disabled by default.
 
     Any additional keyword arguments passed will be passed onto ``cle.Loader``.
 
@@ -130,6 +132,7 @@ class Project(object):
                  load_options=None,
                  translation_cache=True,
                  support_selfmodifying_code=False,
+                 persistent_lift_cache=None,
                  **kwargs):
 
         # Step 1: Load the binary
@@ -190,10 +193,19 @@ class Project(object):
         engine_cls = get_default_engine(type(self.loader.main_object))
         if not engine_cls:
             raise AngrError("No engine associated with loader %s" % str(type(self.loader.main_object)))
+        engine_kwargs = {}
+        if persistent_lift_cache is not None:
+            if not isinstance(persistent_lift_cache, PersistentLiftCache):
+                namespace = None
+                if self.filename is not None:
+                    namespace = PersistentLiftCache.hash_file(self.filename)
+                persistent_lift_cache = PersistentLiftCache(persistent_lift_cache, namespace=namespace)
+            engine_kwargs['persistent_cache'] = persistent_lift_cache
         engine = engine_cls(
                 stop_points=self._sim_procedures,
                 use_cache=translation_cache,
-                support_selfmodifying_code=support_selfmodifying_code)
+                support_selfmodifying_code=support_selfmodifying_code,
+                **engine_kwargs)
         procedure_engine = SimEngineProcedure()
         hook_engine = SimEngineHook(self)
         failure_engine = SimEngineFailure(self)
@@ -592,6 +604,7 @@ from .simos import SimOS, os_mapping
 from .analyses.analysis import Analyses
 from .surveyors import Surveyors
 from .knowledge_base import KnowledgeBase
-from .engines import SimEngineFailure, SimEngineSyscall, SimEngineProcedure, SimEngineVEX, SimEngineUnicorn, SimEngineHook
+from .engines import SimEngineFailure, SimEngineSyscall, SimEngineProcedure, SimEngineVEX, SimEngineUnicorn, SimEngineHook, \
+    PersistentLiftCache
 from .misc.ux import once
 from .procedures import SIM_PROCEDURES, SIM_LIBRARIES
@@ -150,6 +150,23 @@ ABSTRACT_SOLVER = "ABSTRACT_SOLVER"
 # this stops SimRun for checking the satisfiability of successor states
 LAZY_SOLVES = "LAZY_SOLVES"
 
+# this makes SimSuccessors check the satisfiability of all successors of a step together, at the end of the step. The
+# constraints shared with the initial state are only sent to the solver once, and each successor is checked
+# incrementally against them
+BATCH_SUCCESSOR_SAT_CHECKS = "BATCH_SUCCESSOR_SAT_CHECKS"
+
+# this makes SimSolver look up results of satisfiable(), eval(), min() and max() in a cache shared by all states in
+# the process before asking the solver. See angr.state_plugins.solver_cache.
+SOLVER_RESULT_CACHE = "SOLVER_RESULT_CACHE"
+
+# this makes SimSolver send only the constraints that share variables with a query (directly or through other
+# constraints) to the solver when evaluating expressions or checking extra constraints
+SLICE_INDEPENDENT_CONSTRAINTS = "SLICE_INDEPENDENT_CONSTRAINTS"
+
+# this makes SimSolver send exact queries to a pool of worker processes instead of solving them in this process. See
+# angr.state_plugins.solver_pool.
+SOLVER_WORKER_POOL = "SOLVER_WORKER_POOL"
+
 # This makes angr downsize solvers wherever reasonable.
 DOWNSIZE_Z3 = "DOWNSIZE_Z3"
 
@@ -165,6 +182,9 @@ FAST_MEMORY = "FAST_MEMORY"
 # use FastMemory for registers
 FAST_REGISTERS = "FAST_REGISTERS"
 
+# keep concrete memory in byte arrays instead of memory objects, with symbolic data in a sparse overlay
+CONCRETE_MEMORY_PAGES = "CONCRETE_MEMORY_PAGES"
+
 # Under-constrained symbolic execution
 UNDER_CONSTRAINED_SYMEXEC = "UNDER_CONSTRAINED_SYMEXEC"
 
@@ -183,6 +203,15 @@ UNICORN_AGGRESSIVE_CONCRETIZATION = "UNICORN_AGGRESSIVE_CONCRETIZATION"
 
 UNICORN_HANDLE_TRANSMIT_SYSCALL = "UNICORN_HANDLE_TRANSMIT_SYSCALL"
 
+# keep memory mapped in unicorn between runs, and only remap the regions whose pages changed since the last run
+UNICORN_WARM_SESSION = "UNICORN_WARM_SESSION"
+
+# run concrete write, brk and mmap syscalls natively inside unicorn, and replay their effects into the state afterwards
+UNICORN_NATIVE_SYSCALLS = "UNICORN_NATIVE_SYSCALLS"
+
+# learn per block and calling context whether entering unicorn pays off, and step the sites where it does not with VEX
+UNICORN_ADAPTIVE_ENTRY = "UNICORN_ADAPTIVE_ENTRY"
+
 # floating point support
 SUPPORT_FLOATING_POINT = "SUPPORT_FLOATING_POINT"
 
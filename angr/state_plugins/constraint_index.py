@@ -0,0 +1,145 @@
+import logging
+l = logging.getLogger("angr.state_plugins.constraint_index")
+
+
+class ConstraintComponent(object):
+    """
+    A set of constraints whose variables are connected, i.e., the constraints cannot be solved independently of each
+    other. Components are immutable, so they can be shared between copies of an index.
+    """
+
+    __slots__ = ('variables', 'constraints', '_solver', )
+
+    def __init__(self, variables, constraints):
+        self.variables = variables
+        self.constraints = constraints
+        # a frontend holding exactly these constraints, created on demand
+        self._solver = None
+
+    def __repr__(self):
+        return "<ConstraintComponent with %d variables, %d constraints>" % (len(self.variables), len(self.constraints))
+
+    def solver(self, template):
+        """
+        Get a frontend that holds all constraints of this component.
+
+        :param template:    The frontend whose type the new frontend should have.
+        :return:            A claripy frontend.
+        """
+        if self._solver is None:
+            self._solver = template.blank_copy()
+            self._solver.add(self.constraints)
+        return self._solver
+
+
+class ConstraintIndex(object):
+    """
+    An index of constraints of a state, grouped into components of constraints connected through shared variables.
+    It is updated incrementally as constraints are added.
+
+    Copying an index is O(1): the copy shares all data with the original until either of them is modified.
+    """
+
+    def __init__(self, var_to_component=None, ground=()):
+        # variable name -> ConstraintComponent
+        self._var_to_component = { } if var_to_component is None else var_to_component
+        # constraints without any variable
+        self._ground = ground
+
+        self._shared = False
+
+    def __len__(self):
+        return len(self.components())
+
+    def __repr__(self):
+        return "<ConstraintIndex with %d components>" % len(self)
+
+    def copy(self):
+        """
+        Make a copy of the index.
+
+        :return:    The new ConstraintIndex instance.
+        :rtype:     ConstraintIndex
+        """
+        o = ConstraintIndex(var_to_component=self._var_to_component, ground=self._ground)
+        o._shared = True
+        self._shared = True
+        return o
+
+    def components(self):
+        """
+        Get all components in the index.
+
+        :return:    A list of ConstraintComponent instances.
+        :rtype:     list
+        """
+        return list(set(self._var_to_component.values()))
+
+    def add(self, constraints):
+        """
+        Add constraints to the index.
+
+        :param constraints: An iterable of claripy Bool ASTs.
+        :return:            None
+        """
+        for c in constraints:
+            variables = c.variables
+            if not variables:
+                self._ground += (c, )
+                continue
+
+            if self._shared:
+                self._var_to_component = dict(self._var_to_component)
+                self._shared = False
+
+            merged = set(self._var_to_component[v] for v in variables if v in self._var_to_component)
+            if len(merged) == 1:
+                component = next(iter(merged))
+                if variables <= component.variables:
+                    # no new variable joins the component
+                    new_component = ConstraintComponent(component.variables, component.constraints + (c, ))
+                    for v in new_component.variables:
+                        self._var_to_component[v] = new_component
+                    continue
+
+            all_variables = set(variables)
+            all_constraints = [ ]
+            for component in merged:
+                all_variables |= component.variables
+                all_constraints.extend(component.constraints)
+            all_constraints.append(c)
+
+            new_component = ConstraintComponent(frozenset(all_variables), tuple(all_constraints))
+            for v in new_component.variables:
+                self._var_to_component[v] = new_component
+
+    def relevant_constraints(self, variables):
+        """
+        Get all constraints that may affect the values of the given variables.
+
+        :param iterable variables:  Names of variables.
+        :return:                    A list of constraints.
+        :rtype:                     list
+        """
+        components = set(self._var_to_component[v] for v in variables if v in self._var_to_component)
+        constraints = list(self._ground)
+        for component in components:
+            constraints.extend(component.constraints)
+        return constraints
+
+    def solver(self, variables, template):
+        """
+        Get a frontend that holds only the constraints that may affect the values of the given variables.
+
+        :param iterable variables:  Names of variables.
+        :param template:            The frontend whose type the new frontend should have.
+        :return:                    A claripy frontend.
+        """
+        components = set(self._var_to_component[v] for v in variables if v in self._var_to_component)
+        if len(components) == 1 and not self._ground:
+            # frontends of single components are kept around and shared by all queries hitting the same component
+            return next(iter(components)).solver(template)
+
+        s = template.blank_copy()
+        s.add(self.relevant_constraints(variables))
+        return s
@@ -1,13 +1,18 @@
 #!/usr/bin/env python
 
 import sys
+import itertools
 import functools
 import time
 import logging
 
 from .plugin import SimStatePlugin
 from .sim_action_object import ast_stripping_decorator, SimActionObject
+from .solver_cache import SolverResultCache, solver_result_cache
+from .constraint_index import ConstraintIndex
+from .solver_pool import solver_worker_pool
 from ..misc.ux import deprecated
+from ..misc.profiling import profiled
 
 l = logging.getLogger("angr.state_plugins.solver")
 
@@ -21,6 +26,9 @@ _timing_enabled = False
 
 lt = logging.getLogger("angr.state_plugins.solver_timing")
 def timed_function(f):
+    return profiled('solver:%s' % f.__name__.lstrip('_'))(_timed_function(f))
+
+def _timed_function(f):
     if _timing_enabled:
         @functools.wraps(f)
         def timing_guy(*args, **kwargs):
@@ -178,11 +186,17 @@ class SimSolver(SimStatePlugin):
     """
     Symbolic solver.
     """
-    def __init__(self, solver=None, all_variables=None): #pylint:disable=redefined-outer-name
+    def __init__(self, solver=None, all_variables=None, constraint_index=None, known_satisfiable=False): #pylint:disable=redefined-outer-name
         l.debug("Creating SimSolverClaripy.")
         SimStatePlugin.__init__(self)
         self._stored_solver = solver
         self.all_variables = [ ] if all_variables is None else all_variables
+        # groups constraints by connected variables. it is built from the solver on the first sliced query, and kept
+        # up to date afterwards
+        self._constraint_index = constraint_index
+        # whether a query on all constraints has succeeded since the last constraint was added. queries are only sliced
+        # when this is True
+        self._known_satisfiable = known_satisfiable
 
     def reload_solver(self):
         """
@@ -290,7 +304,10 @@ class SimSolver(SimStatePlugin):
     #
 
     def copy(self):
-        return SimSolver(solver=self._solver.branch(), all_variables=self.all_variables)
+        return SimSolver(solver=self._solver.branch(), all_variables=self.all_variables,
+                         constraint_index=self._constraint_index.copy() if self._constraint_index is not None else None,
+                         known_satisfiable=self._known_satisfiable
+                         )
 
     @error_converter
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=W0613
@@ -298,6 +315,9 @@ class SimSolver(SimStatePlugin):
             [ oc._solver for oc in others ], merge_conditions,
             common_ancestor=common_ancestor._solver if common_ancestor is not None else None
         )
+        # constraints are rewritten by merging. the index will be rebuilt when it is needed
+        self._constraint_index = None
+        self._known_satisfiable = False
         return merging_occurred
 
     @error_converter
@@ -327,6 +347,163 @@ class SimSolver(SimStatePlugin):
         else:
             return self.Or(self.Not(self.state._global_condition), c)
 
+    @property
+    def constraint_index(self):
+        """
+        The index of constraints of this state, grouped by connected variables.
+
+        :rtype: ConstraintIndex
+        """
+        if self._constraint_index is None:
+            self._constraint_index = ConstraintIndex()
+            self._constraint_index.add(self._solver.constraints)
+        return self._constraint_index
+
+    def _sliced_solver(self, exprs, extra_constraints, exact):
+        """
+        Get a frontend that only holds the constraints that may affect a query. If the option
+        SLICE_INDEPENDENT_CONSTRAINTS is not enabled, the frontend of this state is returned.
+
+        Constraints that share no variable with the query are left out, which is only sound if they are satisfiable.
+        Hence queries are only sliced once a query on all constraints of the state has succeeded, and until another
+        constraint is added. States that are never checked, e.g. with LAZY_SOLVES, are queried in full until then.
+
+        :param exprs:               Expressions of the query.
+        :param extra_constraints:   Extra constraints of the query, already adjusted to the global condition.
+        :param exact:               If False, the query asks for approximate results.
+        :return:                    A claripy frontend.
+        """
+        if o.SLICE_INDEPENDENT_CONSTRAINTS not in self.state.options or exact is False:
+            return self._solver
+        if o.ABSTRACT_SOLVER in self.state.options or o.REPLACEMENT_SOLVER in self.state.options:
+            return self._solver
+        if not self._known_satisfiable:
+            return self._solver
+
+        variables = set()
+        for e in itertools.chain(exprs, extra_constraints):
+            if isinstance(e, claripy.ast.Base):
+                variables |= e.variables
+        return self.constraint_index.solver(variables, self._solver)
+
+    def _record_satisfiable(self, solver, exact):
+        """
+        Remember that all constraints of this state are satisfiable, after an exact query on all of them (and possibly
+        on extra constraints) found a solution.
+
+        :param solver:  The frontend the query was sent to.
+        :param exact:   If False, the query asked for approximate results.
+        :return:        None
+        """
+        if solver is self._solver and exact is not False:
+            self._known_satisfiable = True
+
+    def _use_worker_pool(self, exact):
+        """
+        Check if queries should be sent to the solver worker pool.
+
+        :param exact:   If False, the query asks for approximate results.
+        :rtype:         bool
+        """
+        if o.SOLVER_WORKER_POOL not in self.state.options or exact is False:
+            return False
+        return o.SYMBOLIC in self.state.options and not o.approximation & self.state.options and \
+               o.ABSTRACT_SOLVER not in self.state.options and o.REPLACEMENT_SOLVER not in self.state.options
+
+    def _query(self, solver, kind, args, extra_constraints, exact):
+        """
+        Run a query on a frontend, or on the solver worker pool if SOLVER_WORKER_POOL is enabled.
+
+        :param solver:              The frontend the query is meant for.
+        :param str kind:            The query, one of 'satisfiable', 'eval', 'min' and 'max'.
+        :param tuple args:          Arguments of the query.
+        :param extra_constraints:   Extra constraints of the query, already adjusted to the global condition.
+        :param exact:               If False, the query asks for approximate results.
+        :return:                    The result of the query.
+        """
+        if self._use_worker_pool(exact):
+            return solver_worker_pool.submit(kind, solver.constraints, args, extra_constraints).result()
+        return getattr(solver, kind)(*args, extra_constraints=extra_constraints, exact=exact)
+
+    def _submit(self, kind, exprs, args, extra_constraints, timeout):
+        """
+        Send a query to the solver worker pool, with constraints sliced if SLICE_INDEPENDENT_CONSTRAINTS is enabled.
+
+        :return:    A SolverFuture.
+        """
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        solver = self._sliced_solver(exprs, extra_constraints, None) if exprs or extra_constraints else self._solver
+        return solver_worker_pool.submit(kind, solver.constraints, args, extra_constraints, timeout=timeout)
+
+    @ast_stripping_decorator
+    def satisfiable_async(self, extra_constraints=(), timeout=None):
+        """
+        Check if the state is satisfiable in the solver worker pool, without waiting for the result.
+
+        :param extra_constraints:   Extra constraints to apply to the solver.
+        :param timeout:             The number of seconds the query may take. Defaults to the timeout of the pool.
+        :return:                    A SolverFuture of True or False.
+        :rtype:                     SolverFuture
+        """
+        return self._submit('satisfiable', (), (), extra_constraints, timeout)
+
+    @ast_stripping_decorator
+    def eval_async(self, e, n, extra_constraints=(), timeout=None):
+        """
+        Evaluate an expression in the solver worker pool, without waiting for the result.
+
+        :param e:                   The expression.
+        :param n:                   The number of desired solutions.
+        :param extra_constraints:   Extra constraints to apply to the solver.
+        :param timeout:             The number of seconds the query may take. Defaults to the timeout of the pool.
+        :return:                    A SolverFuture of a tuple of solutions, in the form of Python primitives.
+        :rtype:                     SolverFuture
+        """
+        return self._submit('eval', (e, ), (e, n), extra_constraints, timeout)
+
+    def _cached_constraint_set(self, solver, extra_constraints, exact):
+        """
+        Get the canonical constraint set of a query for the solver result cache.
+
+        :param solver:              The frontend the query is sent to.
+        :param extra_constraints:   Extra constraints of the query, already adjusted to the global condition.
+        :param exact:               If False, the query asks for approximate results.
+        :return:                    A frozenset of constraint hashes, or None if the query should not be cached.
+        """
+        if o.SOLVER_RESULT_CACHE not in self.state.options or exact is False:
+            return None
+        if o.ABSTRACT_SOLVER in self.state.options or o.REPLACEMENT_SOLVER in self.state.options or \
+                o.approximation & self.state.options:
+            return None
+        return SolverResultCache.constraint_set(solver.constraints, extra_constraints)
+
+    def _cached_query(self, query, solver, extra_constraints, exact, f):
+        """
+        Run a query on a frontend through the solver result cache.
+
+        :param tuple query:         The query, without the constraint set.
+        :param solver:              The frontend the query is sent to.
+        :param extra_constraints:   Extra constraints of the query, already adjusted to the global condition.
+        :param exact:               If False, the query asks for approximate results.
+        :param f:                   A function that runs the query on the frontend.
+        :return:                    The result of the query.
+        """
+        constraint_set = self._cached_constraint_set(solver, extra_constraints, exact)
+        if constraint_set is None:
+            return f()
+
+        hit, r = solver_result_cache.lookup(constraint_set, query)
+        if hit:
+            return r
+
+        try:
+            r = f()
+        except claripy.UnsatError:
+            solver_result_cache.store_satisfiable(constraint_set, False)
+            raise
+        solver_result_cache.store(constraint_set, query, r)
+        return r
+
     def _adjust_constraint_list(self, constraints):
         if self.state._global_condition is None:
             return constraints
@@ -366,7 +543,12 @@ class SimSolver(SimStatePlugin):
         :return: a tuple of the solutions, in the form of Python primitives
         :rtype: tuple
         """
-        return self._solver.eval(e, n, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        solver = self._sliced_solver((e, ), extra_constraints, exact)
+        r = self._cached_query(('eval', hash(e), n), solver, extra_constraints, exact,
+                               lambda: self._query(solver, 'eval', (e, n), extra_constraints, exact))
+        self._record_satisfiable(solver, exact)
+        return r
 
     @concrete_path_scalar
     @timed_function
@@ -378,7 +560,12 @@ class SimSolver(SimStatePlugin):
             er = self._solver.max(e, extra_constraints=self._adjust_constraint_list(extra_constraints))
             assert er <= ar
             return ar
-        return self._solver.max(e, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        solver = self._sliced_solver((e, ), extra_constraints, exact)
+        r = self._cached_query(('max', hash(e)), solver, extra_constraints, exact,
+                               lambda: self._query(solver, 'max', (e, ), extra_constraints, exact))
+        self._record_satisfiable(solver, exact)
+        return r
 
     @concrete_path_scalar
     @timed_function
@@ -390,7 +577,12 @@ class SimSolver(SimStatePlugin):
             er = self._solver.min(e, extra_constraints=self._adjust_constraint_list(extra_constraints))
             assert ar <= er
             return ar
-        return self._solver.min(e, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        solver = self._sliced_solver((e, ), extra_constraints, exact)
+        r = self._cached_query(('min', hash(e)), solver, extra_constraints, exact,
+                               lambda: self._query(solver, 'min', (e, ), extra_constraints, exact))
+        self._record_satisfiable(solver, exact)
+        return r
 
     @timed_function
     @ast_stripping_decorator
@@ -456,14 +648,32 @@ class SimSolver(SimStatePlugin):
             if er is True:
                 assert ar is True
             return ar
-        return self._solver.satisfiable(extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        # without extra constraints, all constraints of the state are relevant
+        solver = self._sliced_solver((), extra_constraints, exact) if extra_constraints else self._solver
+        constraint_set = self._cached_constraint_set(solver, extra_constraints, exact)
+        r = None
+        if constraint_set is not None:
+            r = solver_result_cache.lookup_satisfiable(constraint_set)
+        if r is None:
+            r = self._query(solver, 'satisfiable', (), extra_constraints, exact)
+            if constraint_set is not None:
+                solver_result_cache.store_satisfiable(constraint_set, r)
+        if r:
+            self._record_satisfiable(solver, exact)
+        return r
 
     @timed_function
     @ast_stripping_decorator
     @error_converter
     def add(self, *constraints):
         cc = self._adjust_constraint_list(constraints)
-        return self._solver.add(cc)
+        r = self._solver.add(cc)
+        if self._constraint_index is not None:
+            self._constraint_index.add(cc)
+        if cc:
+            self._known_satisfiable = False
+        return r
 
     #
     # And some convenience stuff
@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+import logging
+l = logging.getLogger("angr.state_plugins.solver_cache")
+
+
+class SolverResultCache(object):
+    """
+    A process-wide, size-bounded cache of solver results, shared by all states.
+
+    Entries are keyed by a canonical form of the constraint set, which is the frozenset of structural hashes of all
+    constraints, and by the query. Results of eval(), min() and max() are only reused when the constraint set is
+    identical. Satisfiability is also answered from related constraint sets, the way KLEE's counterexample cache
+    does: a constraint set is satisfiable if a superset of it is known to be satisfiable, and unsatisfiable if a
+    subset of it is known to be unsatisfiable. Any successful eval(), min() or max() proves that its constraint set
+    is satisfiable.
+
+    When the cache holds more than `max_size` entries, the least recently used ones are evicted. All lookups and
+    updates hold a lock, since states may be stepped on several threads at once.
+    """
+
+    def __init__(self, max_size=65536):
+        """
+        :param int max_size:    The maximum number of cached query results and satisfiability results each.
+        """
+        self.max_size = max_size
+        self._lock = threading.RLock()
+
+        # (constraint set, query) -> result
+        self._results = OrderedDict()
+        # constraint set -> True/False
+        self._sat = OrderedDict()
+        # constraint hash -> satisfiable constraint sets containing it, for finding supersets
+        self._sat_index = defaultdict(set)
+        # constraint hash -> unsatisfiable constraint sets containing it, for finding subsets
+        self._unsat_index = defaultdict(set)
+
+        self.hits = 0
+        self.superset_hits = 0
+        self.subset_hits = 0
+        self.misses = 0
+
+    #
+    # Keys
+    #
+
+    @staticmethod
+    def constraint_set(constraints, extra_constraints=()):
+        """
+        Build the canonical form of a constraint set.
+
+        :param constraints:         Constraints of the solver.
+        :param extra_constraints:   Extra constraints of the query.
+        :return:                    A frozenset of constraint hashes.
+        :rtype:                     frozenset
+        """
+        s = set(hash(c) for c in constraints)
+        s.update(hash(c) for c in extra_constraints)
+        return frozenset(s)
+
+    #
+    # Statistics
+    #
+
+    @property
+    def lookups(self):
+        return self.hits + self.superset_hits + self.subset_hits + self.misses
+
+    @property
+    def hit_rate(self):
+        """
+        The ratio of lookups answered from the cache, including subset and superset hits.
+        """
+        lookups = self.lookups
+        return float(lookups - self.misses) / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+        Get statistics of the cache.
+
+        :return:    A dict of counters and the hit rate.
+        :rtype:     dict
+        """
+        return {
+            'hits': self.hits,
+            'superset_hits': self.superset_hits,
+            'subset_hits': self.subset_hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'results': len(self._results),
+            'sat_results': len(self._sat),
+        }
+
+    def clear(self):
+        """
+        Drop all cached results and reset the statistics.
+        """
+        with self._lock:
+            self._results.clear()
+            self._sat.clear()
+            self._sat_index.clear()
+            self._unsat_index.clear()
+            self.hits = self.superset_hits = self.subset_hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._results) + len(self._sat)
+
+    def __repr__(self):
+        return "<SolverResultCache with %d entries, %.1f%% hit rate>" % (len(self), self.hit_rate * 100)
+
+    #
+    # Query results
+    #
+
+    def lookup(self, constraint_set, query):
+        """
+        Look up the result of a query on a constraint set.
+
+        :param frozenset constraint_set:    The canonical constraint set.
+        :param tuple query:                 The query, such as ('max', hash(e), exact).
+        :return:                            A tuple of (True, result) on a hit, or (False, None) on a miss.
+        :rtype:                             tuple
+        """
+        with self._lock:
+            key = (constraint_set, query)
+            try:
+                r = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+                return False, None
+
+            self._results[key] = r
+            self.hits += 1
+            return True, r
+
+    def store(self, constraint_set, query, result):
+        """
+        Store the result of a query on a constraint set. This also records the constraint set as satisfiable.
+
+        :param frozenset constraint_set:    The canonical constraint set.
+        :param tuple query:                 The query.
+        :param result:                      The result of the query.
+        """
+        with self._lock:
+            key = (constraint_set, query)
+            self._results.pop(key, None)
+            self._results[key] = result
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+            self.store_satisfiable(constraint_set, True)
+
+    #
+    # Satisfiability
+    #
+
+    def lookup_satisfiable(self, constraint_set):
+        """
+        Look up whether a constraint set is satisfiable, either directly or from a known superset or subset of it.
+
+        :param frozenset constraint_set:    The canonical constraint set.
+        :return:                            True or False if the result is known, None otherwise.
+        """
+        with self._lock:
+            r = self._sat.pop(constraint_set, None)
+            if r is not None:
+                self._sat[constraint_set] = r
+                self.hits += 1
+                return r
+
+            if constraint_set:
+                # a satisfiable superset contains every constraint, so it shows up in the smallest bucket
+                smallest = min((self._sat_index.get(h, ()) for h in constraint_set), key=len)
+                for other in smallest:
+                    if constraint_set <= other:
+                        self.superset_hits += 1
+                        return True
+
+                # an unsatisfiable subset shows up in the bucket of any of its constraints. only unsatisfiable sets
+                # are indexed there, so the many satisfiable sets sharing a path prefix are never visited
+                if self._unsat_index:
+                    seen = set()
+                    for h in constraint_set:
+                        for other in self._unsat_index.get(h, ()):
+                            if other in seen:
+                                continue
+                            seen.add(other)
+                            if other <= constraint_set:
+                                self.subset_hits += 1
+                                return False
+
+            self.misses += 1
+            return None
+
+    def store_satisfiable(self, constraint_set, result):
+        """
+        Record whether a constraint set is satisfiable.
+
+        :param frozenset constraint_set:    The canonical constraint set.
+        :param bool result:                 True if it is satisfiable, False otherwise.
+        """
+        result = bool(result)
+        with self._lock:
+            old = self._sat.pop(constraint_set, None)
+            if old is not None and old is not result:
+                self._unindex(constraint_set, old)
+            if old is not result:
+                index = self._sat_index if result else self._unsat_index
+                for h in constraint_set:
+                    index[h].add(constraint_set)
+            self._sat[constraint_set] = result
+
+            while len(self._sat) > self.max_size:
+                evicted, evicted_result = self._sat.popitem(last=False)
+                self._unindex(evicted, evicted_result)
+
+    def _unindex(self, constraint_set, result):
+        index = self._sat_index if result else self._unsat_index
+        for h in constraint_set:
+            bucket = index[h]
+            bucket.discard(constraint_set)
+            if not bucket:
+                del index[h]
+
+
+# the cache shared by all states in this process
+solver_result_cache = SolverResultCache()
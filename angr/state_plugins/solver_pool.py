@@ -0,0 +1,177 @@
+import time
+import multiprocessing
+
+import logging
+l = logging.getLogger("angr.state_plugins.solver_pool")
+
+import claripy
+
+# the kinds of queries that workers can run
+QUERIES = ('satisfiable', 'eval', 'min', 'max')
+
+
+def _run_query(kind, constraints, args, extra_constraints, timeout):
+    """
+    Run a query inside a worker process.
+
+    :return: A tuple of a status ('ok', 'unsat', 'timeout' or 'error') and the result or the error message.
+    """
+    solver = claripy.Solver(timeout=int(timeout * 1000)) if timeout is not None else claripy.Solver()
+    start = time.time()
+    try:
+        solver.add(constraints)
+        r = 'ok', getattr(solver, kind)(*args, extra_constraints=extra_constraints)
+    except claripy.UnsatError as ex:
+        r = 'unsat', str(ex)
+    except claripy.ClaripyError as ex:
+        r = 'error', "%s: %s" % (type(ex).__name__, ex)
+
+    # z3 reports "unknown" when it is interrupted, which claripy takes as unsat. the result cannot be trusted.
+    if timeout is not None and time.time() - start >= timeout:
+        return 'timeout', "interrupted after %.2f seconds" % (time.time() - start)
+    return r
+
+
+class SolverFuture(object):
+    """
+    The pending result of a query sent to a SolverWorkerPool.
+    """
+
+    def __init__(self, async_result, timeout=None):
+        """
+        :param async_result:    The AsyncResult of the query.
+        :param timeout:         The number of seconds the query may take, or None to wait forever.
+        """
+        self._async_result = async_result
+        self.timeout = timeout
+        self.deadline = time.time() + timeout if timeout is not None else None
+
+    def __repr__(self):
+        if self.done():
+            status = 'done'
+        elif self.timed_out():
+            status = 'timed out'
+        else:
+            status = 'pending'
+        return "<SolverFuture %s>" % status
+
+    def done(self):
+        """
+        Check if the worker has finished the query.
+
+        :rtype: bool
+        """
+        return self._async_result.ready()
+
+    def timed_out(self):
+        """
+        Check if the query is still running past its deadline.
+
+        :rtype: bool
+        """
+        return self.deadline is not None and not self.done() and time.time() >= self.deadline
+
+    def wait(self, timeout=None):
+        """
+        Wait until the query finishes, its deadline passes, or `timeout` seconds pass, whichever comes first.
+
+        :param timeout: The maximum number of seconds to wait, or None.
+        :return:        True if the query has finished, False otherwise.
+        :rtype:         bool
+        """
+        if self.deadline is not None:
+            remaining = max(self.deadline - time.time(), 0)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self._async_result.wait(timeout)
+        return self.done()
+
+    def result(self):
+        """
+        Wait for the result of the query.
+
+        :return:                        The result of the query.
+        :raises SimSolverTimeoutError:  If the query does not finish before its deadline.
+        :raises claripy.UnsatError:     If the constraints are unsatisfiable.
+        :raises SimSolverError:         If the worker fails to run the query.
+        """
+        if not self.wait():
+            raise SimSolverTimeoutError("Solver query did not finish within %s seconds" % self.timeout)
+
+        status, r = self._async_result.get()
+        if status == 'ok':
+            return r
+        elif status == 'unsat':
+            raise claripy.UnsatError(r)
+        elif status == 'timeout':
+            raise SimSolverTimeoutError("Solver query did not finish within %s seconds: %s" % (self.timeout, r))
+        raise SimSolverError("Solver worker failed: %s" % r)
+
+
+class SolverWorkerPool(object):
+    """
+    A pool of local worker processes that run solver queries.
+
+    Constraints and expressions are pickled and sent to a worker, which solves them with a fresh claripy.Solver.
+    Queries return SolverFutures, so the caller can keep working while they run. A timeout is enforced both by z3
+    inside the worker and by the future, so a query that never finishes does not block the caller. Worker processes
+    are started on the first query.
+    """
+
+    def __init__(self, workers=None, timeout=None):
+        """
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        :param timeout: The default number of seconds a query may take, or None to wait forever.
+        """
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.timeout = timeout
+        self._pool = None
+
+    def __getstate__(self):
+        s = dict(self.__dict__)
+        s['_pool'] = None
+        return s
+
+    def __del__(self):
+        try:
+            self.shutdown()
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+    def shutdown(self):
+        """
+        Terminate the worker processes. They are started again on the next query.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def submit(self, kind, constraints, args=(), extra_constraints=(), timeout=None):
+        """
+        Send a query to a worker.
+
+        :param str kind:            The query, one of 'satisfiable', 'eval', 'min' and 'max'.
+        :param constraints:         Constraints of the solver.
+        :param tuple args:          Arguments of the query, such as (e, n) for eval.
+        :param extra_constraints:   Extra constraints of the query.
+        :param timeout:             The number of seconds the query may take. Defaults to the timeout of the pool.
+        :return:                    A SolverFuture.
+        :rtype:                     SolverFuture
+        """
+        if kind not in QUERIES:
+            raise SimSolverError("Unsupported solver query %s" % kind)
+
+        if timeout is None:
+            timeout = self.timeout
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+
+        async_result = self._pool.apply_async(_run_query, (kind, tuple(constraints), tuple(args),
+                                                           tuple(extra_constraints), timeout))
+        return SolverFuture(async_result, timeout=timeout)
+
+
+# the pool used by SimSolver when SOLVER_WORKER_POOL is enabled
+solver_worker_pool = SolverWorkerPool()
+
+from ..errors import SimSolverError, SimSolverTimeoutError
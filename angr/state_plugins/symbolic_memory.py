@@ -55,6 +55,9 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         self.read_strategies = read_strategies
         self.write_strategies = write_strategies
 
+        # results of address concretization. they are valid for the rest of the current block, so they are not copied
+        # along with the memory. see _apply_concretization_strategies()
+        self._concretization_cache = { }
 
     #
     # Lifecycle management
@@ -107,6 +110,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
             o.write_strategies for o in others
         ])
         merged_bytes = self._merge(others, changed_bytes, merge_conditions=merge_conditions)
+        self._concretization_cache.clear()
 
         return len(merged_bytes) > 0
 
@@ -130,6 +134,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         changed_bytes = self._changes_to_merge(others)
         l.info("Memory %s widening bytes %s", self.id, changed_bytes)
         self._merge(others, changed_bytes, is_widening=True)
+        self._concretization_cache.clear()
         return len(changed_bytes) > 0
 
     def _merge(self, others, changed_bytes, merge_conditions=None, is_widening=False):
@@ -346,11 +351,48 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
     # Concretization strategies
     #
 
+    def _concretization_cache_key(self, addr, strategies, action):
+        """
+        Get the key of an address in the concretization cache, or None if its concretization cannot be cached.
+
+        Results are only cached if every strategy is deterministic, and if no breakpoint may intervene.
+        """
+
+        if not all(s.deterministic for s in strategies):
+            return None
+        if self.state.has_plugin('inspector') and self.state.inspect._breakpoints['address_concretization']:
+            return None
+        return action, tuple(strategies), hash(addr)
+
     def _apply_concretization_strategies(self, addr, strategies, action):
         """
         Applies concretization strategies on the address until one of them succeeds.
+
+        Results are cached until the constraints of the state change. If an address was concretized to a single value
+        and that value became the only solution since then, e.g. because a load constrained the address to it, the
+        cached value is reused after a single solver check.
         """
 
+        key = self._concretization_cache_key(addr, strategies, action)
+        if key is not None:
+            constraints_key = tuple(hash(c) for c in self.state.se.constraints)
+            cached = self._concretization_cache.get(key, None)
+            if cached is not None:
+                cached_constraints_key, a = cached
+                if cached_constraints_key == constraints_key:
+                    return list(a)
+                if len(a) == 1 and self.state.se.is_true(addr == a[0]):
+                    self._concretization_cache[key] = (constraints_key, a)
+                    return list(a)
+
+            a = self._apply_concretization_strategies_core(addr, strategies, action)
+            self._concretization_cache[key] = (constraints_key, tuple(a))
+            return a
+
+        return self._apply_concretization_strategies_core(addr, strategies, action)
+
+    def _apply_concretization_strategies_core(self, addr, strategies, action):
+
         # we try all the strategies in order
         for s in strategies:
             # first, we trigger the SimInspect breakpoint and give it a chance to intervene
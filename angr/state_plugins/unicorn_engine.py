@@ -41,6 +41,35 @@ TRANSMIT_RECORD._fields_ = [
         ('count', ctypes.c_uint32)
     ]
 
+class SYSCALL_RECORD(ctypes.Structure): # syscall_record_t
+    pass
+
+SYSCALL_RECORD._fields_ = [
+        ('kind', ctypes.c_uint32),
+        ('result', ctypes.c_uint64),
+        ('fd', ctypes.c_uint64),
+        ('data', ctypes.c_void_p),
+        ('count', ctypes.c_uint64),
+        ('map_address', ctypes.c_uint64),
+        ('map_length', ctypes.c_uint64),
+        ('perms', ctypes.c_uint32)
+    ]
+
+class NATIVE_SYSCALL(object): # native_syscall_t
+    NONE        = 0
+    WRITE       = 1
+    BRK         = 2
+    MMAP        = 3
+    OLD_MMAP    = 4
+
+    # names of the syscalls in the syscall library -> the native implementation
+    by_name = {
+        'write': WRITE,
+        'brk': BRK,
+        'mmap': MMAP,
+        'old_mmap': OLD_MMAP,
+    }
+
 class STOP(object): # stop_t
     STOP_NORMAL         = 0
     STOP_STOPPOINT      = 1
@@ -103,6 +132,9 @@ class Uniwrapper(unicorn.Uc if unicorn is not None else object):
         self.cache_key = cache_key
         self.wrapped_mapped = set()
         self.wrapped_hooks = set()
+        # regions that stay mapped when the memory is reset: (addr, size) -> (options, pages)
+        # see Unicorn._warm_up()
+        self.warm_regions = { }
         self.id = None
         unicorn.Uc.__init__(self, arch.uc_arch, arch.uc_mode)
 
@@ -128,14 +160,17 @@ class Uniwrapper(unicorn.Uc if unicorn is not None else object):
         #l.debug("Unmapping %d bytes at %#x", size, addr)
         m = unicorn.Uc.mem_unmap(self, addr, size)
         self.wrapped_mapped.discard((addr, size))
+        self.warm_regions.pop((addr, size), None)
         return m
 
     def mem_reset(self):
         #l.debug("Resetting memory.")
         for addr,size in self.wrapped_mapped:
+            if (addr, size) in self.warm_regions:
+                continue
             #l.debug("Unmapping %d bytes at %#x", size, addr)
             unicorn.Uc.mem_unmap(self, addr, size)
-        self.wrapped_mapped.clear()
+        self.wrapped_mapped = set(self.warm_regions)
 
     def hook_reset(self):
         #l.debug("Resetting hooks.")
@@ -228,6 +263,9 @@ def _load_native():
         _setup_prototype(h, 'is_interrupt_handled', ctypes.c_bool, state_t)
         _setup_prototype(h, 'set_transmit_sysno', None, state_t, ctypes.c_uint32, ctypes.c_uint64)
         _setup_prototype(h, 'process_transmit', ctypes.POINTER(TRANSMIT_RECORD), state_t, ctypes.c_uint32)
+        _setup_prototype(h, 'set_native_syscall', None, state_t, ctypes.c_uint64, ctypes.c_uint32, ctypes.c_uint64)
+        _setup_prototype(h, 'set_syscall_memory', None, state_t, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_bool, ctypes.c_bool)
+        _setup_prototype(h, 'process_syscall', ctypes.POINTER(SYSCALL_RECORD), state_t, ctypes.c_uint32)
         _setup_prototype(h, 'set_tracking', None, state_t, ctypes.c_bool, ctypes.c_bool)
         _setup_prototype(h, 'executed_pages', ctypes.c_uint64, state_t)
 
@@ -272,6 +310,7 @@ class Unicorn(SimStatePlugin):
         cooldown_nonunicorn_blocks=100,
         cooldown_stop_point=1,
         max_steps=1000000,
+        native_syscalls=None,
     ):
         """
         Initializes the Unicorn plugin for angr. This plugin handles communication with
@@ -308,10 +347,17 @@ class Unicorn(SimStatePlugin):
         self._mapped = 0
         self._uncache_pages = []
 
+        # regions mapped during the current run that may stay mapped after it: (addr, size) -> pages
+        self._warm_regions = { }
+        self._warm_synced = False
+
         # following variables are used in python level hook
         # we cannot see native hooks from python
         self.syscall_hooks = { } if syscall_hooks is None else syscall_hooks
 
+        # names of the syscalls that run natively when UNICORN_NATIVE_SYSCALLS is enabled
+        self.native_syscalls = set(NATIVE_SYSCALL.by_name) if native_syscalls is None else native_syscalls
+
         # native state in libsimunicorn
         self._uc_state = None
         self.stop_reason = None
@@ -352,6 +398,7 @@ class Unicorn(SimStatePlugin):
     def copy(self):
         u = Unicorn(
             syscall_hooks=dict(self.syscall_hooks),
+            native_syscalls=set(self.native_syscalls),
             cache_key=self.cache_key,
             #unicount=self._unicount,
             symbolic_var_counts = dict(self.symbolic_var_counts),
@@ -572,6 +619,9 @@ class Unicorn(SimStatePlugin):
             _UC_NATIVE.stop(self._uc_state, STOP.STOP_ERROR)
 
     def _hook_syscall_x86_64(self, uc, user_data):
+        if _UC_NATIVE.is_interrupt_handled(self._uc_state):
+            return
+
         sysno = uc.reg_read(self._uc_regs['rax'])
         pc = uc.reg_read(self._uc_regs['rip'])
         l.debug('hit sys_%d at %#x', sysno, pc)
@@ -808,6 +858,7 @@ class Unicorn(SimStatePlugin):
 
         data = bytearray(length)
         taint = [ ] # this is a list to get around python's scoping craziness
+        concretized = False
 
         def _taint(pos, chunk_size):
             if not taint:
@@ -832,6 +883,7 @@ class Unicorn(SimStatePlugin):
             # investigate the chunk, taint if symbolic
             chunk_size = last_missing - mo_addr + 1
             chunk = mo.bytes_at(mo_addr, chunk_size)
+            concretized |= chunk.symbolic
             d = self._process_value(chunk, 'mem')
             if d is None:
                 #print "TAINT: %x, %d" % (mo_addr, chunk_size)
@@ -860,13 +912,94 @@ class Unicorn(SimStatePlugin):
             uc.mem_write(start, str(data))
             self._mapped += 1
             _UC_NATIVE.activate(self._uc_state, start, length, taint[0] if taint else None)
+            if not taint and not concretized and options.UNICORN_WARM_SESSION in self.state.options and \
+                    not self._overlaps_scratch(start, length):
+                self._warm_regions[(start, length)] = self._freeze_pages(start, length)
             return True
 
     def uncache_page(self, addr):
         self._uncache_pages.append(addr & ~0xfff)
 
+    #
+    # Warm sessions
+    #
+
+    # regions that set_regs() maps and unmaps by itself
+    _scratch_regions = ((0x1000, 0x1000), (0x100B000000, 0x1000))
+
+    def _overlaps_scratch(self, start, length):
+        return any(start < a + size and a < start + length for a, size in self._scratch_regions)
+
+    def _warm_options(self):
+        """
+        The options that affect the contents and permissions of a mapped region.
+        """
+        return options.ENABLE_NX in self.state.options, options.CGC_ZERO_FILL_UNCONSTRAINED_MEMORY in self.state.options
+
+    def _region_page_nums(self, start, length):
+        page_size = self.state.memory.mem._page_size
+        return xrange(start / page_size, (start + length - 1) / page_size + 1)
+
+    def _region_pages(self, start, length):
+        pages = self.state.memory.mem._pages
+        return tuple(pages.get(n, None) for n in self._region_page_nums(start, length))
+
+    def _freeze_pages(self, start, length):
+        """
+        Get the pages of the state's memory that back a region, and make sure that they are not modified in place from
+        now on. The next write to any of them copies it, so the region is known to be unchanged for as long as its pages
+        are the same objects.
+        """
+        self.state.memory.mem._cowed.difference_update(self._region_page_nums(start, length))
+        return self._region_pages(start, length)
+
+    def _pages_unchanged(self, start, length, pages):
+        return all(a is b for a, b in zip(self._region_pages(start, length), pages))
+
+    def _warm_up(self):
+        """
+        Check the regions that the last run left mapped in unicorn. Those whose pages are still the same objects in
+        the memory of this state are reused, all others are unmapped.
+        """
+        uc = self.uc
+        self._warm_regions = { }
+        self._warm_synced = False
+
+        if options.UNICORN_WARM_SESSION not in self.state.options:
+            if uc.warm_regions:
+                uc.warm_regions.clear()
+                uc.reset()
+            return
+
+        opts = self._warm_options()
+        for (start, length), (region_opts, pages) in uc.warm_regions.items():
+            if region_opts == opts and self._pages_unchanged(start, length, pages):
+                self._warm_regions[(start, length)] = pages
+            else:
+                l.debug('unmapping changed region [%#x, %#x]', start, start + length - 1)
+                uc.mem_unmap(start, length)
+
+        l.info('reusing %d mapped regions', len(self._warm_regions))
+
+    def _check_warm_regions(self):
+        """
+        Forget the regions whose pages were changed outside of unicorn while it was running.
+        """
+        for (start, length), pages in self._warm_regions.items():
+            if not self._pages_unchanged(start, length, pages):
+                del self._warm_regions[(start, length)]
+
+    def _freeze_warm_regions(self):
+        """
+        Record the pages of all regions after the memory of the state caught up with the memory of unicorn.
+        """
+        for start, length in self._warm_regions:
+            self._warm_regions[(start, length)] = self._freeze_pages(start, length)
+        self._warm_synced = True
+
     def setup(self):
         self._setup_unicorn()
+        self._warm_up()
         self.set_regs()
         # tricky: using unicorn handle form unicorn.Uc object
         self._uc_state = _UC_NATIVE.alloc(self.uc._uch, self.cache_key)
@@ -875,10 +1008,83 @@ class Unicorn(SimStatePlugin):
                 l.error("You haven't set the address for concrete transmits!!!!!!!!!!!")
                 self.transmit_addr = 0
             _UC_NATIVE.set_transmit_sysno(self._uc_state, 2, self.transmit_addr)
+        if options.UNICORN_NATIVE_SYSCALLS in self.state.options:
+            self._setup_native_syscalls()
 
         # just fyi there's a GDT in memory
         _UC_NATIVE.activate(self._uc_state, 0x1000, 0x1000, None)
 
+        # writes to the regions kept from the last run need to be tracked again
+        for start, length in self._warm_regions:
+            _UC_NATIVE.activate(self._uc_state, start, length, None)
+
+    # how far past the program break and the mmap base the native syscalls may map memory
+    NATIVE_SYSCALL_WINDOW = 0x10000000
+
+    def _setup_native_syscalls(self):
+        """
+        Tell the native side which syscalls it may run by itself, and where it may map memory for them.
+        """
+        if self.state.arch.name not in ('X86', 'AMD64') or self.state.project is None:
+            return
+        simos = self.state.project.simos
+        library = getattr(simos, 'syscall_library', None)
+        if library is None or simos.kernel_base is None:
+            return
+
+        names = set(self.native_syscalls)
+        posix = self.state.posix
+        if 1 not in posix.files or 2 not in posix.files:
+            names.discard('write')
+
+        brk = posix.brk
+        if not isinstance(brk, (int, long)):
+            if brk.symbolic:
+                names.discard('brk')
+                brk = 0
+            else:
+                brk = self.state.se.eval(brk)
+
+        mem = self.state.memory.mem
+        mask = (1 << self.state.arch.bits) - 1
+        brk_start = (brk + 0xfff) & ~0xfff
+        brk_limit = mem.unmapped_until(brk_start, min(brk_start + self.NATIVE_SYSCALL_WINDOW, mask))
+        mmap_base = self.state.libc.mmap_base
+        mmap_limit = mem.unmapped_until(mmap_base, min(mmap_base + self.NATIVE_SYSCALL_WINDOW, mask))
+
+        for number, name in library.syscall_number_mapping.get(self.state.arch.name, { }).iteritems():
+            if name in names and name in NATIVE_SYSCALL.by_name:
+                _UC_NATIVE.set_native_syscall(self._uc_state, number, NATIVE_SYSCALL.by_name[name],
+                                              simos.kernel_base + number)
+        _UC_NATIVE.set_syscall_memory(self._uc_state, brk, brk_limit, mmap_base, mmap_limit,
+                                      options.CGC_ZERO_FILL_UNCONSTRAINED_MEMORY in self.state.options,
+                                      options.ENABLE_NX in self.state.options)
+
+    def _replay_native_syscalls(self):
+        """
+        Apply the effects of the syscalls that ran natively to the state, in the order they ran.
+        """
+        i = 0
+        while True:
+            record = _UC_NATIVE.process_syscall(self._uc_state, i)
+            if not bool(record):
+                break
+            r = record.contents
+
+            if r.kind == NATIVE_SYSCALL.WRITE:
+                if r.count:
+                    self.state.posix.write(r.fd, ctypes.string_at(r.data, r.count), r.count)
+            elif r.kind == NATIVE_SYSCALL.BRK:
+                self.state.posix.set_brk(self.state.se.BVV(r.result, self.state.arch.bits))
+            else:
+                self.state.memory.map_region(r.map_address, r.map_length, r.perms, init_zero=True)
+                self.state.libc.mmap_base = r.map_address + r.map_length
+
+            if r.map_length:
+                # the native side mapped it, so make sure it is unmapped with everything else
+                self.uc.wrapped_mapped.add((r.map_address, r.map_length))
+            i += 1
+
     def start(self, step=None):
         self.jumpkind = 'Ijk_Boring'
         self.countdown_nonunicorn_blocks = self.cooldown_nonunicorn_blocks
@@ -941,6 +1147,9 @@ class Unicorn(SimStatePlugin):
         self.steps = _UC_NATIVE.step(self._uc_state)
         self.stop_reason = _UC_NATIVE.stop_reason(self._uc_state)
 
+        # the memory mapped by native syscalls has to exist before anything else is synced
+        self._replay_native_syscalls()
+
         # figure out why we stopped
         if self.stop_reason == STOP.STOP_SYMBOLIC_REG:
             stopping_register = _UC_NATIVE.stopping_register(self._uc_state)
@@ -958,8 +1167,11 @@ class Unicorn(SimStatePlugin):
         # should this be in destroy?
         _UC_NATIVE.disable_symbolic_reg_tracking(self._uc_state)
 
+        self._check_warm_regions()
+
         # syncronize memory contents - head is a linked list of memory updates
         head = _UC_NATIVE.sync(self._uc_state)
+        dirty = [ ]
         p_update = head
         while bool(p_update):
             update = p_update.contents
@@ -967,14 +1179,22 @@ class Unicorn(SimStatePlugin):
             if 0x1000 <= address < 0x2000:
                 l.warning("Emulation touched fake GDT at 0x1000, discarding changes")
             else:
-                s = str(self.uc.mem_read(address, length))
-                l.debug('...changed memory: [%#x, %#x] = %s', address, address + length, s.encode('hex'))
-                self.state.memory.store(address, s)
+                dirty.append((address, length))
 
             p_update = update.next
 
         _UC_NATIVE.destroy(head)    # free the linked list
 
+        if self.state.has_plugin('inspector') and self.state.inspect._breakpoints['mem_write']:
+            # go through the full store path so that the breakpoints fire
+            for address, length in dirty:
+                s = str(self.uc.mem_read(address, length))
+                l.debug('...changed memory: [%#x, %#x] = %s', address, address + length, s.encode('hex'))
+                self.state.memory.store(address, s)
+        else:
+            self._sync_memory(dirty)
+        self._freeze_warm_regions()
+
         # adjust the countdowns
         #if self.steps >= 128:
         #   self.cooldown_symbolic_registers = 16
@@ -1045,6 +1265,26 @@ class Unicorn(SimStatePlugin):
                 break
             self.state.scratch.executed_pages_set.add(page)
 
+    def _sync_memory(self, dirty):
+        """
+        Copy the memory that unicorn changed into the state in bulk. Adjacent dirty ranges, which the native side
+        reports per page, are merged into spans. Each span is read from unicorn at once and stored as a single memory
+        object.
+
+        :param dirty:   A list of (address, length) tuples of changed memory.
+        """
+        spans = [ ]
+        for address, length in sorted(dirty):
+            if spans and spans[-1][0] + spans[-1][1] >= address:
+                start, span_length = spans[-1]
+                spans[-1] = (start, max(span_length, address + length - start))
+            else:
+                spans.append((address, length))
+
+        for start, length in spans:
+            l.debug('...changed memory: [%#x, %#x]', start, start + length - 1)
+            self.state.memory.mem.store_bytes(start, memoryview(self.uc.mem_read(start, length)))
+
     def destroy(self):
         #l.debug("Unhooking.")
         _UC_NATIVE.unhook(self._uc_state)
@@ -1054,6 +1294,14 @@ class Unicorn(SimStatePlugin):
         _UC_NATIVE.dealloc(self._uc_state)
         self._uc_state = None
 
+        # keep the regions mapped if the state is in sync with unicorn
+        if self._warm_synced:
+            opts = self._warm_options()
+            self.uc.warm_regions = dict((r, (opts, pages)) for r, pages in self._warm_regions.iteritems())
+        else:
+            self.uc.warm_regions.clear()
+        self._warm_regions = { }
+
         # there's something we're not properly resetting for syscalls, so
         # we'll clear the state when they happen
         if self.stop_reason not in (STOP.STOP_NORMAL, STOP.STOP_STOPPOINT, STOP.STOP_SYMBOLIC_MEM, STOP.STOP_SYMBOLIC_REG):
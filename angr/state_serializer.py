@@ -0,0 +1,244 @@
+import zlib
+import hashlib
+import cPickle as pickle
+from cStringIO import StringIO
+
+import claripy
+
+import logging
+l = logging.getLogger("angr.state_serializer")
+
+
+class StateSerializer(object):
+    """
+    Serializes states with structural sharing.
+
+    Objects that are commonly shared between states are not pickled along with the states referring to them. Instead,
+    each of them is pickled separately into a content-addressed object table, and the states refer to them by digest.
+    Such objects are:
+
+    - memory pages, which are shared by copy-on-write between the branches of a state,
+    - claripy ASTs of at least `dedup_depth`, such as the constraints of the solver,
+    - history nodes, which are shared by all descendants of a state. Each node is stored along with the digest of its
+      parent, so a history chain is stored once no matter how many states share it.
+
+    No matter how many states are serialized together, each distinct object is hence stored once. When they are loaded
+    together, states share these objects again. The project of the states is never pickled.
+
+    The low-level interface, dump() and load(), leaves storing the object table to the caller. This is what SpillStore
+    uses. dumps() and loads() build a self-contained, compressed blob out of a list of states.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, project=None, dedup_depth=4):
+        """
+        :param project:     The project of the states. References to it are neither pickled nor unpickled.
+        :param dedup_depth: The minimum depth of ASTs stored in the object table.
+        """
+        self.project = project
+        self.dedup_depth = dedup_depth
+
+    def _should_dedup(self, o):
+        if isinstance(o, BasePage):
+            return True
+        return isinstance(o, claripy.ast.Base) and getattr(o, 'depth', 0) >= self.dedup_depth
+
+    #
+    # Serialization
+    #
+
+    def dump(self, obj, objects, memo=None):
+        """
+        Pickle an object, storing the shared objects it refers to in an object table.
+
+        :param obj:     The object to pickle, usually a state.
+        :param objects: The object table. A dict of digest -> (pickle, digests of the objects the pickle refers to)
+                        that new shared objects are added to.
+        :param memo:    A dict of id(object) -> (object, digest) of the shared objects pickled so far. Reuse it when
+                        dumping many objects, so that each shared object is only pickled once.
+        :return:        A tuple of the pickle of `obj` and the set of digests of the shared objects it refers to.
+        """
+        if memo is None:
+            memo = { }
+        return self._dump(obj, objects, memo, dedup=True, exclude=obj)
+
+    def _dump(self, obj, objects, memo, dedup, exclude):
+        f = StringIO()
+        p = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        project = self.project
+        refs = set()
+
+        def persistent_id(o):
+            if o is project and project is not None:
+                return 'p'
+            if o is exclude:
+                return None
+            if isinstance(o, SimStateHistory):
+                digest = self._dump_history(o, objects, memo)
+                refs.add(digest)
+                return 'o' + digest
+            if not dedup or not self._should_dedup(o):
+                return None
+
+            entry = memo.get(id(o), None)
+            if entry is None:
+                # nothing nested in pages and ASTs is stored separately
+                blob, obj_refs = self._dump(o, objects, memo, dedup=False, exclude=o)
+                entry = (o, hashlib.sha1(blob).hexdigest())
+                memo[id(o)] = entry
+                objects[entry[1]] = (blob, obj_refs)
+            refs.add(entry[1])
+            return 'o' + entry[1]
+
+        p.persistent_id = persistent_id
+        p.dump(obj)
+        return f.getvalue(), refs
+
+    def _dump_history(self, history, objects, memo):
+        """
+        Store a history node and all its ancestors in the object table.
+
+        :return:    The digest of the node.
+        """
+        # walk the chain up to the first node that is already stored. this is done iteratively, since history chains
+        # can be longer than the recursion limit.
+        chain = [ ]
+        node = history
+        while node is not None and id(node) not in memo:
+            chain.append(node)
+            node = node.parent
+        parent_digest = memo[id(node)][1] if node is not None else None
+
+        for node in reversed(chain):
+            parent = node.parent
+            # detach the node from its ancestry, which SimStateHistory would otherwise pickle along with it
+            node.parent = None
+            try:
+                blob, refs = self._dump((parent_digest, node), objects, memo, dedup=True, exclude=node)
+            finally:
+                node.parent = parent
+            if parent_digest is not None:
+                refs.add(parent_digest)
+
+            digest = hashlib.sha1(blob).hexdigest()
+            memo[id(node)] = (node, digest)
+            objects[digest] = (blob, refs)
+            parent_digest = digest
+
+        return memo[id(history)][1]
+
+    #
+    # Deserialization
+    #
+
+    def load(self, blob, get_object, cache=None):
+        """
+        Unpickle an object pickled by dump().
+
+        :param blob:        The pickle.
+        :param get_object:  A function returning the pickle of a shared object from its digest.
+        :param cache:       A dict of digest -> unpickled object. Reuse it when loading many objects, so that they
+                            share the objects they have in common.
+        :return:            The unpickled object.
+        """
+        if cache is None:
+            cache = { }
+        obj = self._load(blob, get_object, cache)
+
+        if isinstance(obj, SimState):
+            # a history node is shared by the states that descend from it, but each state owns its own node. the ids
+            # of the nodes owned by loaded states are kept in the cache, under a key that is never a digest
+            owners = cache.setdefault(None, set())
+            if id(obj.history) in owners:
+                obj.register_plugin('history', obj.history.copy())
+            owners.add(id(obj.history))
+        return obj
+
+    def _load(self, blob, get_object, cache):
+        p = pickle.Unpickler(StringIO(blob))
+
+        def persistent_load(pid):
+            if pid == 'p':
+                return self.project
+            if pid[0] != 'o':
+                raise pickle.UnpicklingError("Unknown persistent id %r" % pid)
+            digest = pid[1:]
+            try:
+                return cache[digest]
+            except KeyError:
+                pass
+
+            o = self._load(get_object(digest), get_object, cache)
+            if type(o) is tuple and len(o) == 2 and isinstance(o[1], SimStateHistory):
+                o = self._link_history(digest, o, get_object, cache)
+            cache[digest] = o
+            return o
+
+        p.persistent_load = persistent_load
+        return p.load()
+
+    def _link_history(self, digest, loaded, get_object, cache):
+        """
+        Load the ancestry of a history node, and link the nodes together.
+
+        :param loaded:  The unpickled (parent digest, node) tuple of the node.
+        :return:        The node.
+        """
+        parent_digest, node = loaded
+        chain = [ (digest, node) ]
+        while parent_digest is not None and parent_digest not in cache:
+            d = parent_digest
+            parent_digest, node = self._load(get_object(d), get_object, cache)
+            chain.append((d, node))
+
+        parent = cache[parent_digest] if parent_digest is not None else None
+        for d, node in reversed(chain):
+            node.parent = parent
+            cache[d] = node
+            parent = node
+        return chain[0][1]
+
+    #
+    # Self-contained format
+    #
+
+    def dumps(self, states, compression_level=6):
+        """
+        Serialize a list of states, along with the objects they share, into a single compressed blob.
+
+        :param states:              The states to serialize.
+        :param compression_level:   The zlib compression level.
+        :return:                    The blob.
+        :rtype:                     str
+        """
+        objects = { }
+        memo = { }
+        blobs = [ self.dump(state, objects, memo)[0] for state in states ]
+        data = {
+            'version': self.FORMAT_VERSION,
+            'objects': { digest: blob for digest, (blob, _) in objects.iteritems() },
+            'states': blobs,
+        }
+        l.debug("Serialized %d states with %d shared objects.", len(blobs), len(objects))
+        return zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL), compression_level)
+
+    def loads(self, blob):
+        """
+        Deserialize states serialized by dumps().
+
+        :param str blob:    The blob.
+        :return:            A list of states.
+        """
+        data = pickle.loads(zlib.decompress(blob))
+        if data.get('version', None) != self.FORMAT_VERSION:
+            raise AngrError("Unsupported state serialization format version %r." % data.get('version', None))
+
+        objects = data['objects']
+        cache = { }
+        return [ self.load(state_blob, objects.__getitem__, cache) for state_blob in data['states'] ]
+
+from .errors import AngrError
+from .sim_state import SimState
+from .state_plugins.history import SimStateHistory
+from .storage.paged_memory import BasePage
@@ -7,6 +7,7 @@ l = logging.getLogger("angr.storage.memory")
 import claripy
 from ..state_plugins.plugin import SimStatePlugin
 from ..engines.vex.ccall import _get_flags
+from ..misc.profiling import profiled
 
 stn_map = { 'st%d' % n: n for n in xrange(8) }
 tag_map = { 'tag%d' % n: n for n in xrange(8) }
@@ -448,6 +449,7 @@ class SimMemory(SimStatePlugin):
                     return new_region_id
             raise SimMemoryError('Cannot allocate region ID for function %#08x - recursion too deep' % function_address)
 
+    @profiled(lambda self, *args, **kwargs: 'store:%s' % self.id)
     def store(self, addr, data, size=None, condition=None, add_constraints=None, endness=None, action=None,
               inspect=True, priv=None, disable_actions=False):
         """
@@ -669,6 +671,7 @@ class SimMemory(SimStatePlugin):
             req = MemoryStoreRequest(addr, data=ite, endness=endness)
             return self._store(req)
 
+    @profiled(lambda self, *args, **kwargs: 'load:%s' % self.id)
     def load(self, addr, size=None, condition=None, fallback=None, add_constraints=None, action=None, endness=None,
              inspect=True, disable_actions=False, ret_on_segv=False):
         """
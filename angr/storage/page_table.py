@@ -0,0 +1,178 @@
+class _PageTableNode(object):
+    """
+    An interior node of a PageTable, holding the entries of a contiguous run of page numbers.
+    """
+
+    __slots__ = ('owner', 'entries', )
+
+    def __init__(self, owner, entries):
+        self.owner = owner
+        self.entries = entries
+
+
+class PageTable(object):
+    """
+    A persistent mapping from page numbers to values, implemented as a two-level radix table.
+
+    The top level maps the high bits of a page number to an interior node, which maps the low bits to values. Nodes are
+    shared between a table and all of its branches, and are owned by the table that created them. A table only ever
+    modifies the nodes it owns, and copies any node it does not own right before writing to it. Branching is hence O(1),
+    and a write copies at most the top level and one interior node.
+    """
+
+    NODE_BITS = 8
+
+    def __init__(self, items=None):
+        self._token = object()
+        self._root = { }
+        self._root_owner = self._token
+        self._len = 0
+
+        if items is not None:
+            for k, v in (items.iteritems() if isinstance(items, dict) else items):
+                self[k] = v
+
+    def branch(self):
+        """
+        Create a copy of this table. The copy shares all nodes with this table until either of them is written to.
+
+        :return: The new table.
+        :rtype: PageTable
+        """
+        t = PageTable.__new__(PageTable)
+        t._root = self._root
+        t._root_owner = self._root_owner
+        t._len = self._len
+        t._token = object()
+
+        # both tables lose ownership of the shared nodes
+        self._token = object()
+        return t
+
+    copy = branch
+
+    def _split(self, key):
+        return key >> self.NODE_BITS, key & ((1 << self.NODE_BITS) - 1)
+
+    def _writable_node(self, hi, create):
+        if self._root_owner is not self._token:
+            self._root = dict(self._root)
+            self._root_owner = self._token
+
+        node = self._root.get(hi, None)
+        if node is None:
+            if not create:
+                return None
+            node = _PageTableNode(self._token, { })
+            self._root[hi] = node
+        elif node.owner is not self._token:
+            node = _PageTableNode(self._token, dict(node.entries))
+            self._root[hi] = node
+        return node
+
+    #
+    # Mapping interface
+    #
+
+    def __getitem__(self, key):
+        hi, lo = self._split(key)
+        return self._root[hi].entries[lo]
+
+    def get(self, key, default=None):
+        hi, lo = self._split(key)
+        node = self._root.get(hi, None)
+        if node is None:
+            return default
+        return node.entries.get(lo, default)
+
+    def __contains__(self, key):
+        hi, lo = self._split(key)
+        node = self._root.get(hi, None)
+        return node is not None and lo in node.entries
+
+    def __setitem__(self, key, value):
+        hi, lo = self._split(key)
+        node = self._writable_node(hi, True)
+        if lo not in node.entries:
+            self._len += 1
+        node.entries[lo] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        hi, lo = self._split(key)
+        node = self._writable_node(hi, False)
+        del node.entries[lo]
+        self._len -= 1
+        if not node.entries:
+            del self._root[hi]
+
+    def next_key(self, start, stop):
+        """
+        Find the smallest key in the range [start, stop).
+
+        :param int start:   The first key of the range.
+        :param int stop:    The end of the range.
+        :return:            The key, or None if there is no key in the range.
+        """
+        if start >= stop:
+            return None
+
+        start_hi, start_lo = self._split(start)
+        stop_hi = (stop - 1) >> self.NODE_BITS
+        for hi in sorted(h for h in self._root if start_hi <= h <= stop_hi):
+            lo = start_lo if hi == start_hi else 0
+            keys = [ k for k in self._root[hi].entries if k >= lo ]
+            if keys:
+                key = (hi << self.NODE_BITS) | min(keys)
+                return key if key < stop else None
+        return None
+
+    def add(self, key):
+        """
+        Set-like interface: mark `key` as present.
+        """
+        self[key] = True
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def iteritems(self):
+        for hi, node in self._root.iteritems():
+            base = hi << self.NODE_BITS
+            for lo, v in node.entries.iteritems():
+                yield base | lo, v
+
+    def iterkeys(self):
+        for k, _ in self.iteritems():
+            yield k
+
+    def itervalues(self):
+        for node in self._root.itervalues():
+            for v in node.entries.itervalues():
+                yield v
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def values(self):
+        return list(self.itervalues())
+
+    #
+    # Pickling
+    #
+
+    def __getstate__(self):
+        return { 'items': self.items() }
+
+    def __setstate__(self, s):
+        self.__init__(s['items'])
+
+    def __repr__(self):
+        return "<PageTable with %d entries>" % self._len
@@ -7,6 +7,7 @@ import cle
 from ..errors import SimMemoryError, SimSegfaultError
 from .. import sim_options as options
 from .memory_object import SimMemoryObject
+from .page_table import PageTable
 from claripy.ast.bv import BV
 
 _ffi = cffi.FFI()
@@ -81,7 +82,7 @@ class BasePage(object):
             self.store_underwrite(state, new_mo, start, end)
 
     def copy(self):
-        return Page(
+        return type(self)(
             self._page_addr, self._page_size,
             permissions=self.permissions,
             **self._copy_args()
@@ -321,6 +322,182 @@ class ListPage(BasePage):
     def _copy_args(self):
         return { 'storage': list(self._storage), 'sinkhole': self._sinkhole }
 
+class ConcretePage(BasePage):
+    """
+    Page object that keeps concrete bytes in a bytearray, and all other data in a sparse overlay of memory objects.
+
+    Concrete data is unpacked into the bytearray when it is stored, and memory objects are only built for it when it is
+    loaded, so a concrete page costs a few kilobytes instead of thousands of Python objects.
+    """
+
+    # the kinds of bytes
+    MISSING = 0
+    CONCRETE = 1
+    OVERLAY = 2
+
+    def __init__(self, *args, **kwargs):
+        data = kwargs.pop("data", None)
+        flags = kwargs.pop("flags", None)
+        overlay = kwargs.pop("overlay", None)
+
+        super(ConcretePage, self).__init__(*args, **kwargs)
+        self._data = bytearray(self._page_size) if data is None else data
+        # the kind of each byte
+        self._flags = bytearray(self._page_size) if flags is None else flags
+        # page index -> memory object, for the bytes that are not concrete
+        self._overlay = { } if overlay is None else overlay
+
+    @staticmethod
+    def _unpack(mo, start, end):
+        """
+        Get the bytes of a memory object in the range [start, end), or None if they are not plain concrete bytes.
+        """
+        o = mo.object
+        if o.op != 'BVV' or o.annotations or mo._byte_width != 8:
+            return None
+
+        low = o.size() - (end - mo.base) * 8
+        value = (o.args[0] >> low) & ((1 << (end - start) * 8) - 1)
+        return ('%0*x' % ((end - start) * 2, value)).decode('hex')
+
+    def _run_end(self, i, stop):
+        """
+        Find the end of the run of bytes of the same kind that starts at index i.
+        """
+        run = self._flags[i:stop]
+        return stop - len(run.lstrip(run[:1]))
+
+    def _clear_overlay(self, i, j):
+        if len(self._overlay) < j - i:
+            for k in [ k for k in self._overlay if i <= k < j ]:
+                del self._overlay[k]
+        else:
+            for k in xrange(i, j):
+                self._overlay.pop(k, None)
+
+    def _concrete_mo(self, i, j):
+        data = str(self._data[i:j])
+        return SimMemoryObject(claripy.BVV(data, len(data) * 8), self._page_addr + i)
+
+    def contains(self, state, idx):
+        return self._flags[idx - self._page_addr] != ConcretePage.MISSING
+
+    def keys(self):
+        return [ self._page_addr + i for i, f in enumerate(self._flags) if f != ConcretePage.MISSING ]
+
+    def replace_mo(self, state, old_mo, new_mo):
+        for k, mo in self._overlay.items():
+            if mo is old_mo:
+                self._overlay[k] = new_mo
+
+    def store_overwrite(self, state, new_mo, start, end):
+        i, j = start - self._page_addr, end - self._page_addr
+        raw = self._unpack(new_mo, start, end)
+        if raw is not None:
+            self.store_bytes(start, raw)
+        else:
+            for k in xrange(i, j):
+                self._overlay[k] = new_mo
+            self._flags[i:j] = chr(ConcretePage.OVERLAY) * (j - i)
+
+    def store_underwrite(self, state, new_mo, start, end):
+        i, j = start - self._page_addr, end - self._page_addr
+        raw = self._unpack(new_mo, start, end)
+        for k in xrange(i, j):
+            if self._flags[k] != ConcretePage.MISSING:
+                continue
+            if raw is not None:
+                self._data[k] = ord(raw[k - i])
+                self._flags[k] = ConcretePage.CONCRETE
+            else:
+                self._overlay[k] = new_mo
+                self._flags[k] = ConcretePage.OVERLAY
+
+    def store_bytes(self, addr, data):
+        """
+        Stores concrete bytes that lie within the page.
+
+        :param int addr:    The address of the first byte.
+        :param str data:    The bytes.
+        """
+        i = addr - self._page_addr
+        j = i + len(data)
+        self._data[i:j] = data
+        self._flags[i:j] = chr(ConcretePage.CONCRETE) * (j - i)
+        if self._overlay:
+            self._clear_overlay(i, j)
+
+    def load_bytes(self, start, end):
+        """
+        Loads the bytes in the range [start, end) if all of them are concrete.
+
+        :returns: A str, or None if any of the bytes is missing or not concrete.
+        """
+        i, j = start - self._page_addr, end - self._page_addr
+        if self._flags[i:j].strip(chr(ConcretePage.CONCRETE)):
+            return None
+        return str(self._data[i:j])
+
+    def load_mo(self, state, page_idx):
+        """
+        Loads a memory object from memory. Concrete bytes are returned as a new memory object of one byte.
+
+        :param page_idx: the index into the page
+        :returns: a tuple of the object
+        """
+        i = page_idx - self._page_addr
+        flag = self._flags[i]
+        if flag == ConcretePage.CONCRETE:
+            return self._concrete_mo(i, i + 1)
+        elif flag == ConcretePage.OVERLAY:
+            return self._overlay[i]
+        return None
+
+    def load_slice(self, state, start, end):
+        """
+        Return the memory objects overlapping with the provided slice. Each run of concrete bytes is returned as a new
+        memory object.
+
+        :param start: the start address
+        :param end: the end address (non-inclusive)
+        :returns: tuples of (starting_addr, memory_object)
+        """
+        items = [ ]
+        i = max(start, self._page_addr) - self._page_addr
+        stop = min(end, self._page_addr + self._page_size) - self._page_addr
+        while i < stop:
+            flag = self._flags[i]
+            j = self._run_end(i, stop)
+            if flag == ConcretePage.CONCRETE:
+                items.append((self._page_addr + i, self._concrete_mo(i, j)))
+            elif flag == ConcretePage.OVERLAY:
+                for k in xrange(i, j):
+                    mo = self._overlay[k]
+                    if not items or items[-1][1] is not mo:
+                        items.append((self._page_addr + k, mo))
+            i = j
+        return items
+
+    def changed_bytes(self, other):
+        """
+        Gets the addresses of the bytes that differ between this page and another ConcretePage.
+        """
+        if self._data == other._data and self._flags == other._flags and \
+                all(mo is other._overlay.get(k, None) for k, mo in self._overlay.iteritems()):
+            return set()
+
+        changes = set()
+        for i in xrange(self._page_size):
+            flag = self._flags[i]
+            if flag != other._flags[i] or \
+                    flag == ConcretePage.CONCRETE and self._data[i] != other._data[i] or \
+                    flag == ConcretePage.OVERLAY and self._overlay[i] is not other._overlay[i]:
+                changes.add(self._page_addr + i)
+        return changes
+
+    def _copy_args(self):
+        return { 'data': bytearray(self._data), 'flags': bytearray(self._flags), 'overlay': dict(self._overlay) }
+
 Page = ListPage
 
 #pylint:disable=unidiomatic-typecheck
@@ -335,10 +512,11 @@ class SimPagedMemory(object):
         self._permissions_backer = permissions_backer # saved for copying
         self._executable_pages = False if permissions_backer is None else permissions_backer[0]
         self._permission_map = { } if permissions_backer is None else permissions_backer[1]
-        self._pages = { } if pages is None else pages
-        self._initialized = set() if initialized is None else initialized
+        # the page tables are persistent, and shared with all branches of this memory until they are written to
+        self._pages = PageTable() if pages is None else pages
+        self._initialized = PageTable() if initialized is None else initialized
         self._page_size = 0x1000 if page_size is None else page_size
-        self._symbolic_addrs = dict() if symbolic_addrs is None else symbolic_addrs
+        self._symbolic_addrs = PageTable() if symbolic_addrs is None else symbolic_addrs
         self.state = None
         self._preapproved_stack = xrange(0)
         self._check_perms = check_permissions
@@ -369,20 +547,27 @@ class SimPagedMemory(object):
         self._cowed = set()
         self.__dict__.update(s)
 
+        # states pickled before the page tables became persistent
+        if isinstance(self._pages, dict):
+            self._pages = PageTable(self._pages)
+        if isinstance(self._symbolic_addrs, dict):
+            self._symbolic_addrs = PageTable(self._symbolic_addrs)
+        if isinstance(self._initialized, set):
+            self._initialized = PageTable((n, True) for n in self._initialized)
+
     def branch(self):
         new_name_mapping = self._name_mapping.branch() if options.REVERSE_MEMORY_NAME_MAP in self.state.options else self._name_mapping
         new_hash_mapping = self._hash_mapping.branch() if options.REVERSE_MEMORY_HASH_MAP in self.state.options else self._hash_mapping
 
-        new_pages = dict(self._pages)
         self._cowed = set()
         m = SimPagedMemory(memory_backer=self._memory_backer,
                            permissions_backer=self._permissions_backer,
-                           pages=new_pages,
-                           initialized=set(self._initialized),
+                           pages=self._pages.branch(),
+                           initialized=self._initialized.branch(),
                            page_size=self._page_size,
                            name_mapping=new_name_mapping,
                            hash_mapping=new_hash_mapping,
-                           symbolic_addrs=dict(self._symbolic_addrs),
+                           symbolic_addrs=self._symbolic_addrs.branch(),
                            check_permissions=self._check_perms)
         m._preapproved_stack = self._preapproved_stack
         return m
@@ -435,8 +620,12 @@ class SimPagedMemory(object):
         :rtype: tuple
         """
 
-        result = [ ]
         end = addr + num_bytes
+        data = self._load_concrete_bytes(addr, end)
+        if data is not None:
+            return [ (addr, SimMemoryObject(claripy.BVV(data, num_bytes * 8), addr)) ]
+
+        result = [ ]
         for page_addr in self._containing_pages(addr, end):
             try:
                 #print "Getting page %x" % (page_addr / self._page_size)
@@ -462,12 +651,45 @@ class SimPagedMemory(object):
 
         return result
 
+    def _load_concrete_bytes(self, addr, end):
+        """
+        Load the bytes in the range [addr, end) at once if all of them are concrete bytes of ConcretePages.
+
+        :return: A str, or None if the range has to be loaded as memory objects.
+        """
+        if addr >= end or not self._use_concrete_pages:
+            return None
+
+        chunks = [ ]
+        for page_addr in self._containing_pages(addr, end):
+            try:
+                page = self._get_page(page_addr / self._page_size)
+            except KeyError:
+                return None
+            if type(page) is not ConcretePage:
+                return None
+            if self.allow_segv and not page.concrete_permissions & Page.PROT_READ:
+                return None
+
+            chunk = page.load_bytes(max(addr, page_addr), min(end, page_addr + self._page_size))
+            if chunk is None:
+                return None
+            chunks.append(chunk)
+
+        return ''.join(chunks)
+
     #
     # Page management
     #
 
+    @property
+    def _use_concrete_pages(self):
+        return self.state is not None and self.byte_width == 8 and \
+               options.CONCRETE_MEMORY_PAGES in self.state.options
+
     def _create_page(self, page_num, permissions=None):
-        return Page(
+        page_type = ConcretePage if self._use_concrete_pages else Page
+        return page_type(
             page_num*self._page_size, self._page_size,
             executable=self._executable_pages, permissions=permissions
         )
@@ -510,8 +732,11 @@ class SimPagedMemory(object):
 
                 if self.byte_width == 8:
                     snip = _ffi.buffer(backer)[snip_start:snip_start+write_size]
-                    mo = SimMemoryObject(claripy.BVV(snip), write_start, byte_width=self.byte_width)
-                    self._apply_object_to_page(n*self._page_size, mo, page=new_page)
+                    if type(new_page) is ConcretePage:
+                        new_page.store_bytes(write_start, snip)
+                    else:
+                        mo = SimMemoryObject(claripy.BVV(snip), write_start, byte_width=self.byte_width)
+                        self._apply_object_to_page(n*self._page_size, mo, page=new_page)
                 else:
                     for i, byte in enumerate(backer):
                         mo = SimMemoryObject(claripy.BVV(byte, self.byte_width), write_start + i, byte_width=self.byte_width)
@@ -598,6 +823,30 @@ class SimPagedMemory(object):
                 return addr - (i * self._page_size) in p.keys()
         return False
 
+    def unmapped_until(self, addr, limit):
+        """
+        Find how far the memory is free from `addr` on, i.e., neither has pages nor is backed by the memory backer.
+
+        :param int addr:    A page-aligned address to start from.
+        :param int limit:   The address to stop looking at.
+        :return:            The first address in [addr, limit) that is in a page or backed, or `limit` if there is none.
+        :rtype:             int
+        """
+        end = limit
+        page_num = self._pages.next_key(addr / self._page_size, (limit + self._page_size - 1) / self._page_size)
+        if page_num is not None:
+            end = max(addr, min(end, page_num * self._page_size))
+
+        if isinstance(self._memory_backer, cle.Clemory) and self.byte_width == 8:
+            for start, backer in self._memory_backer.cbackers:
+                if start + len(backer) > addr:
+                    end = min(end, max(start, addr))
+        elif self._memory_backer:
+            # other backers are not worth searching
+            end = addr
+
+        return end
+
     def keys(self):
         sofar = set()
         sofar.update(self._memory_backer.keys())
@@ -642,6 +891,10 @@ class SimPagedMemory(object):
             if our_page is their_page:
                 continue
 
+            if type(our_page) is ConcretePage and type(their_page) is ConcretePage:
+                candidates.update(our_page.changed_bytes(their_page))
+                continue
+
             our_keys = set(our_page.keys())
             their_keys = set(their_page.keys())
             changes = (our_keys - their_keys) | (their_keys - our_keys) | {
@@ -695,22 +948,22 @@ class SimPagedMemory(object):
         :param page:        (optional) the page to use.
         :param overwrite:   (optional) If False, only write to currently-empty memory.
         """
-        page_num = page_base / self._page_size
-        try:
-            page = self._get_page(page_num,
-                                  write=True,
-                                  create=not self.allow_segv) if page is None else page
-        except KeyError:
-            if self.allow_segv:
-                raise SimSegfaultError(mo.base, 'write-miss')
-            else:
-                raise
+        page = self._get_writable_page(page_base / self._page_size, mo.base) if page is None else page
         if self.allow_segv and not page.concrete_permissions & Page.PROT_WRITE:
             raise SimSegfaultError(mo.base, 'non-writable')
 
         page.store_mo(self.state, mo, overwrite=overwrite)
         return True
 
+    def _get_writable_page(self, page_num, addr):
+        try:
+            return self._get_page(page_num, write=True, create=not self.allow_segv)
+        except KeyError:
+            if self.allow_segv:
+                raise SimSegfaultError(addr, 'write-miss')
+            else:
+                raise
+
     def _containing_pages(self, mo_start, mo_end):
         page_start = mo_start - mo_start%self._page_size
         page_end = mo_end + (self._page_size - mo_end%self._page_size) if mo_end % self._page_size else mo_end
@@ -734,6 +987,41 @@ class SimPagedMemory(object):
 
         self._update_range_mappings(mo.base, mo.object, mo.length)
 
+    def store_bytes(self, addr, data):
+        """
+        Stores concrete bytes at a concrete address. They are copied straight into ConcretePages, and stored as a single
+        memory object in all other pages, without building an AST for each part of the data.
+
+        :param int addr:    The address to store the data at.
+        :param data:        The bytes, as a str, bytearray, buffer or memoryview.
+        """
+
+        data = data.tobytes() if isinstance(data, memoryview) else str(data)
+        if not data:
+            return
+
+        mapped = (options.REVERSE_MEMORY_NAME_MAP in self.state.options or
+                  options.REVERSE_MEMORY_HASH_MAP in self.state.options or
+                  options.MEMORY_SYMBOLIC_BYTES_MAP in self.state.options)
+        mo = None
+        end = addr + len(data)
+        for page_addr in self._containing_pages(addr, end):
+            page = self._get_writable_page(page_addr / self._page_size, addr)
+            if type(page) is ConcretePage and not mapped:
+                if self.allow_segv and not page.concrete_permissions & Page.PROT_WRITE:
+                    raise SimSegfaultError(addr, 'non-writable')
+                start, stop = max(addr, page_addr), min(end, page_addr + self._page_size)
+                page.store_bytes(start, data[start - addr:stop - addr])
+            else:
+                if mo is None:
+                    value = claripy.BVV(data, len(data) * self.byte_width)
+                    value.make_uuid()
+                    mo = SimMemoryObject(value, addr, byte_width=self.byte_width)
+                self._apply_object_to_page(page_addr, mo, page=page)
+
+        if mo is not None:
+            self._update_range_mappings(mo.base, mo.object, mo.length)
+
     def replace_memory_object(self, old, new_content):
         """
         Replaces the memory object `old` with a new memory object containing `new_content`.
@@ -977,7 +1265,7 @@ class SimPagedMemory(object):
         page_num = addr / self._page_size
 
         try:
-            page = self._get_page(page_num)
+            page = self._get_page(page_num, write=permissions is not None)
         except KeyError:
             raise SimMemoryError("page does not exist at given address")
 
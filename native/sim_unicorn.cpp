@@ -25,6 +25,9 @@ extern "C" {
 // See State::step for why this is necessary
 static const uint32_t MAX_BB_SIZE = 800;
 
+// Maximum number of bytes a natively handled write may output
+static const uint64_t MAX_NATIVE_WRITE = 0x1000000;
+
 extern "C" void x86_reg_update(uc_engine *uc, uint8_t *buf, int save);
 extern "C" void mips_reg_update(uc_engine *uc, uint8_t *buf, int save);
 
@@ -89,6 +92,36 @@ typedef struct transmit_record {
 	uint32_t count;
 } transmit_record_t;
 
+typedef enum native_syscall: uint32_t {
+	NATIVE_SYSCALL_NONE = 0,
+	NATIVE_SYSCALL_WRITE,
+	NATIVE_SYSCALL_BRK,
+	NATIVE_SYSCALL_MMAP,
+	NATIVE_SYSCALL_OLD_MMAP,
+} native_syscall_t;
+
+typedef struct native_syscall_entry {
+	native_syscall_t kind;
+	uint64_t bbl_addr;
+} native_syscall_entry_t;
+
+// the effect of a syscall that ran natively, to be replayed into the angr state
+typedef struct syscall_record {
+	native_syscall_t kind;
+	uint64_t result;
+	uint64_t fd;
+	void *data;
+	uint64_t count;
+	uint64_t map_address; // memory newly mapped in unicorn, if any
+	uint64_t map_length;
+	uint32_t perms;
+} syscall_record_t;
+
+#define LINUX_MAP_SHARED 0x01
+#define LINUX_MAP_PRIVATE 0x02
+#define LINUX_MAP_FIXED 0x10
+#define LINUX_MAP_ANONYMOUS 0x20
+
 // These prototypes may be found in <unicorn/unicorn.h> by searching for "Callback"
 static void hook_mem_read(uc_engine *uc, uc_mem_type type, uint64_t address, int size, int64_t value, void *user_data);
 static void hook_mem_write(uc_engine *uc, uc_mem_type type, uint64_t address, int size, int64_t value, void *user_data);
@@ -96,6 +129,7 @@ static bool hook_mem_unmapped(uc_engine *uc, uc_mem_type type, uint64_t address,
 static bool hook_mem_prot(uc_engine *uc, uc_mem_type type, uint64_t address, int size, int64_t value, void *user_data);
 static void hook_block(uc_engine *uc, uint64_t address, int32_t size, void *user_data);
 static void hook_intr(uc_engine *uc, uint32_t intno, void *user_data);
+static void hook_syscall(uc_engine *uc, void *user_data);
 
 class State {
 private:
@@ -117,8 +151,9 @@ public:
 	std::unordered_set<uint64_t>::iterator *executed_pages_iterator;
 	uint64_t syscall_count;
 	std::vector<transmit_record_t> transmit_records;
+	std::vector<syscall_record_t> syscall_records;
 	uint64_t cur_steps, max_steps;
-	uc_hook h_read, h_write, h_block, h_prot, h_unmap, h_intr;
+	uc_hook h_read, h_write, h_block, h_prot, h_unmap, h_intr, h_syscall;
 	bool stopped;
 	stop_t stop_reason;
 	uint64_t stopping_register;
@@ -135,6 +170,14 @@ public:
 	uint32_t transmit_sysno;
 	uint32_t transmit_bbl_addr;
 
+	// syscalls that are run natively: sysno -> entry
+	std::unordered_map<uint64_t, native_syscall_entry_t> native_syscalls;
+	// the program break and the next mmap address, and how far memory is known to be free after them
+	uint64_t brk, brk_limit;
+	uint64_t mmap_base, mmap_limit;
+	bool zero_fill;
+	bool enable_nx;
+
 	VexArch vex_guest;
 	VexArchInfo vex_archinfo;
 	RegisterSet symbolic_registers; // tracking of symbolic registers
@@ -145,7 +188,7 @@ public:
 	State(uc_engine *_uc, uint64_t cache_key):uc(_uc)
 	{
 		hooked = false;
-		h_read = h_write = h_block = h_prot = 0;
+		h_read = h_write = h_block = h_prot = h_syscall = 0;
 		max_steps = cur_steps = 0;
 		stopped = true;
 		stop_reason = STOP_NOSTART;
@@ -153,6 +196,8 @@ public:
 		ignore_next_selfmod = false;
 		interrupt_handled = false;
 		transmit_sysno = -1;
+		brk = brk_limit = mmap_base = mmap_limit = 0;
+		zero_fill = enable_nx = false;
 		vex_guest = VexArch_INVALID;
 		syscall_count = 0;
 		uc_context_alloc(uc, &saved_regs);
@@ -194,6 +239,10 @@ public:
 
 		err = uc_hook_add(uc, &h_intr, UC_HOOK_INTR, (void *)hook_intr, this, 1, 0);
 
+		if (arch == UC_ARCH_X86 && mode == UC_MODE_64) {
+			err = uc_hook_add(uc, &h_syscall, UC_HOOK_INSN, (void *)hook_syscall, this, 1, 0, UC_X86_INS_SYSCALL);
+		}
+
 		hooked = true;
 	}
 
@@ -208,9 +257,11 @@ public:
 		err = uc_hook_del(uc, h_prot);
 		err = uc_hook_del(uc, h_unmap);
 		err = uc_hook_del(uc, h_intr);
+		if (h_syscall)
+			err = uc_hook_del(uc, h_syscall);
 
 		hooked = false;
-		h_read = h_write = h_block = h_prot = h_unmap = 0;
+		h_read = h_write = h_block = h_prot = h_unmap = h_syscall = 0;
 	}
 
 	~State() {
@@ -221,6 +272,8 @@ public:
 			delete[] it->second;
 		}
 		active_pages.clear();
+		for (auto it = syscall_records.begin(); it != syscall_records.end(); it++)
+			free(it->data);
 		uc_free(saved_regs);
 	}
 
@@ -955,6 +1008,229 @@ public:
 		}
 	}
 
+	//
+	// Native syscalls
+	//
+
+	// checks if any byte of the register at the given offset is symbolic
+	bool register_symbolic(uint64_t offset, int size) {
+		for (int i = 0; i < size; i++)
+			if (symbolic_registers.count(offset + i))
+				return true;
+		return false;
+	}
+
+	// like find_tainted(), but for ranges spanning any number of pages
+	uint64_t find_tainted_range(uint64_t address, uint64_t length) {
+		while (length > 0) {
+			uint64_t chunk = PAGE_SIZE - (address & 0xFFF);
+			if (chunk > length)
+				chunk = length;
+			uint64_t tainted = find_tainted(address, chunk);
+			if (tainted != -1)
+				return tainted;
+			address += chunk;
+			length -= chunk;
+		}
+		return -1;
+	}
+
+	// checks if [address, address + length) ends before limit and is not mapped in unicorn yet
+	bool region_available(uint64_t address, uint64_t length, uint64_t limit) {
+		if (address > limit || length > limit - address)
+			return false;
+
+		uc_mem_region *regions;
+		uint32_t count;
+		if (uc_mem_regions(uc, &regions, &count) != UC_ERR_OK)
+			return false;
+
+		bool available = true;
+		for (uint32_t i = 0; i < count; i++) {
+			// the end of a region is inclusive
+			if (regions[i].begin < address + length && regions[i].end >= address) {
+				available = false;
+				break;
+			}
+		}
+		uc_free(regions);
+		return available;
+	}
+
+	bool prepare_write(uint64_t *args, syscall_record_t *record) {
+		uint64_t fd = args[0], buf = args[1], count = args[2];
+
+		// python only enables this when both streams are open
+		if ((fd != 1 && fd != 2) || count > MAX_NATIVE_WRITE)
+			return false;
+
+		record->fd = fd;
+		record->count = count;
+		record->result = count;
+		if (count == 0)
+			return true;
+
+		if (find_tainted_range(buf, count) != -1)
+			return false;
+
+		record->data = malloc(count);
+		if (uc_mem_read(uc, buf, record->data, count) != UC_ERR_OK) {
+			free(record->data);
+			record->data = NULL;
+			return false;
+		}
+		return true;
+	}
+
+	bool prepare_brk(uint64_t *args, syscall_record_t *record) {
+		uint64_t new_brk = args[0];
+
+		// like posix.set_brk(), the break never moves down, and asking for a lower one returns the current one
+		if (new_brk < brk) {
+			record->result = brk;
+			return true;
+		}
+
+		uint64_t start = (brk + 0xFFF) & ~0xFFFULL;
+		uint64_t end = (new_brk + 0xFFF) & ~0xFFFULL;
+		if (end > start) {
+			if (!region_available(start, end - start, brk_limit))
+				return false;
+			record->map_address = start;
+			record->map_length = end - start;
+			record->perms = UC_PROT_ALL;
+		}
+		record->result = new_brk;
+		return true;
+	}
+
+	bool prepare_mmap(uint64_t *args, syscall_record_t *record) {
+		uint64_t addr = args[0], length = args[1], prot = args[2], flags = args[3];
+
+		// only fresh anonymous memory at an address of our choosing, which is where the mmap SimProcedure puts it
+		if (addr != 0 || length == 0 || (mmap_base & 0xFFF) ||
+				(flags & (LINUX_MAP_SHARED | LINUX_MAP_PRIVATE | LINUX_MAP_ANONYMOUS | LINUX_MAP_FIXED)) != (LINUX_MAP_PRIVATE | LINUX_MAP_ANONYMOUS))
+			return false;
+
+		uint64_t end = (mmap_base + length + 0xFFF) & ~0xFFFULL;
+		if (end <= mmap_base || !region_available(mmap_base, end - mmap_base, mmap_limit))
+			return false;
+
+		record->map_address = mmap_base;
+		record->map_length = end - mmap_base;
+		record->perms = prot & UC_PROT_ALL;
+		record->result = mmap_base;
+		return true;
+	}
+
+	/*
+	 * run the current syscall natively, if it is one of the configured ones and all its arguments are concrete.
+	 * the effects are logged in syscall_records, so that python can replay them into the state afterwards.
+	 * returns false without changing anything if the syscall has to be handled in python.
+	 */
+	bool native_syscall() {
+		// the registers holding the syscall number and the arguments for int 0x80 and syscall
+		static const int regs_32[] = {UC_X86_REG_EAX, UC_X86_REG_EBX, UC_X86_REG_ECX, UC_X86_REG_EDX, UC_X86_REG_ESI, UC_X86_REG_EDI, UC_X86_REG_EBP};
+		static const uint64_t offsets_32[] = {8, 20, 12, 16, 32, 36, 28};
+		static const int regs_64[] = {UC_X86_REG_RAX, UC_X86_REG_RDI, UC_X86_REG_RSI, UC_X86_REG_RDX, UC_X86_REG_R10, UC_X86_REG_R8, UC_X86_REG_R9};
+		static const uint64_t offsets_64[] = {16, 72, 64, 32, 96, 80, 88};
+
+		if (native_syscalls.empty() || arch != UC_ARCH_X86)
+			return false;
+
+		const int *regs = mode == UC_MODE_64 ? regs_64 : regs_32;
+		const uint64_t *offsets = mode == UC_MODE_64 ? offsets_64 : offsets_32;
+		int reg_size = mode == UC_MODE_64 ? 8 : 4;
+
+		if (register_symbolic(offsets[0], reg_size))
+			return false;
+		uint64_t sysno = 0;
+		uc_reg_read(uc, regs[0], &sysno);
+
+		auto entry = native_syscalls.find(sysno);
+		if (entry == native_syscalls.end())
+			return false;
+		native_syscall_t kind = entry->second.kind;
+
+		int num_args = 1;
+		if (kind == NATIVE_SYSCALL_WRITE)
+			num_args = 3;
+		else if (kind == NATIVE_SYSCALL_MMAP)
+			num_args = 4; // the fd and the offset do not matter for anonymous memory
+
+		uint64_t args[6] = {0};
+		for (int i = 0; i < num_args; i++) {
+			if (register_symbolic(offsets[i + 1], reg_size))
+				return false;
+			uc_reg_read(uc, regs[i + 1], &args[i]);
+		}
+
+		if (kind == NATIVE_SYSCALL_OLD_MMAP) {
+			// the arguments are passed in memory
+			uint32_t block[6];
+			if (find_tainted(args[0], sizeof(block)) != -1 || uc_mem_read(uc, args[0], block, sizeof(block)) != UC_ERR_OK)
+				return false;
+			for (int i = 0; i < 6; i++)
+				args[i] = block[i];
+		}
+
+		syscall_record_t record = {kind, 0, 0, NULL, 0, 0, 0, 0};
+		bool ok = false;
+		switch (kind) {
+			case NATIVE_SYSCALL_WRITE:
+				ok = prepare_write(args, &record);
+				break;
+			case NATIVE_SYSCALL_BRK:
+				ok = prepare_brk(args, &record);
+				break;
+			case NATIVE_SYSCALL_MMAP:
+			case NATIVE_SYSCALL_OLD_MMAP:
+				ok = prepare_mmap(args, &record);
+				break;
+			default:
+				break;
+		}
+		if (!ok)
+			return false;
+
+		// the syscall counts as a block, just like the SimProcedure that would run otherwise
+		step(entry->second.bbl_addr, 0, false);
+		commit();
+		if (stopped) {
+			free(record.data);
+			return false;
+		}
+
+		if (record.map_length) {
+			uint32_t perms = enable_nx ? record.perms : record.perms | UC_PROT_EXEC;
+			if (uc_mem_map(uc, record.map_address, record.map_length, perms) != UC_ERR_OK) {
+				free(record.data);
+				stop(STOP_ERROR);
+				return false;
+			}
+
+			// fresh anonymous memory is zero, while memory past the old break is uninitialized in angr
+			bool symbolic = kind == NATIVE_SYSCALL_BRK && !zero_fill;
+			std::vector<uint8_t> taint(symbolic ? PAGE_SIZE : 0, TAINT_SYMBOLIC);
+			for (uint64_t offset = 0; offset < record.map_length; offset += PAGE_SIZE)
+				page_activate(record.map_address + offset, symbolic ? taint.data() : NULL);
+		}
+
+		if (kind == NATIVE_SYSCALL_BRK)
+			brk = record.result;
+		else if (kind == NATIVE_SYSCALL_MMAP || kind == NATIVE_SYSCALL_OLD_MMAP)
+			mmap_base = record.map_address + record.map_length;
+
+		uc_reg_write(uc, regs[0], &record.result);
+		for (int i = 0; i < reg_size; i++)
+			symbolic_registers.erase(offsets[0] + i);
+
+		syscall_records.push_back(record);
+		interrupt_handled = true;
+		syscall_count++;
+		return true;
+	}
+
 	inline unsigned int arch_pc_reg() {
 		switch (arch) {
 			case UC_ARCH_X86:
@@ -1087,6 +1363,10 @@ static void hook_intr(uc_engine *uc, uint32_t intno, void *user_data) {
 	state->interrupt_handled = false;
 
 	if (state->arch == UC_ARCH_X86 && intno == 0x80) {
+		if (state->mode == UC_MODE_32 && state->native_syscall()) {
+			return;
+		}
+
 		// this is the ultimate hack for cgc -- it must be enabled by explitly setting the transmit sysno from python
 		// basically an implementation of the cgc transmit syscall
 
@@ -1163,6 +1443,12 @@ static void hook_intr(uc_engine *uc, uint32_t intno, void *user_data) {
 	}
 }
 
+static void hook_syscall(uc_engine *uc, void *user_data) {
+	State *state = (State *)user_data;
+	state->interrupt_handled = false;
+	state->native_syscall();
+}
+
 static bool hook_mem_unmapped(uc_engine *uc, uc_mem_type type, uint64_t address, int size, int64_t value, void *user_data) {
 	State *state = (State *)user_data;
 	uint64_t start = address & ~0xFFFULL;
@@ -1376,6 +1662,45 @@ transmit_record_t *simunicorn_process_transmit(State *state, uint32_t num) {
 	}
 }
 
+//
+// Native syscalls
+//
+
+extern "C"
+void simunicorn_set_native_syscall(State *state, uint64_t sysno, native_syscall_t kind, uint64_t bbl_addr) {
+	if (kind == NATIVE_SYSCALL_NONE) {
+		state->native_syscalls.erase(sysno);
+	} else {
+		state->native_syscalls[sysno] = {kind, bbl_addr};
+	}
+}
+
+extern "C"
+void simunicorn_set_syscall_memory(State *state, uint64_t brk, uint64_t brk_limit, uint64_t mmap_base, uint64_t mmap_limit, bool zero_fill, bool enable_nx) {
+	state->brk = brk;
+	state->brk_limit = brk_limit;
+	state->mmap_base = mmap_base;
+	state->mmap_limit = mmap_limit;
+	state->zero_fill = zero_fill;
+	state->enable_nx = enable_nx;
+}
+
+extern "C"
+syscall_record_t *simunicorn_process_syscall(State *state, uint32_t num) {
+	if (num >= state->syscall_records.size()) {
+		for (auto record_iter = state->syscall_records.begin();
+				record_iter != state->syscall_records.end();
+				record_iter++) {
+			free(record_iter->data);
+		}
+		state->syscall_records.clear();
+		return NULL;
+	} else {
+		syscall_record_t *out = &state->syscall_records[num];
+		return out;
+	}
+}
+
 
 /*
  * Page cache
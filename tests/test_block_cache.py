@@ -4,6 +4,8 @@ import logging
 l = logging.getLogger("angr.tests")
 
 import os
+import shutil
+import tempfile
 test_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../binaries/tests'))
 
 def test_block_cache():
@@ -15,5 +17,58 @@ def test_block_cache():
     b = p.factory.block(p.entry)
     assert p.factory.block(p.entry).vex is not b.vex
 
+def test_persistent_block_cache():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        p = angr.Project(os.path.join(test_location, "x86_64", "fauxware"), persistent_lift_cache=cache_dir)
+        b = p.factory.block(p.entry)
+        engine = p.factory.default_engine
+        assert engine._persistent_cache_miss_count == 1
+        assert engine._persistent_cache_hit_count == 0
+
+        # a fresh project for the same binary should load the block from disk instead of lifting it
+        p = angr.Project(os.path.join(test_location, "x86_64", "fauxware"), persistent_lift_cache=cache_dir)
+        b2 = p.factory.block(p.entry)
+        engine = p.factory.default_engine
+        assert engine._persistent_cache_hit_count == 1
+        assert engine._persistent_cache_miss_count == 0
+        assert b2.vex is not b.vex
+        assert b2.vex.instructions == b.vex.instructions
+        assert b2.vex.jumpkind == b.vex.jumpkind
+
+        # eviction keeps the cache directory bounded
+        engine._persistent_cache.max_size = 0
+        engine._persistent_cache.evict()
+        assert engine._persistent_cache._directory_size() == 0
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def test_persistent_block_cache_trailing_bytes():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        p = angr.Project(os.path.join(test_location, "x86_64", "fauxware"), persistent_lift_cache=cache_dir)
+        engine = p.factory.default_engine
+
+        # nop; ret, followed by bytes that are not part of the block
+        b = p.factory.block(0x400000, insn_bytes="\x90\xc3" + "A" * 14)
+        assert b.vex.size == 2
+        assert engine._persistent_cache_miss_count == 1
+
+        engine.clear_cache()
+        b2 = p.factory.block(0x400000, insn_bytes="\x90\xc3" + "B" * 14)
+        assert engine._persistent_cache_hit_count == 1
+        assert engine._persistent_cache_miss_count == 0
+        assert b2.vex.instructions == b.vex.instructions
+
+        # a change inside the block is a miss
+        engine.clear_cache()
+        p.factory.block(0x400000, insn_bytes="\xcc\xc3" + "B" * 14)
+        assert engine._persistent_cache_hit_count == 0
+        assert engine._persistent_cache_miss_count == 1
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
 if __name__ == "__main__":
     test_block_cache()
+    test_persistent_block_cache()
+    test_persistent_block_cache_trailing_bytes()
@@ -0,0 +1,45 @@
+import networkx
+import nose.tools
+
+from angr.analyses.cfg.cfg_utils import CFGUtils
+from angr.analyses.forward_analysis import CallGraphVisitor
+
+def _nested_loops():
+    # 2 -> 3 -> 4 -> 5 -> 2 is an outer loop, 3 <-> 4 is an inner loop, and 6 loops on itself
+    graph = networkx.DiGraph()
+    graph.add_edges_from([ (1, 2), (2, 3), (3, 4), (4, 3), (4, 5), (5, 2), (5, 6), (6, 6) ])
+    return graph
+
+def test_scc_reverse_post_order():
+    sorted_nodes, loop_heads = CFGUtils.scc_reverse_post_order(_nested_loops())
+
+    nose.tools.assert_equal(sorted_nodes, [ 1, 2, 3, 4, 5, 6 ])
+    nose.tools.assert_equal(loop_heads, { 2, 3, 6 })
+
+def test_graph_visitor_worklist():
+    visitor = CallGraphVisitor(_nested_loops())
+
+    nose.tools.assert_equal(list(visitor.nodes()), [ 1, 2, 3, 4, 5, 6 ])
+    nose.tools.assert_equal(visitor.widening_points(), { 2, 3, 6 })
+    nose.tools.assert_true(visitor.is_widening_point(3))
+    nose.tools.assert_false(visitor.is_widening_point(4))
+
+    # every node is visited once, in order
+    nose.tools.assert_equal([ visitor.next_node() for _ in xrange(6) ], [ 1, 2, 3, 4, 5, 6 ])
+    nose.tools.assert_is(visitor.next_node(), None)
+
+    # revisited nodes come back in traversal order, and only once each
+    visitor.revisit(4)
+    visitor.revisit(2)
+    visitor.revisit(3, include_self=False)
+    nodes = [ ]
+    while True:
+        n = visitor.next_node()
+        if n is None:
+            break
+        nodes.append(n)
+    nose.tools.assert_equal(nodes, [ 2, 3, 4, 5 ])
+
+if __name__ == "__main__":
+    test_scc_reverse_post_order()
+    test_graph_visitor_worklist()
@@ -1,6 +1,7 @@
 import os
 import logging
 import sys
+import tempfile
 
 import nose.tools
 
@@ -450,6 +451,244 @@ def test_block_instruction_addresses_armhf():
     for instr_addr in main_node.instruction_addrs:
         nose.tools.assert_true(instr_addr % 2 == 1)
 
+#
+# Parallel lifting
+#
+
+def test_parallel_lifting():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg_parallel = proj.analyses.CFGFast(workers=2)
+
+    nose.tools.assert_equal(sorted((n.addr, n.size) for n in cfg.graph.nodes()),
+                            sorted((n.addr, n.size) for n in cfg_parallel.graph.nodes()))
+    nose.tools.assert_equal(sorted((a.addr, b.addr) for a, b in cfg.graph.edges()),
+                            sorted((a.addr, b.addr) for a, b in cfg_parallel.graph.edges()))
+    nose.tools.assert_equal(sorted(cfg.kb.functions.keys()), sorted(cfg_parallel.kb.functions.keys()))
+
+#
+# Incremental update
+#
+
+def test_incremental_update():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+    nodes = sorted((n.addr, n.size) for n in cfg.graph.nodes())
+    functions = sorted(cfg.kb.functions.keys())
+
+    callgraph = _callgraph_summary(cfg)
+    callees = _callees_summary(cfg)
+
+    # nothing changed in main or in a function it calls, so the updated CFG should be identical
+    main = cfg.kb.functions['main']
+    authenticate = cfg.kb.functions['authenticate']
+    for func in (main, authenticate):
+        cfg.update(ranges=[ (func.addr, func.addr + 1) ])
+
+        nose.tools.assert_equal(sorted((n.addr, n.size) for n in cfg.graph.nodes()), nodes)
+        nose.tools.assert_equal(sorted(cfg.kb.functions.keys()), functions)
+        nose.tools.assert_equal(_callgraph_summary(cfg), callgraph)
+        nose.tools.assert_equal(_callees_summary(cfg), callees)
+    nose.tools.assert_is_not(cfg.kb.functions['authenticate'], authenticate)
+
+def _cfg_summary(cfg, exclude=()):
+    nodes = sorted((n.addr, n.size) for n in cfg.graph.nodes() if n.function_address not in exclude)
+    edges = sorted((a.addr, b.addr, data['jumpkind']) for a, b, data in cfg.graph.edges(data=True)
+                   if a.function_address not in exclude and b.function_address not in exclude)
+    functions = dict((a, sorted(f.block_addrs_set)) for a, f in cfg.kb.functions.iteritems() if a not in exclude)
+    return nodes, edges, functions
+
+def _callgraph_summary(cfg):
+    return sorted((src, dst, sorted(data.items())) for src, dst, data in cfg.kb.functions.callgraph.edges(data=True))
+
+def _callees_summary(cfg):
+    # the functions each function calls or jumps to, which must be the ones in the knowledge base
+    callees = { }
+    for func_addr, func in cfg.kb.functions.iteritems():
+        nodes = [ n for n in func.transition_graph.nodes() if isinstance(n, angr.knowledge_plugins.Function) ]
+        for n in nodes:
+            nose.tools.assert_is(n, cfg.kb.functions.function(addr=n.addr))
+        callees[func_addr] = sorted(n.addr for n in nodes)
+    return callees
+
+def _branch_in_main(cfg):
+    # a conditional branch inside main
+    main = cfg.kb.functions['main']
+    return next(n for n in sorted(cfg.graph.nodes(), key=lambda n: n.addr)
+                if n.function_address == main.addr and n.addr != main.addr and
+                len(cfg.get_successors(n, excluding_fakeret=True)) == 2 and
+                all(succ.function_address == main.addr for succ in cfg.get_successors(n, excluding_fakeret=True))).addr
+
+def test_incremental_update_hook():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+    main = cfg.kb.functions['main']
+
+    original = _cfg_summary(cfg)
+    original_callgraph = _callgraph_summary(cfg)
+    original_callees = _callees_summary(cfg)
+    nodes, edges, functions = _cfg_summary(cfg, exclude=(main.addr, ))
+
+    target_addr = _branch_in_main(cfg)
+
+    # the branch now exits the program instead
+    proj.hook(target_addr, angr.SIM_PROCEDURES['libc']['exit']())
+    cfg.update(hooks=[ target_addr ])
+
+    node = cfg.get_any_node(target_addr)
+    nose.tools.assert_true(node.is_simprocedure)
+    nose.tools.assert_equal(cfg.get_successors(node), [ ])
+    nose.tools.assert_in(target_addr, cfg.kb.functions['main'].block_addrs_set)
+    nose.tools.assert_not_equal(_cfg_summary(cfg)[1], original[1])
+
+    # nothing outside of main changed
+    new_nodes, new_edges, new_functions = _cfg_summary(cfg, exclude=(main.addr, ))
+    nose.tools.assert_equal(new_nodes, nodes)
+    nose.tools.assert_equal(new_edges, edges)
+    for func_addr, blocks in functions.iteritems():
+        nose.tools.assert_equal(new_functions[func_addr], blocks)
+
+    # calls are the same as the ones of a CFG recovered from scratch
+    fresh_proj = angr.Project(path, load_options={'auto_load_libs': False})
+    fresh_proj.hook(target_addr, angr.SIM_PROCEDURES['libc']['exit']())
+    fresh = fresh_proj.analyses.CFGFast()
+    nose.tools.assert_equal(_callgraph_summary(cfg), _callgraph_summary(fresh))
+    nose.tools.assert_equal(_callees_summary(cfg), _callees_summary(fresh))
+
+    # removing the hook restores the original CFG
+    proj.unhook(target_addr)
+    cfg.update(hooks=[ target_addr ])
+
+    nose.tools.assert_false(cfg.get_any_node(target_addr).is_simprocedure)
+    nose.tools.assert_equal(_cfg_summary(cfg), original)
+    nose.tools.assert_equal(_callgraph_summary(cfg), original_callgraph)
+    nose.tools.assert_equal(_callees_summary(cfg), original_callees)
+
+#
+# Snapshots
+#
+
+def test_snapshot():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast(collect_data_references=True)
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.cfg')
+    os.close(fd)
+    try:
+        angr.analyses.cfg.CFGSnapshot.dump(cfg, snapshot_path)
+
+        proj = angr.Project(path, load_options={'auto_load_libs': False})
+        snapshot = angr.analyses.cfg.CFGSnapshot.load(proj, snapshot_path)
+
+        # nodes and functions are materialized on access
+        main = cfg.kb.functions['main']
+        node = snapshot.get_any_node(main.addr)
+        nose.tools.assert_equal(node.size, cfg.get_any_node(main.addr).size)
+        nose.tools.assert_equal(sorted((n.addr, jk) for n, jk in snapshot.get_successors_and_jumpkind(node)),
+                                sorted((n.addr, jk) for n, jk in cfg.get_successors_and_jumpkind(
+                                    cfg.get_any_node(main.addr))))
+        nose.tools.assert_equal(snapshot.functions['main'].block_addrs_set, main.block_addrs_set)
+
+        # callees of a loaded function are only materialized when they are used
+        from angr.analyses.cfg.cfg_snapshot import _FunctionStub
+        callees = [ n for n in snapshot.functions['main'].transition_graph.nodes()
+                    if isinstance(n, angr.knowledge_plugins.Function) ]
+        nose.tools.assert_not_equal(callees, [ ])
+        nose.tools.assert_true(all(type(callee) is _FunctionStub for callee in callees))
+        callee = callees[0]
+        nose.tools.assert_equal(callee.name, cfg.kb.functions[callee.addr].name)
+        nose.tools.assert_is(type(callee), angr.knowledge_plugins.Function)
+        nose.tools.assert_is(snapshot.functions[callee.addr], callee)
+        nose.tools.assert_true(all(type(c) is _FunctionStub for c in callees[1:]))
+        nose.tools.assert_equal(sorted(snapshot.functions), sorted(cfg.kb.functions))
+        nose.tools.assert_equal(sorted(snapshot.functions.callgraph.edges()), sorted(cfg.kb.functions.callgraph.edges()))
+
+        restored = snapshot.cfg
+        nose.tools.assert_equal(sorted((n.addr, n.size) for n in restored.graph.nodes()),
+                                sorted((n.addr, n.size) for n in cfg.graph.nodes()))
+        nose.tools.assert_equal(sorted((a.addr, b.addr) for a, b in restored.graph.edges()),
+                                sorted((a.addr, b.addr) for a, b in cfg.graph.edges()))
+        nose.tools.assert_equal(sorted(restored.memory_data), sorted(cfg.memory_data))
+
+        snapshot.close()
+    finally:
+        os.remove(snapshot_path)
+
+#
+# Compact graphs
+#
+
+def test_compact_graph():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg_compact = proj.analyses.CFGFast(compact_graph=True)
+
+    nose.tools.assert_is_instance(cfg_compact.graph, angr.analyses.cfg.CompactDiGraph)
+    nose.tools.assert_equal(sorted((n.addr, n.size) for n in cfg.graph.nodes()),
+                            sorted((n.addr, n.size) for n in cfg_compact.graph.nodes()))
+    nose.tools.assert_equal(sorted((a.addr, b.addr, data['jumpkind']) for a, b, data in cfg.graph.edges(data=True)),
+                            sorted((a.addr, b.addr, data['jumpkind'])
+                                   for a, b, data in cfg_compact.graph.edges(data=True)))
+    nose.tools.assert_equal(sorted(cfg.kb.functions.keys()), sorted(cfg_compact.kb.functions.keys()))
+
+    main = cfg_compact.get_any_node(cfg_compact.kb.functions['main'].addr)
+    nose.tools.assert_equal(sorted(n.addr for n in cfg_compact.get_successors(main)),
+                            sorted(n.addr for n in cfg.get_successors(cfg.get_any_node(main.addr))))
+
+def test_compact_graph_incremental_update():
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+    compact_proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg_compact = compact_proj.analyses.CFGFast(compact_graph=True)
+    original = _cfg_summary(cfg_compact)
+    nose.tools.assert_equal(original, _cfg_summary(cfg))
+
+    target_addr = _branch_in_main(cfg)
+    for p, c in ((proj, cfg), (compact_proj, cfg_compact)):
+        p.hook(target_addr, angr.SIM_PROCEDURES['libc']['exit']())
+        c.update(hooks=[ target_addr ])
+
+    # edges restored by the update keep their own attributes, even though their IDs were reused meanwhile
+    nose.tools.assert_equal(_cfg_summary(cfg_compact), _cfg_summary(cfg))
+    nose.tools.assert_equal(sorted((a.addr, b.addr, sorted(data.items()))
+                                   for a, b, data in cfg_compact.graph.edges(data=True)),
+                            sorted((a.addr, b.addr, sorted(data.items())) for a, b, data in cfg.graph.edges(data=True)))
+
+    compact_proj.unhook(target_addr)
+    cfg_compact.update(hooks=[ target_addr ])
+    nose.tools.assert_equal(_cfg_summary(cfg_compact), original)
+
+def test_compact_graph_removed_edges():
+    g = angr.analyses.cfg.CompactDiGraph()
+    g.add_edge('a', 'b', jumpkind='Ijk_Call', ins_addr=0x400000, stmt_idx=3)
+    data = g.in_edges('b', data=True)[0][2]
+    nose.tools.assert_is(g['a']['b'], data)
+
+    # the ID of the removed edge is reused by the next one
+    g.remove_node('b')
+    g.add_edge('c', 'd', jumpkind='Ijk_Ret', ins_addr=0x400010, stmt_idx=7)
+    nose.tools.assert_equal(dict(data), { 'jumpkind': 'Ijk_Call', 'ins_addr': 0x400000, 'stmt_idx': 3 })
+
+    # and writing to the view of a removed edge does not change the graph
+    data['jumpkind'] = 'Ijk_Boring'
+    nose.tools.assert_equal(g['c']['d']['jumpkind'], 'Ijk_Ret')
+
 def run_all():
 
     g = globals()
@@ -481,6 +720,13 @@ def run_all():
     test_resolve_x86_elf_pic_plt()
     test_function_names_for_unloaded_libraries()
     test_block_instruction_addresses_armhf()
+    test_parallel_lifting()
+    test_incremental_update()
+    test_incremental_update_hook()
+    test_snapshot()
+    test_compact_graph()
+    test_compact_graph_incremental_update()
+    test_compact_graph_removed_edges()
 
 
 def main():
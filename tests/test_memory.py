@@ -3,7 +3,10 @@ import time
 import claripy
 import nose
 
+import angr
+
 from angr.storage.paged_memory import SimPagedMemory
+from angr.storage.page_table import PageTable
 from angr import SimState, SIM_PROCEDURES
 from angr import options as o
 
@@ -642,7 +645,156 @@ def test_crosspage_read():
     assert "77665544" in state.solver.eval(r, cast_to=str).encode('hex')
     #assert s.solver.eval(r, 2) == ( 0xffeeddccbbaa998877665544, )
 
+def test_page_table_branch():
+    t = PageTable()
+    for i in xrange(0, 0x1000, 3):
+        t[i] = i
+    t2 = t.branch()
+
+    # branches share everything until written to
+    assert t2._root is t._root
+    t2[3] = 'x'
+    del t2[6]
+    t[0x10000] = 'y'
+    assert t2._root is not t._root
+
+    assert t[3] == 3 and t2[3] == 'x'
+    assert 6 in t and 6 not in t2
+    assert 0x10000 in t and 0x10000 not in t2
+    assert len(t) == len(t2) + 2
+    assert sorted(t2.keys()) == sorted(k for k in t.keys() if k not in (6, 0x10000))
+
+def test_paged_memory_branch():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x400000, s.se.BVV(0x41424344, 32))
+    s.memory.store(0x600000, s.se.BVS('sym', 32))
+
+    s2 = s.copy()
+    s2.memory.store(0x400000, s.se.BVV(0x45464748, 32))
+    s2.memory.store(0x800000, s.se.BVV(0x1, 32))
+
+    assert s.se.eval(s.memory.load(0x400000, 4)) == 0x41424344
+    assert s2.se.eval(s2.memory.load(0x400000, 4)) == 0x45464748
+    assert s.memory.mem._pages[0x600] is s2.memory.mem._pages[0x600]
+    assert s.memory.mem._pages[0x400] is not s2.memory.mem._pages[0x400]
+    assert 0x800 in s2.memory.mem._pages and 0x800 not in s.memory.mem._pages
+
+def test_concrete_pages():
+    from angr.storage.paged_memory import ConcretePage
+
+    s = SimState(arch="AMD64", add_options={ o.CONCRETE_MEMORY_PAGES })
+    s.memory.store(0x1ff8, "ABCDEFGHIJKLMNOP")
+    nose.tools.assert_is(type(s.memory.mem._pages[1]), ConcretePage)
+
+    # concrete loads across pages become a single object
+    items = s.memory.mem.load_objects(0x1ffc, 8)
+    nose.tools.assert_equal(len(items), 1)
+    nose.tools.assert_equal(s.se.eval(s.memory.load(0x1ffc, 8), cast_to=str), "EFGHIJKL")
+
+    # symbolic data goes into the overlay
+    x = s.se.BVS('x', 16)
+    s.memory.store(0x1ffe, x)
+    nose.tools.assert_equal(len(s.memory.mem.load_objects(0x1ffc, 8)), 3)
+    nose.tools.assert_is(s.memory.load(0x1ffe, 2), x)
+    v = s.memory.load(0x1ffc, 8)
+    nose.tools.assert_equal(s.se.eval_upto(v, 2, cast_to=str, extra_constraints=[x == 0x5858]), [ "EFXXIJKL" ])
+
+    # and is replaced by concrete data again
+    s2 = s.copy()
+    s2.memory.store(0x1ffe, "YY")
+    nose.tools.assert_equal(s2.se.eval(s2.memory.load(0x1ffc, 8), cast_to=str), "EFYYIJKL")
+    nose.tools.assert_equal(len(s2.memory.mem.load_objects(0x1ffc, 8)), 1)
+    nose.tools.assert_is(s.memory.load(0x1ffe, 2), x)
+
+    nose.tools.assert_equal(s.memory.changed_bytes(s2.memory), { 0x1ffe, 0x1fff })
+
+    s.memory.mem.store_bytes(0x2002, bytearray("ZZZ"))
+    nose.tools.assert_equal(s.se.eval(s.memory.load(0x2000, 8), cast_to=str), "IJZZZNOP")
+
+    # without the option, loads never look for concrete bytes
+    s3 = SimState(arch="AMD64")
+    s3.memory.store(0x1ff8, "ABCDEFGHIJKLMNOP")
+    nose.tools.assert_is(s3.memory.mem._load_concrete_bytes(0x1ffc, 0x2004), None)
+    nose.tools.assert_equal(s3.se.eval(s3.memory.load(0x1ffc, 8), cast_to=str), "EFGHIJKL")
+
+def test_store_bytes():
+    s = SimState(arch="AMD64")
+    s.memory.store(0x1ffc, "AAAAAAAA")
+    s.memory.mem.store_bytes(0x1ffe, memoryview(bytearray("BCDE")))
+    nose.tools.assert_equal(s.se.eval(s.memory.load(0x1ffc, 8), cast_to=str), "AABCDEAA")
+
+    # the data crosses a page boundary, but it is stored as a single memory object
+    nose.tools.assert_is(s.memory.mem[0x1ffe], s.memory.mem[0x2001])
+
+def test_concretization_cache():
+    s = SimState(arch="AMD64")
+    x = s.se.BVS('x', 64)
+    y = s.se.BVS('y', 64)
+    s.add_constraints(x >= 0x1000, x < 0x1010)
+    s.add_constraints(y == 0x2000)
+
+    r = s.memory.concretize_read_addr(x)
+    nose.tools.assert_equal(sorted(r), range(0x1000, 0x1010))
+    nose.tools.assert_equal(s.memory.concretize_read_addr(y), [ 0x2000 ])
+    nose.tools.assert_equal(s.memory.concretize_read_addr(x), r)
+    nose.tools.assert_equal(s.memory.concretize_read_addr(0x3000), [ 0x3000 ])
+    nose.tools.assert_equal(len(s.memory._concretization_cache), 2)
+
+    # the cached result is used as long as the constraints stay the same
+    key = ('load', tuple(s.memory.read_strategies), hash(x))
+    n, a = s.memory._concretization_cache[key]
+    s.memory._concretization_cache[key] = (n, (0x1234, ))
+    nose.tools.assert_equal(s.memory.concretize_read_addr(x), [ 0x1234 ])
+    s.memory._concretization_cache[key] = (n, a)
+
+    # new constraints invalidate it
+    s.add_constraints(x < 0x1004)
+    nose.tools.assert_equal(sorted(s.memory.concretize_read_addr(x)), range(0x1000, 0x1004))
+
+    # so do different constraints, even if there are as many of them as before
+    constraints = s.se.constraints
+    old_solver = s.se._stored_solver
+    solver = claripy.Solver()
+    solver.add([ x == 0x1001 ] + constraints[1:])
+    nose.tools.assert_equal(len(solver.constraints), len(constraints))
+    s.se._stored_solver = solver
+    nose.tools.assert_equal(s.memory.concretize_read_addr(x), [ 0x1001 ])
+    s.se._stored_solver = old_solver
+
+    # single solutions are revalidated with a single check
+    s.add_constraints(y != 0)
+    nose.tools.assert_equal(s.memory.concretize_read_addr(y), [ 0x2000 ])
+
+    # copies start from scratch
+    s2 = s.copy()
+    nose.tools.assert_equal(len(s2.memory._concretization_cache), 0)
+    s2.add_constraints(x == 0x1002)
+    nose.tools.assert_equal(s2.memory.load(x, 1).op, 'BVV')
+
+    # nothing is cached while breakpoints may change the result
+    s3 = s.copy()
+    s3.inspect.b('address_concretization', when=angr.BP_BEFORE, action=lambda st: None)
+    s3.memory.concretize_read_addr(y)
+    nose.tools.assert_equal(len(s3.memory._concretization_cache), 0)
+
+def test_unmapped_until():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x403000, "A")
+    s.memory.store(0x500010, "B")
+    mem = s.memory.mem
+
+    nose.tools.assert_equal(mem.unmapped_until(0x400000, 0x600000), 0x403000)
+    nose.tools.assert_equal(mem.unmapped_until(0x403000, 0x600000), 0x403000)
+    nose.tools.assert_equal(mem.unmapped_until(0x404000, 0x600000), 0x500000)
+    nose.tools.assert_equal(mem.unmapped_until(0x501000, 0x600000), 0x600000)
+
 if __name__ == '__main__':
+    test_unmapped_until()
+    test_concrete_pages()
+    test_store_bytes()
+    test_concretization_cache()
+    test_page_table_branch()
+    test_paged_memory_branch()
     test_crosspage_read()
     test_fast_memory()
     test_load_bytes()
@@ -0,0 +1,54 @@
+import os
+import json
+
+import nose
+import angr
+from angr.misc.profiling import ExecutionProfiler
+
+test_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../binaries/tests'))
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+def test_profiler_accounting():
+    prof = ExecutionProfiler(timer=FakeTimer())
+    prof.enter('block 0x400000')    # t=1
+    prof.enter('stmt:WrTmp')        # t=2
+    prof.enter('solver:satisfiable')  # t=3
+    prof.exit()                     # t=4
+    prof.exit()                     # t=5
+    prof.exit()                     # t=6
+
+    rows = { r['category']: r for r in prof.report() }
+    nose.tools.assert_equal(rows['solver:satisfiable']['self_time'], 1.0)
+    nose.tools.assert_equal(rows['stmt:WrTmp']['self_time'], 2.0)
+    nose.tools.assert_equal(rows['stmt:WrTmp']['total_time'], 3.0)
+    nose.tools.assert_equal(rows['block']['self_time'], 2.0)
+    nose.tools.assert_equal(rows['block']['total_time'], 5.0)
+    nose.tools.assert_true(all(r['block'] == 0x400000 for r in rows.values()))
+
+    folded = prof.to_folded().split('\n')
+    nose.tools.assert_in('block 0x400000;stmt:WrTmp;solver:satisfiable 1000000', folded)
+    nose.tools.assert_equal(len(json.loads(prof.to_json())), 3)
+
+def test_profiler_run():
+    p = angr.Project(os.path.join(test_location, 'x86_64', 'fauxware'), auto_load_libs=False)
+    simgr = p.factory.simgr()
+    prof = ExecutionProfiler()
+    simgr.run(n=20, profiler=prof)
+
+    categories = { r['category'] for r in prof.report() }
+    nose.tools.assert_in('lift', categories)
+    nose.tools.assert_true(any(c.startswith('stmt:') for c in categories))
+    nose.tools.assert_true(any(c.startswith('expr:') for c in categories))
+    nose.tools.assert_true(all(r['block'] is not None for r in prof.report() if r['category'].startswith('stmt:')))
+    nose.tools.assert_is(angr.misc.profiling.active_profiler, None)
+
+if __name__ == '__main__':
+    test_profiler_accounting()
+    test_profiler_run()
@@ -1,5 +1,7 @@
 import nose
 import angr
+import cPickle
+import threading
 
 import logging
 l = logging.getLogger("angr_tests.managers")
@@ -123,7 +125,185 @@ def test_explore_with_cfg():
     nose.tools.assert_equal(pg.found[1].addr, 0x4006ED)
     nose.tools.assert_equal(pg.avoid[0].addr, 0x4007C9)
 
+def test_async_solving():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    pool = angr.state_plugins.solver_pool.SolverWorkerPool(workers=2, timeout=60)
+    try:
+        pg = p.factory.simgr()
+        pg.use_technique(angr.exploration_techniques.AsyncSolving(pool=pool))
+        pg.run()
+    finally:
+        pool.shutdown()
+
+    nose.tools.assert_equal(len(pg.active), 0)
+    nose.tools.assert_equal(len(pg.solving), 0)
+    nose.tools.assert_equal(len(pg.timeout), 0)
+    nose.tools.assert_equal(len(pg.deadended), 3)
+    nose.tools.assert_true(any("SOSNEAKY" in s for s in pg.mp_deadended.posix.dumps(0).mp_items))
+
+def test_step_async():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    pg = p.factory.simgr()
+    future = pg.step_async(until=lambda lpg: len(lpg.active) > 1, threads=2)
+    pg2 = future.result()
+    nose.tools.assert_equal(len(pg2.active), 2)
+
+    pg3 = pg2.run_async(threads=2).result()
+    nose.tools.assert_equal(len(pg3.active), 0)
+    nose.tools.assert_equal(len(pg3.deadended), 3)
+    nose.tools.assert_is(pg3._state_executor, None)
+
+class _ThreadRecorder(angr.exploration_techniques.ExplorationTechnique):
+    def __init__(self):
+        super(_ThreadRecorder, self).__init__()
+        self.threads = set()
+        self.stepped = 0
+
+    def step_state(self, state, **kwargs):
+        self.threads.add(threading.current_thread().ident)
+        self.stepped += 1
+        if self.stepped % 2:
+            return None
+        # step every other state here, so that hooked and concurrently stepped states are mixed
+        ss = state.project.factory.successors(state, **kwargs)
+        return { 'active': ss.flat_successors, 'unsat': ss.unsat_successors,
+                 'unconstrained': ss.unconstrained_successors, 'orig': state }
+
+def test_step_async_hooks():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    pg = p.factory.simgr()
+    recorder = _ThreadRecorder()
+    pg.use_technique(recorder)
+    pg2 = pg.run_async(threads=4).result()
+    nose.tools.assert_equal(len(pg2.deadended), 3)
+    nose.tools.assert_equal(len(pg2.errored), 0)
+
+    # step_state hooks only ever ran on the thread driving the simulation manager
+    nose.tools.assert_equal(len(recorder.threads), 1)
+    nose.tools.assert_not_in(threading.current_thread().ident, recorder.threads)
+
+class _HookRecorder(angr.exploration_techniques.ExplorationTechnique):
+    def __init__(self):
+        super(_HookRecorder, self).__init__()
+        self.filtered = [ ]
+        self.completed = 0
+
+    def filter(self, state):
+        self.filtered.append(state.addr)
+        return None
+
+    def complete(self, simgr):
+        self.completed += 1
+        return False
+
+class _StepStateRecorder(angr.exploration_techniques.ExplorationTechnique):
+    def __init__(self):
+        super(_StepStateRecorder, self).__init__()
+        self.stepped = 0
+
+    def step_state(self, state, **kwargs):
+        self.stepped += 1
+        return None
+
+def _explore_fauxware(p, techniques):
+    pg = p.factory.simgr()
+    for tech in techniques:
+        pg.use_technique(tech)
+    pg.use_technique(angr.exploration_techniques.Explorer(find=0x4006ED, num_find=2))
+    pg.run()
+    return pg
+
+def _stdins(states):
+    return sorted(s.posix.dumps(0) for s in states)
+
+def test_process_pool():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    serial_recorder = _HookRecorder()
+    serial = _explore_fauxware(p, [ serial_recorder ])
+
+    pool = angr.exploration_techniques.ProcessPool(workers=2, batch_size=1, min_states=1)
+    recorder = _HookRecorder()
+    try:
+        pg = _explore_fauxware(p, [ pool, recorder ])
+    finally:
+        pool.shutdown()
+
+    # the stashes are the same as the ones of serial stepping
+    nose.tools.assert_equal(len(pg.found), 2)
+    nose.tools.assert_equal(len(pg.errored), 0)
+    for stash in ('found', 'active', 'deadended'):
+        nose.tools.assert_equal(_stdins(pg.stashes[stash]), _stdins(serial.stashes[stash]))
+    nose.tools.assert_equal(sorted(s.history.depth for s in pg.found),
+                            sorted(s.history.depth for s in serial.found))
+
+    # the successors came back with their project and their full ancestry
+    for state in pg.found:
+        nose.tools.assert_is(state.project, p)
+        nose.tools.assert_equal(len(list(state.history.parents)), state.history.depth)
+        nose.tools.assert_equal(state.history.bbl_addrs.hardcopy[0], p.entry)
+
+    # filter and complete hooks of other techniques ran in this process
+    nose.tools.assert_equal(sorted(recorder.filtered), sorted(serial_recorder.filtered))
+    nose.tools.assert_equal(recorder.completed, serial_recorder.completed)
+
+def test_process_pool_fallback():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+    serial = _explore_fauxware(p, [ ])
+
+    # a step_state hook cannot run in the workers, so stepping stays in this process
+    pool = angr.exploration_techniques.ProcessPool(workers=2, min_states=1)
+    step_state_recorder = _StepStateRecorder()
+    try:
+        pg = _explore_fauxware(p, [ pool, step_state_recorder ])
+    finally:
+        pool.shutdown()
+
+    nose.tools.assert_not_equal(step_state_recorder.stepped, 0)
+    nose.tools.assert_equal(_stdins(pg.found), _stdins(serial.found))
+
+    # and so does a custom successor function
+    pool = angr.exploration_techniques.ProcessPool(workers=2, min_states=1)
+    stepped = [ ]
+    def successor_func(state):
+        stepped.append(state)
+        return state.step()
+    try:
+        pg = p.factory.simgr()
+        pg.use_technique(pool)
+        pg.step(until=lambda lpg: len(lpg.active) > 1, successor_func=successor_func)
+    finally:
+        pool.shutdown()
+    nose.tools.assert_equal(len(pg.active), 2)
+    nose.tools.assert_not_equal(len(stepped), 0)
+
+def test_process_pool_pickling():
+    from angr.exploration_techniques.process_pool import _dumps, _loads
+
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+    state = p.factory.entry_state()
+    blob = _dumps([ state ], p)
+
+    # the project itself is never serialized, only a token that must be resolved when loading
+    nose.tools.assert_raises(cPickle.UnpicklingError, cPickle.loads, blob)
+    state2, = _loads(blob, p)
+    nose.tools.assert_is(state2.project, p)
+    nose.tools.assert_equal(state2.addr, state.addr)
+
 if __name__ == "__main__":
+    print 'process_pool'
+    test_process_pool()
+    test_process_pool_fallback()
+    test_process_pool_pickling()
+    print 'step_async'
+    test_step_async()
+    print 'step_async_hooks'
+    test_step_async_hooks()
+    print 'async_solving'
+    test_async_solving()
     print 'explore_with_cfg'
     test_explore_with_cfg()
     print 'find_to_middle'
@@ -33,6 +33,36 @@ def test_basic():
     assert state.globals['pickled']
     assert state.globals['unpickled']
 
+def test_storage():
+    project = angr.Project(_bin('tests/cgc/sc2_0b32aa01_01'))
+    state = project.factory.entry_state()
+    state.memory.store(0x1000000, state.se.BVV(0x41424344, 32))
+    states = [ state.copy() for _ in xrange(4) ]
+    for i, s in enumerate(states):
+        s.globals['index'] = i
+
+    storage = angr.exploration_techniques.SpillStore(project=project)
+    try:
+        spiller = angr.exploration_techniques.Spiller(storage=storage, priority_key=lambda s: -s.globals['index'])
+        spiller._pickle(states)
+        assert len(storage) == 4
+        # the pages the states share are stored once
+        assert storage._db.execute("SELECT MAX(refs) FROM objects").fetchone()[0] == 4
+
+        del states
+        gc.collect()
+        loaded = spiller._unpickle(2)
+        assert [ s.globals['index'] for s in loaded ] == [ 3, 2 ]
+        assert loaded[0].project is project
+        assert loaded[0].se.eval(loaded[0].memory.load(0x1000000, 4)) == 0x41424344
+
+        loaded += spiller._unpickle(10)
+        assert [ s.globals['index'] for s in loaded ] == [ 3, 2, 1, 0 ]
+        assert len(storage) == 0
+        assert storage._db.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 0
+    finally:
+        storage.close()
+
 @nose.with_setup(setup, teardown)
 def test_palindrome2():
     project = angr.Project(_bin('tests/cgc/sc2_0b32aa01_01'))
@@ -61,5 +91,6 @@ def test_palindrome2():
 if __name__ == '__main__':
     setup()
     test_basic()
+    test_storage()
     test_palindrome2()
     teardown()
@@ -5,7 +5,10 @@ import nose
 import ana
 import gc
 
-from angr import SimState
+from angr import SimState, StateSerializer
+from angr import sim_options as o
+from angr.errors import SimUnsatError
+from angr.state_plugins.solver_cache import SolverResultCache, solver_result_cache
 
 def test_state():
     s = SimState(arch='AMD64')
@@ -148,6 +151,47 @@ def test_state_pickle():
     s = pickle.loads(sp)
     nose.tools.assert_equals(s.se.eval(s.memory.load(100, 10), cast_to=str), "AAABAABABC")
 
+def test_state_serializer():
+    s = SimState(arch="AMD64")
+    s.memory.store(100, s.se.BVV(0x4141414241414241424300, 88), endness='Iend_BE')
+    s.regs.rbx = s.se.BVS('rbx', 64)
+    s.add_constraints(s.regs.rbx * 3 + 7 > 10)
+
+    # a long history chain, shared by all the states
+    for i in xrange(2000):
+        s.register_plugin('history', s.history.make_child())
+        s.history.recent_bbl_addrs.append(i)
+
+    states = [ ]
+    for i in xrange(10):
+        c = s.copy()
+        c.register_plugin('history', s.history.make_child())
+        c.regs.rax = i
+        states.append(c)
+
+    serializer = StateSerializer()
+    objects = { }
+    blob, refs = serializer.dump(states[0], objects, { })
+    nose.tools.assert_true(refs)
+    nose.tools.assert_true(all(r in objects for r in refs))
+
+    data = serializer.dumps(states)
+    loaded = serializer.loads(data)
+    nose.tools.assert_equals(len(loaded), 10)
+    nose.tools.assert_equals([ l.se.eval(l.regs.rax) for l in loaded ], range(10))
+    nose.tools.assert_equals(loaded[3].se.eval(loaded[3].memory.load(100, 10), cast_to=str), "AAABAABABC")
+    nose.tools.assert_false(loaded[3].se.satisfiable(extra_constraints=[ loaded[3].regs.rbx == 1 ]))
+
+    # histories are shared again, but each state owns its own node
+    nose.tools.assert_equals(loaded[0].history.depth, 2001)
+    nose.tools.assert_equals(loaded[0].history.parent.recent_bbl_addrs, [ 1999 ])
+    nose.tools.assert_is(loaded[0].history.parent, loaded[1].history.parent)
+    nose.tools.assert_is_not(loaded[0].history, loaded[1].history)
+
+    # the original histories are left untouched
+    nose.tools.assert_equals(states[0].history.depth, 2001)
+    nose.tools.assert_is(states[0].history.parent, s.history)
+
 def test_global_condition():
     s = SimState(arch="AMD64")
 
@@ -182,10 +226,125 @@ def test_global_condition():
         nose.tools.assert_equals(s.se.eval_upto(s.regs.rbx, 10), [ 1 ])
         nose.tools.assert_items_equal(s.se.eval_upto(s.regs.rax, 10), [ 25 ])
 
+def test_solver_result_cache():
+    solver_result_cache.clear()
+
+    s = SimState(arch="AMD64", add_options={ o.SOLVER_RESULT_CACHE })
+    x = s.se.BVS('x', 32)
+    s.add_constraints(x > 10)
+    s0 = s.copy()
+    s.add_constraints(x < 20)
+
+    s1 = s.copy()
+    s2 = s.copy()
+    nose.tools.assert_equals(s1.se.max(x), 19)
+    nose.tools.assert_equals(s2.se.max(x), 19)
+    nose.tools.assert_equals(solver_result_cache.hits, 1)
+
+    # a satisfiable superset proves that a subset is satisfiable
+    nose.tools.assert_true(s1.se.satisfiable(extra_constraints=(x == 15,)))
+    nose.tools.assert_true(s0.se.satisfiable())
+    nose.tools.assert_equals(solver_result_cache.superset_hits, 1)
+
+    # an unsatisfiable subset proves that a superset is unsatisfiable
+    nose.tools.assert_false(s1.se.satisfiable(extra_constraints=(x == 30,)))
+    nose.tools.assert_false(s1.se.satisfiable(extra_constraints=(x == 30, x != 31)))
+    nose.tools.assert_equals(solver_result_cache.subset_hits, 1)
+
+    # a different constraint set misses
+    s2.add_constraints(x != 19)
+    nose.tools.assert_equals(s2.se.max(x), 18)
+
+    solver_result_cache.clear()
+
+def test_solver_result_cache_shared_prefix():
+    cache = SolverResultCache(max_size=2000)
+
+    # many satisfiable paths sharing a long prefix
+    prefix = range(100)
+    for i in xrange(1000):
+        cache.store_satisfiable(frozenset(prefix + [ 1000 + i ]), True)
+    nose.tools.assert_equals(len(cache._unsat_index), 0)
+
+    # a miss does not visit any of them, and neither do the subset checks against the one unsatisfiable set
+    cache.store_satisfiable(frozenset([ 0, 5000 ]), False)
+    nose.tools.assert_equals(sorted(cache._unsat_index), [ 0, 5000 ])
+    nose.tools.assert_is(cache.lookup_satisfiable(frozenset(prefix + [ 6000 ])), None)
+    nose.tools.assert_false(cache.lookup_satisfiable(frozenset(prefix + [ 5000 ])))
+    nose.tools.assert_true(cache.lookup_satisfiable(frozenset(prefix[:50] + [ 1500 ])))
+    nose.tools.assert_equals((cache.misses, cache.subset_hits, cache.superset_hits), (1, 1, 1))
+
+    # a result that changes moves the set to the other index, and eviction removes it from there
+    cache.store_satisfiable(frozenset(prefix + [ 1000 ]), False)
+    nose.tools.assert_not_in(frozenset(prefix + [ 1000 ]), cache._sat_index.get(1000, ()))
+    nose.tools.assert_in(frozenset(prefix + [ 1000 ]), cache._unsat_index[1000])
+    cache.max_size = 1
+    cache.store_satisfiable(frozenset([ 7000 ]), True)
+    nose.tools.assert_equals(len(cache._unsat_index), 0)
+    nose.tools.assert_equals(sorted(cache._sat_index), [ 7000 ])
+
+def test_constraint_slicing():
+    s = SimState(arch="AMD64", add_options={ o.SLICE_INDEPENDENT_CONSTRAINTS })
+    x = s.se.BVS('x', 32)
+    y = s.se.BVS('y', 32)
+    z = s.se.BVS('z', 32)
+    s.add_constraints(x > 10, y == 5)
+
+    nose.tools.assert_equals(len(s.se.constraint_index), 2)
+    nose.tools.assert_equals(len(s.se.constraint_index.relevant_constraints(x.variables)), 1)
+
+    s1 = s.copy()
+    s1.add_constraints(x < 20)
+    s1.add_constraints(z == x + y)
+
+    # the copy does not change the original index
+    nose.tools.assert_equals(len(s.se.constraint_index), 2)
+    nose.tools.assert_equals(len(s1.se.constraint_index), 1)
+    nose.tools.assert_equals(len(s1.se.constraint_index.relevant_constraints(x.variables)), 4)
+
+    nose.tools.assert_equals(s.se.max(x), 0xffffffff)
+    nose.tools.assert_equals(s1.se.max(x), 19)
+    nose.tools.assert_equals(s1.se.max(z), 24)
+    nose.tools.assert_equals(s.se.eval_upto(y, 2), [ 5 ])
+    nose.tools.assert_false(s.se.satisfiable(extra_constraints=(y == 6,)))
+    nose.tools.assert_true(s.se.satisfiable(extra_constraints=(x == 15,)))
+    nose.tools.assert_false(s1.se.satisfiable(extra_constraints=(z == 15,)))
+
+def test_constraint_slicing_unsat():
+    s = SimState(arch="AMD64", add_options={ o.SLICE_INDEPENDENT_CONSTRAINTS })
+    a = s.se.BVS('a', 32)
+    x = s.se.BVS('x', 32)
+    # a component that is unsatisfiable on its own, and was never checked
+    s.add_constraints(a > 10, a < 5)
+
+    nose.tools.assert_false(s.se.satisfiable(extra_constraints=(x == 1,)))
+    nose.tools.assert_raises(SimUnsatError, s.se.eval, x)
+    nose.tools.assert_raises(SimUnsatError, s.se.min, x)
+    nose.tools.assert_raises(SimUnsatError, s.se.max, x)
+
+    # once all constraints are known to be satisfiable, queries are sliced until a constraint is added
+    s = SimState(arch="AMD64", add_options={ o.SLICE_INDEPENDENT_CONSTRAINTS })
+    a = s.se.BVS('a', 32)
+    x = s.se.BVS('x', 32)
+    s.add_constraints(a > 10, x < 5)
+    nose.tools.assert_true(s.se.satisfiable())
+    nose.tools.assert_equals(s.se.max(x), 4)
+    nose.tools.assert_is_not(s.se._sliced_solver((x, ), (), None), s.se._solver)
+
+    s.add_constraints(a < 5)
+    nose.tools.assert_is(s.se._sliced_solver((x, ), (), None), s.se._solver)
+    nose.tools.assert_false(s.se.satisfiable(extra_constraints=(x == 1,)))
+    nose.tools.assert_raises(SimUnsatError, s.se.max, x)
+
 
 if __name__ == '__main__':
     test_state()
     test_state_merge()
     test_state_merge_static()
     test_state_pickle()
+    test_state_serializer()
     test_global_condition()
+    test_solver_result_cache()
+    test_solver_result_cache_shared_prefix()
+    test_constraint_slicing()
+    test_constraint_slicing_unsat()
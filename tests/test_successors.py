@@ -0,0 +1,59 @@
+import nose
+import angr
+import claripy
+
+import logging
+l = logging.getLogger("angr_tests.successors")
+
+# cmp rdi, 7; je 0x10; jmp rsi
+FANOUT_CODE = '\x48\x83\xff\x07\x74\x0a\xff\xe6'
+
+def _run_fanout(batch):
+    p = angr.load_shellcode(FANOUT_CODE, 'amd64')
+    add_options = { angr.options.BATCH_SUCCESSOR_SAT_CHECKS } if batch else set()
+    state = p.factory.blank_state(addr=0, add_options=add_options, remove_options={ angr.options.LAZY_SOLVES })
+
+    rdi = claripy.BVS('rdi', 64)
+    rsi = claripy.BVS('rsi', 64)
+    state.regs.rdi = rdi
+    state.regs.rsi = rsi
+    # the jump to 0x10 can never be taken, and the indirect jump fans out to three targets
+    state.add_constraints(rdi.ULT(4), claripy.Or(rsi == 0x40, rsi == 0x50, rsi == 0x60))
+
+    # an unrelated symbolic value, so that the siblings do not share all of their variables
+    unrelated = claripy.BVS('unrelated', 32)
+    state.add_constraints(unrelated > 10)
+
+    pg = p.factory.simgr(state, save_unsat=True)
+    steps = [ ]
+    for _ in xrange(2):
+        pg.step()
+        steps.append({ name: [ s.addr for s in pg.stashes[name] ] for name in ('active', 'unsat') })
+    return steps
+
+def test_batch_sat_checks():
+    unbatched = _run_fanout(False)
+    batched = _run_fanout(True)
+
+    nose.tools.assert_equal(unbatched[0], { 'active': [ 0x6 ], 'unsat': [ 0x10 ] })
+    nose.tools.assert_equal(sorted(unbatched[1]['active']), [ 0x40, 0x50, 0x60 ])
+
+    # same stashes, in the same order
+    nose.tools.assert_equal(batched, unbatched)
+
+def test_batch_sat_checks_successors():
+    p = angr.load_shellcode(FANOUT_CODE, 'amd64')
+    state = p.factory.blank_state(addr=0, add_options={ angr.options.BATCH_SUCCESSOR_SAT_CHECKS },
+                                  remove_options={ angr.options.LAZY_SOLVES })
+    state.add_constraints(state.regs.rdi.ULT(4))
+
+    succ = p.factory.successors(state)
+    nose.tools.assert_equal([ s.addr for s in succ.flat_successors ], [ 0x6 ])
+    nose.tools.assert_equal([ s.addr for s in succ.unsat_successors ], [ 0x10 ])
+    nose.tools.assert_equal(len(succ.all_successors), 2)
+    # nothing is left pending once the engine returns
+    nose.tools.assert_equal(succ._deferred_sat_checks, [ ])
+
+if __name__ == '__main__':
+    test_batch_sat_checks()
+    test_batch_sat_checks_successors()
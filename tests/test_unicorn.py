@@ -2,6 +2,7 @@ import nose
 import angr
 import pickle
 import re
+import StringIO
 from angr import options as so
 from nose.plugins.attrib import attr
 
@@ -115,6 +116,19 @@ def test_fauxware():
         'Username: \nPassword: \nWelcome to the admin console, trusted user!\n'
     )))
 
+def test_fauxware_warm_session():
+    p = angr.Project(os.path.join(test_location, 'binaries/tests/i386/fauxware'))
+    s_unicorn = p.factory.entry_state(add_options=so.unicorn | { so.UNICORN_WARM_SESSION })
+    pg = p.factory.simgr(s_unicorn)
+    pg.explore()
+
+    assert all("Unicorn" in ''.join(p.history.descriptions.hardcopy) for p in pg.deadended)
+    nose.tools.assert_equal(sorted(pg.mp_deadended.posix.dumps(1).mp_items), sorted((
+        'Username: \nPassword: \nWelcome to the admin console, trusted user!\n',
+        'Username: \nPassword: \nGo away!',
+        'Username: \nPassword: \nWelcome to the admin console, trusted user!\n'
+    )))
+
 def test_fauxware_aggressive():
     p = angr.Project(os.path.join(test_location, 'binaries/tests/i386/fauxware'))
     s_unicorn = p.factory.entry_state(
@@ -230,6 +244,61 @@ def test_concrete_transmits():
 
     nose.tools.assert_equal(pg_unicorn.one_active.posix.dumps(1), '1) Add number to the array\n2) Add random number to the array\n3) Sum numbers\n4) Exit\nRandomness added\n1) Add number to the array\n2) Add random number to the array\n3) Sum numbers\n4) Exit\n  Index: \n1) Add number to the array\n2) Add random number to the array\n3) Sum numbers\n4) Exit\n')
 
+def test_native_syscalls():
+    # brk(0); brk(brk + 0x2000); p = mmap(0, 0x2000, PROT_READ|PROT_WRITE, MAP_PRIVATE|MAP_ANONYMOUS, -1, 0);
+    # memcpy(p, "hi!\n", 4); write(1, p, 4); exit(0)
+    code = ("b80c00000031ff0f05488db800200000b80c0000000f0531ffbe00200000ba0300000041ba2200000049c7c0ffffffff4531c9"
+            "b8090000000f05c7006869210a4889c6bf01000000ba04000000b8010000000f05b83c00000031ff0f05").decode('hex')
+    p = angr.Project(StringIO.StringIO(code), simos=angr.simos.SimLinux, main_opts={
+        'backend': 'blob', 'custom_arch': 'amd64', 'custom_entry_point': 0, 'custom_base_addr': 0x400000,
+    })
+
+    for add_options in (set(), { so.UNICORN_NATIVE_SYSCALLS }):
+        s = p.factory.blank_state(addr=0x400000, add_options=so.unicorn | add_options)
+        brk = s.posix.brk
+        mmap_base = s.libc.mmap_base
+        pg = p.factory.simgr(s)
+        pg.run()
+
+        s = pg.one_deadended
+        nose.tools.assert_equal(s.posix.dumps(1), "hi!\n")
+        nose.tools.assert_equal(s.se.eval(s.posix.brk), brk + 0x2000)
+        nose.tools.assert_equal(s.libc.mmap_base, mmap_base + 0x2000)
+        nose.tools.assert_equal(s.se.eval(s.memory.load(mmap_base, 4), cast_to=str), "hi!\n")
+
+        if add_options:
+            # only the exit syscall left unicorn
+            nose.tools.assert_equal(sum(1 for d in s.history.descriptions.hardcopy if 'Unicorn' in d), 1)
+
+def test_adaptive_entry():
+    p = angr.Project(os.path.join(test_location, 'binaries/tests/i386/fauxware'))
+    engine = angr.engines.SimEngineUnicorn(min_site_entries=2, max_site_backoff=4)
+    s = p.factory.entry_state()
+    site = (s.addr, s.callstack.call_site_addr)
+
+    # unicorn is always tried until a site has been entered often enough
+    engine._record_site(site, 0, 0.01)
+    assert not engine._skip_site(s)
+    engine._record_site(site, 0, 0.01)
+
+    # a site that bails out right away is skipped, and tried again after more and more skips
+    nose.tools.assert_equal([ engine._skip_site(s) for _ in xrange(9) ], [
+        True, False, True, True, False, True, True, True, True
+    ])
+
+    # a long run makes it worth entering again
+    engine._record_site(site, 10000, 0.01)
+    assert not engine._skip_site(s)
+
+    s_unicorn = p.factory.entry_state(add_options=so.unicorn | { so.UNICORN_ADAPTIVE_ENTRY })
+    pg = p.factory.simgr(s_unicorn)
+    pg.explore()
+    nose.tools.assert_equal(sorted(pg.mp_deadended.posix.dumps(1).mp_items), sorted((
+        'Username: \nPassword: \nWelcome to the admin console, trusted user!\n',
+        'Username: \nPassword: \nGo away!',
+        'Username: \nPassword: \nWelcome to the admin console, trusted user!\n'
+    )))
+
 def test_inspect():
     p = angr.Project(os.path.join(test_location, 'binaries/tests/i386/uc_stop'))
 
@@ -154,6 +154,37 @@ def test_variable_analysis_fast():
         yield run_variable_recovery_analysis, project, cfg.kb.functions[func_name], truth, True
 
 
+def check_parallel_variable_recovery(project, func, runner):
+
+    nose.tools.assert_not_in(func.addr, runner.named_errors)
+    nose.tools.assert_in(func.addr, runner.kb.variables.function_managers)
+
+    # compare against a serial run
+    tmp_kb = angr.KnowledgeBase(project, project.loader.main_object)
+    vr = project.analyses.VariableRecoveryFast(func, kb=tmp_kb)
+
+    variables = runner.kb.variables[func.addr].get_variables()
+    nose.tools.assert_equal(sorted(str(v) for v in variables),
+                            sorted(str(v) for v in vr.variable_manager[func.addr].get_variables()))
+    nose.tools.assert_is(runner.kb.variables[func.addr].manager, runner.kb.variables)
+
+
+def test_variable_analysis_parallel():
+
+    binary_path = os.path.join(test_location, 'x86_64', 'fauxware')
+    project = angr.Project(binary_path, load_options={'auto_load_libs': False})
+    cfg = project.analyses.CFG()
+
+    functions = [ cfg.kb.functions['authenticate'], cfg.kb.functions['main'] ]
+    tmp_kb = angr.KnowledgeBase(project, project.loader.main_object)
+    tmp_kb.functions = cfg.kb.functions
+    runner = project.analyses.FunctionAnalysisRunner('VariableRecoveryFast', functions=functions, workers=2,
+                                                     kb=tmp_kb)
+
+    for func in functions:
+        yield check_parallel_variable_recovery, project, func, runner
+
+
 def main():
 
     g = globals()
@@ -219,6 +219,65 @@ def test_store_simplification():
 
     nose.tools.assert_true(claripy.backends.z3.is_true(exit_state.regs.ebp == state.regs.esp - 4))
 
+def test_irsb_plan():
+    from angr.engines.vex.plan import STEP_IMARK, STEP_EXIT
+
+    state = SimState(arch='X86')
+    state.regs.eax = state.se.BVS('eax', 32)
+
+    # inc eax; je +0; ret
+    irsb = pyvex.IRSB('\x40\x74\x00\xc3', 0x4000, state.arch)
+    engine = SimEngineVEX()
+    plan = engine._get_plan(irsb)
+    nose.tools.assert_is(engine._get_plan(irsb), plan)
+    nose.tools.assert_equal(len(plan), len(irsb.statements))
+    nose.tools.assert_equal(plan.insn_addrs, [ 0x4000, 0x4001 ])
+    nose.tools.assert_equal(len([ step for step in plan.steps if step[3] == STEP_IMARK ]), 2)
+    nose.tools.assert_equal(len([ step for step in plan.steps if step[3] == STEP_EXIT ]), 1)
+    nose.tools.assert_true(all(step[2] is not None for step in plan.steps))
+
+    sim_successors = engine.process(state.copy(), irsb)
+    nose.tools.assert_equal(sim_successors.artifacts['insn_addrs'], [ 0x4000, 0x4001 ])
+    nose.tools.assert_equal(sorted(s.se.eval(s.ip) for s in sim_successors.flat_successors), [ 0x4003, 0x4003 ])
+
+def test_concrete_irop_fast_path():
+    from angr.engines.vex.irop import operations
+    import random
+    rand = random.Random(0)
+
+    def check(op, sizes):
+        irop = operations[op]
+        nose.tools.assert_is_not_none(irop._concrete_calculate)
+        for _ in xrange(50):
+            args = [ claripy.BVV(rand.choice([0, 1, (1 << s) - 1, 1 << (s - 1), rand.getrandbits(s)]), s) for s in sizes ]
+            fast = irop._calculate_concrete(args)
+            slow = irop.extend_size(irop._calculate(args))
+            nose.tools.assert_is_not_none(fast)
+            nose.tools.assert_equal(fast.size(), slow.size())
+            nose.tools.assert_true(claripy.is_true(fast == slow), "%s%s: %s != %s" % (op, args, fast, slow))
+
+    for op in ('Iop_Add64', 'Iop_Sub32', 'Iop_Mul8', 'Iop_And64', 'Iop_Or16', 'Iop_Xor32'):
+        size = int(op[len(op.rstrip('0123456789')):])
+        check(op, [ size, size ])
+    check('Iop_Not32', [ 32 ])
+    check('Iop_Shl64', [ 64, 8 ])
+    check('Iop_Shr32', [ 32, 8 ])
+    check('Iop_Sar64', [ 64, 8 ])
+    check('Iop_CmpEQ64', [ 64, 64 ])
+    check('Iop_CmpNE8', [ 8, 8 ])
+    check('Iop_CmpLT32S', [ 32, 32 ])
+    check('Iop_CmpLE64U', [ 64, 64 ])
+    check('Iop_MullS32', [ 32, 32 ])
+    check('Iop_MullU64', [ 64, 64 ])
+    check('Iop_32HLto64', [ 32, 32 ])
+    check('Iop_64HIto32', [ 64 ])
+    check('Iop_64to32', [ 64 ])
+    check('Iop_8Sto32', [ 8 ])
+    check('Iop_16Uto64', [ 16 ])
+
+    # symbolic arguments take the regular path
+    nose.tools.assert_is_none(operations['Iop_Add32']._calculate_concrete([ claripy.BVS('x', 32), claripy.BVV(1, 32) ]))
+
 if __name__ == '__main__':
     g = globals().copy()
     for func_name, func in g.iteritems():